@@ -0,0 +1,43 @@
+import hashlib
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+
+def make_etag(*parts):
+    """
+    Build a strong ETag from the given validator parts.
+    """
+    digest = hashlib.md5("|".join(str(part) for part in parts).encode()).hexdigest()
+    return quote_etag(digest)
+
+
+def _timestamp(value):
+    if value is None or isinstance(value, int):
+        return value
+    if isinstance(value, float):
+        return int(value)
+    return int(value.timestamp())
+
+
+def not_modified_response(request, etag=None, last_modified=None):
+    """
+    Return a 304 response when the request's If-None-Match / If-Modified-Since
+    headers match the validators, otherwise None. ``last_modified`` is a
+    datetime or a Unix timestamp.
+    """
+    last_modified = _timestamp(last_modified)
+    response = get_conditional_response(
+        request, etag=etag, last_modified=last_modified
+    )
+    if response is not None:
+        set_validators(response, etag, last_modified)
+    return response
+
+
+def set_validators(response, etag=None, last_modified=None):
+    last_modified = _timestamp(last_modified)
+    if etag:
+        response["ETag"] = etag
+    if last_modified is not None:
+        response["Last-Modified"] = http_date(last_modified)
+    return response
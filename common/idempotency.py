@@ -0,0 +1,133 @@
+import datetime
+import functools
+import hashlib
+import json
+import time
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+from common.models import IdempotencyKey
+
+HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+MAX_KEY_LENGTH = 255
+POLL_INTERVAL = 0.1
+
+
+def _fingerprint(request):
+    body = json.dumps(request.data, sort_keys=True, default=str)
+    return hashlib.sha256(body.encode()).hexdigest()
+
+
+def purge_idempotency_keys(now=None):
+    """
+    Delete keys older than ``IDEMPOTENCY_KEY_TTL``. Returns how many went.
+    """
+    now = now or timezone.now()
+    expired_before = now - datetime.timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL)
+    deleted, _ = IdempotencyKey.objects.filter(created_at__lt=expired_before).delete()
+    return deleted
+
+
+def _claim(user, scope, key, fingerprint):
+    """
+    Insert an in-flight record for the key. Returns ``(record, True)`` if this
+    request now owns the key, else ``(existing record or None, False)``.
+    """
+    now = timezone.now()
+    records = IdempotencyKey.objects.filter(user=user, scope=scope, key=key)
+    # Expired keys can be reused, and a claim whose worker died mid-request
+    # must not block retries forever.
+    records.filter(
+        Q(created_at__lt=now - datetime.timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL))
+        | Q(
+            status_code__isnull=True,
+            created_at__lt=now
+            - datetime.timedelta(seconds=settings.IDEMPOTENCY_LOCK_TIMEOUT),
+        )
+    ).delete()
+    try:
+        with transaction.atomic():
+            record = IdempotencyKey.objects.create(
+                user=user, scope=scope, key=key, fingerprint=fingerprint
+            )
+        return record, True
+    except IntegrityError:
+        return records.first(), False
+
+
+def _replay(record):
+    return Response(
+        record.response_body,
+        status=record.status_code,
+        headers={REPLAYED_HEADER: "true"},
+    )
+
+
+def idempotent(view_method):
+    """
+    Honour an ``Idempotency-Key`` header on an APIView method.
+
+    The first request with a key runs normally and its response is stored.
+    A retry with the same key, from the same user and to the same URL, gets
+    the stored response back with ``Idempotent-Replayed: true`` and runs
+    nothing. A retry that arrives while the first request is still running
+    waits up to ``IDEMPOTENCY_WAIT_TIMEOUT`` seconds for it to finish, then
+    gets a 409. Reusing a key with a different body is a 422. Server errors
+    are not stored, so the request can be retried with the same key.
+    """
+
+    @functools.wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if key is None:
+            return view_method(self, request, *args, **kwargs)
+        if not key or len(key) > MAX_KEY_LENGTH:
+            return Response(
+                {"error": f"{HEADER} must be 1 to {MAX_KEY_LENGTH} characters"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        scope = f"{request.method} {request.path}"
+        fingerprint = _fingerprint(request)
+        deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT_TIMEOUT
+        record, created = _claim(request.user, scope, key, fingerprint)
+        while not created:
+            if record is None:
+                # The earlier request failed and released the key.
+                record, created = _claim(request.user, scope, key, fingerprint)
+                continue
+            if record.fingerprint != fingerprint:
+                return Response(
+                    {"error": f"{HEADER} was already used for a different request"},
+                    status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                )
+            if record.status_code is not None:
+                return _replay(record)
+            if time.monotonic() >= deadline:
+                return Response(
+                    {"error": f"A request with this {HEADER} is still in progress"},
+                    status=status.HTTP_409_CONFLICT,
+                )
+            time.sleep(POLL_INTERVAL)
+            record = IdempotencyKey.objects.filter(pk=record.pk).first()
+
+        try:
+            response = view_method(self, request, *args, **kwargs)
+        except Exception:
+            record.delete()
+            raise
+
+        if response.status_code >= 500 or not hasattr(response, "data"):
+            record.delete()
+            return response
+        record.status_code = response.status_code
+        record.response_body = response.data
+        record.completed_at = timezone.now()
+        record.save(update_fields=["status_code", "response_body", "completed_at"])
+        return response
+
+    return wrapper
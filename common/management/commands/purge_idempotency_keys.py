@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from common.idempotency import purge_idempotency_keys
+
+
+class Command(BaseCommand):
+    help = "Delete stored Idempotency-Key responses older than IDEMPOTENCY_KEY_TTL"
+
+    def handle(self, *args, **options):
+        deleted = purge_idempotency_keys()
+        self.stdout.write(f"Deleted {deleted} idempotency key(s)")
@@ -0,0 +1,232 @@
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from rest_framework import serializers
+
+
+def parse_field_paths(value):
+    """
+    Parse ``"id,items.price,items.product.name"`` into a tree of nested dicts,
+    e.g. ``{"id": {}, "items": {"price": {}, "product": {"name": {}}}}``.
+    """
+    tree = {}
+    for path in value.split(","):
+        node = tree
+        for part in path.strip().split("."):
+            if part:
+                node = node.setdefault(part, {})
+    return tree
+
+
+def _nested(field):
+    return field.child if isinstance(field, serializers.ListSerializer) else field
+
+
+class SparseFieldsMixin:
+    """
+    Adds the ``?fields=`` and ``?expand=`` query parameters to a serializer.
+
+    ``fields`` takes comma-separated, dotted paths relative to the top-level
+    serializer (``id,items.price,items.product.name``) and drops every field
+    that is not listed. A nested object listed without sub-fields collapses
+    to its primary key, unless it is also named in ``expand``, which returns
+    it in full. Without ``fields`` the payload is unchanged. Serializers bound
+    to input data always keep all of their fields.
+
+    Fields named in ``optional_fields`` are left out unless they are asked
+    for, in either ``fields`` or ``expand``.
+    """
+
+    fields_query_param = "fields"
+    expand_query_param = "expand"
+    # Model lookups read by SerializerMethodFields, used by optimize_queryset.
+    field_dependencies = {}
+    optional_fields = ()
+
+    def get_fields(self):
+        fields = super().get_fields()
+        selected, expanded = self._sparse_spec()
+        path = self._field_path()
+        for name in self.optional_fields:
+            if not self._requested(selected, expanded, path + (name,)):
+                fields.pop(name, None)
+        if selected is None:
+            return fields
+
+        if any(path[:i] in expanded for i in range(1, len(path) + 1)):
+            return fields
+        node = selected
+        for name in path:
+            node = node.get(name, {})
+        if not node:
+            return fields
+
+        for name in list(fields):
+            if name not in node:
+                del fields[name]
+                continue
+            field = fields[name]
+            nested = _nested(field)
+            if (
+                isinstance(nested, serializers.BaseSerializer)
+                and not node[name]
+                and path + (name,) not in expanded
+            ):
+                kwargs = {"read_only": True, "many": nested is not field}
+                if field.source:
+                    kwargs["source"] = field.source
+                fields[name] = serializers.PrimaryKeyRelatedField(**kwargs)
+        return fields
+
+    @staticmethod
+    def _requested(selected, expanded, path):
+        if path in expanded:
+            return True
+        node = selected
+        for name in path:
+            if node is None or name not in node:
+                return False
+            node = node[name]
+        return True
+
+    def _field_path(self):
+        path = []
+        node = self
+        while node.parent is not None:
+            if node.field_name:
+                path.append(node.field_name)
+            node = node.parent
+        return tuple(reversed(path))
+
+    def _sparse_spec(self):
+        root = self.root
+        spec = getattr(root, "_sparse_spec_cache", None)
+        if spec is not None:
+            return spec
+
+        selected, expanded = None, set()
+        request = self.context.get("request")
+        if request is not None and not hasattr(root, "initial_data"):
+            params = getattr(request, "query_params", request.GET)
+            expand = parse_field_paths(params.get(self.expand_query_param, ""))
+            expanded = set(self._paths(expand))
+            fields = params.get(self.fields_query_param, "")
+            if fields.strip():
+                selected = parse_field_paths(fields)
+                for path in expanded:
+                    node = selected
+                    for name in path:
+                        node = node.setdefault(name, {})
+        root._sparse_spec_cache = spec = (selected, expanded)
+        return spec
+
+    @classmethod
+    def _paths(cls, tree, prefix=()):
+        for name, subtree in tree.items():
+            if subtree:
+                yield from cls._paths(subtree, prefix + (name,))
+            else:
+                yield prefix + (name,)
+
+
+class _QueryPlan:
+    """
+    Columns and relations of one model that a serializer reads.
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self.fields = set()
+        self.all_fields = False
+        self.related = {}
+
+    def relation(self, name):
+        if name not in self.related:
+            model_field = self.model._meta.get_field(name)
+            self.related[name] = _QueryPlan(model_field.related_model)
+            if not (model_field.one_to_many or model_field.many_to_many):
+                self.fields.add(name)
+        return self.related[name]
+
+    def add_lookup(self, lookup):
+        name, _, rest = lookup.partition("__")
+        try:
+            model_field = self.model._meta.get_field(name)
+        except FieldDoesNotExist:
+            # A property or method: it may read anything.
+            self.all_fields = True
+            return
+        if model_field.is_relation and (
+            rest or model_field.one_to_many or model_field.many_to_many
+        ):
+            plan = self.relation(name)
+            if rest:
+                plan.add_lookup(rest)
+        else:
+            self.fields.add(name)
+
+    def add_serializer(self, serializer):
+        dependencies = getattr(serializer, "field_dependencies", {})
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            if isinstance(field, serializers.SerializerMethodField):
+                if name not in dependencies:
+                    self.all_fields = True
+                for dependency in dependencies.get(name, ()):
+                    self.add_lookup(dependency)
+                continue
+            if field.source == "*":
+                self.all_fields = True
+                continue
+            lookup = field.source.replace(".", "__")
+            nested = _nested(field)
+            if isinstance(nested, serializers.BaseSerializer):
+                plan = self
+                for part in lookup.split("__"):
+                    plan = plan.relation(part)
+                plan.add_serializer(nested)
+            else:
+                self.add_lookup(lookup)
+
+    def collect(self, prefix, only, select_related, prefetches):
+        if self.all_fields:
+            names = [field.name for field in self.model._meta.concrete_fields]
+        else:
+            names = self.fields | {self.model._meta.pk.name}
+        only.extend(prefix + name for name in names)
+
+        for name, plan in self.related.items():
+            model_field = self.model._meta.get_field(name)
+            if model_field.one_to_many or model_field.many_to_many:
+                if model_field.one_to_many:
+                    plan.fields.add(model_field.field.name)
+                queryset = plan.apply(plan.model._default_manager.all())
+                prefetches.append(Prefetch(prefix + name, queryset=queryset))
+            else:
+                select_related.append(prefix + name)
+                plan.collect(f"{prefix}{name}__", only, select_related, prefetches)
+
+    def apply(self, queryset):
+        only, select_related, prefetches = [], [], []
+        self.collect("", only, select_related, prefetches)
+        if select_related:
+            queryset = queryset.select_related(*select_related)
+        queryset = queryset.only(*only)
+        if prefetches:
+            queryset = queryset.prefetch_related(*prefetches)
+        return queryset
+
+
+def optimize_queryset(queryset, serializer, extra=()):
+    """
+    Load only what ``serializer`` will render: unused columns are deferred
+    with ``only()``, nested objects become ``select_related`` joins or
+    prefetches, and relations that are left out or collapsed to a primary
+    key are not joined at all. ``extra`` lists further lookups the caller
+    reads itself; ordering-style ``-field`` names are accepted.
+    """
+    plan = _QueryPlan(queryset.model)
+    plan.add_serializer(_nested(serializer))
+    for lookup in extra:
+        plan.add_lookup(lookup.lstrip("-"))
+    return plan.apply(queryset)
@@ -0,0 +1,51 @@
+import csv
+import datetime
+import decimal
+import json
+
+# Not "format", which DRF reserves for renderer selection.
+EXPORT_FORMAT_PARAM = "export_format"
+
+
+class Echo:
+    """
+    File-like object whose ``write`` returns the value, so ``csv.writer`` can
+    produce rows one at a time for a streaming response.
+    """
+
+    def write(self, value):
+        return value
+
+
+def csv_writer():
+    return csv.writer(Echo())
+
+
+def csv_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, datetime.datetime):
+        return value.isoformat()
+    return value
+
+
+def _json_default(value):
+    # Full precision timestamps, so an exported one can be used as a filter.
+    if isinstance(value, datetime.datetime):
+        return value.isoformat()
+    if isinstance(value, decimal.Decimal):
+        return str(value)
+    raise TypeError(f"Cannot export {type(value).__name__}")
+
+
+def ndjson_line(value):
+    return json.dumps(value, separators=(",", ":"), default=_json_default) + "\n"
+
+
+def export_format(request, formats, default="ndjson"):
+    """
+    The export format requested in ``?export_format=``, or None when it is
+    not one of ``formats``.
+    """
+    value = request.query_params.get(EXPORT_FORMAT_PARAM, default).lower()
+    return value if value in formats else None
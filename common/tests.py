@@ -1,3 +1,371 @@
-from django.test import TestCase
+import re
+from decimal import Decimal
+from unittest import mock
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Q
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient, APIRequestFactory
+from administration.models import CustomUser
+from common.models import IdempotencyKey
+from common.serializers import optimize_queryset, parse_field_paths
+from common.views import encode_cursor
+from order_management.models import Cart, CartItem, Order, OrderItem
+from order_management.serializers import OrderSerializer
+from product_management.models import Category, Product
 
-# Create your tests here.
+LIVE = {"is_active": True, "is_deleted": False}
+
+
+class SoftDeleteIndexTests(TestCase):
+    """
+    EXPLAIN the queries behind the list and lookup views on a seeded dataset
+    and fail if any of them falls back to a sequential scan of its table.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = CustomUser.objects.bulk_create(
+            [
+                CustomUser(username=f"user{i}", email=f"user{i}@example.com")
+                for i in range(50)
+            ]
+        )
+        cls.categories = Category.objects.bulk_create(
+            [Category(name=f"Category {i}", slug=f"category-{i}") for i in range(40)]
+        )
+        products = Product.objects.bulk_create(
+            [
+                Product(
+                    name=f"Product {i}",
+                    slug=f"product-{i}",
+                    description="Seeded product",
+                    category=cls.categories[i % 40],
+                    price=10,
+                    is_deleted=i % 20 == 0,
+                )
+                for i in range(5000)
+            ]
+        )
+        statuses = ["pending", "processing", "completed", "cancelled"]
+        cls.orders = Order.objects.bulk_create(
+            [
+                Order(
+                    customer=cls.users[i % 50],
+                    order_number=f"ORD-SEED-{i}",
+                    status=statuses[i % 4],
+                    stripe_payment_intent_id=f"pi_{i}",
+                )
+                for i in range(5000)
+            ]
+        )
+        OrderItem.objects.bulk_create(
+            [
+                OrderItem(
+                    order=cls.orders[i % 5000],
+                    product=products[i % 5000],
+                    price=10,
+                    subtotal=10,
+                )
+                for i in range(10000)
+            ]
+        )
+        cls.carts = Cart.objects.bulk_create([Cart(user=user) for user in cls.users])
+        CartItem.objects.bulk_create(
+            [
+                CartItem(cart=cls.carts[i % 50], product=products[i], price=10, subtotal=10)
+                for i in range(2000)
+            ]
+        )
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+
+    def assertNoSequentialScan(self, queryset):
+        table = queryset.model._meta.db_table
+        plan = queryset.explain()
+        if connection.vendor == "postgresql":
+            pattern = rf"Seq Scan on {table}\b"
+        else:
+            pattern = rf"\bSCAN {table}\s*$"
+        self.assertIsNone(
+            re.search(pattern, plan, re.MULTILINE),
+            f"Sequential scan on {table}:\n{plan}",
+        )
+
+    # List views are paginated, so their queries are explained with a LIMIT.
+    def test_product_list_queries_use_indexes(self):
+        products = Product.objects.select_related("category").order_by(
+            "category__name", "name", "id"
+        )
+        self.assertNoSequentialScan(products.filter(**LIVE)[:20])
+        self.assertNoSequentialScan(
+            products.filter(category_id=self.categories[3].pk, **LIVE)[:20]
+        )
+
+    def test_category_list_query_uses_index(self):
+        self.assertNoSequentialScan(Category.objects.filter(**LIVE)[:20])
+
+    def test_order_list_queries_use_indexes(self):
+        self.assertNoSequentialScan(Order.objects.filter(**LIVE)[:20])
+        self.assertNoSequentialScan(
+            Order.objects.filter(customer=self.users[1], **LIVE)[:20]
+        )
+        self.assertNoSequentialScan(
+            Order.objects.filter(status="pending", **LIVE)[:20]
+        )
+
+    def test_payment_intent_lookup_uses_index(self):
+        self.assertNoSequentialScan(
+            Order.objects.filter(stripe_payment_intent_id="pi_5", **LIVE)
+        )
+
+    def test_item_queries_use_indexes(self):
+        self.assertNoSequentialScan(self.orders[3].items.all())
+        self.assertNoSequentialScan(self.carts[2].items.all())
+
+    def test_product_changes_query_uses_index(self):
+        since = Product.objects.order_by("updated_at", "id")[2500]
+        self.assertNoSequentialScan(
+            Product.objects.filter(
+                Q(updated_at__gt=since.updated_at)
+                | Q(updated_at=since.updated_at, id__gt=since.pk)
+            ).order_by("updated_at", "id")[:500]
+        )
+
+
+class IdempotencyKeyTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name="Garden")
+        cls.product = Product.objects.create(
+            name="Hose",
+            slug="hose",
+            description="",
+            category=category,
+            price=Decimal("12.00"),
+            stock_quantity=10,
+        )
+        cls.user = CustomUser.objects.create(username="retry", email="r@x.com")
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create_order(self, key, quantity=1):
+        return self.client.post(
+            "/api/v1/orders/",
+            {"items": [{"product_id": self.product.pk, "quantity": quantity}]},
+            format="json",
+            HTTP_IDEMPOTENCY_KEY=key,
+        )
+
+    def test_retry_replays_the_original_response(self):
+        first = self.create_order("abc")
+        second = self.create_order("abc")
+
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(second.status_code, 201)
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(second["Idempotent-Replayed"], "true")
+        self.assertEqual(Order.objects.filter(customer=self.user).count(), 1)
+        self.assertEqual(Product.objects.get(pk=self.product.pk).stock_quantity, 9)
+
+        self.assertEqual(self.create_order("def").status_code, 201)
+        self.assertEqual(Order.objects.filter(customer=self.user).count(), 2)
+
+    def test_key_reused_with_a_different_body_is_rejected(self):
+        self.create_order("abc")
+        response = self.create_order("abc", quantity=2)
+        self.assertEqual(response.status_code, 422)
+
+    def test_duplicate_waits_for_the_request_in_flight(self):
+        self.create_order("abc")
+        record = IdempotencyKey.objects.get()
+        stored = (record.status_code, record.response_body)
+        IdempotencyKey.objects.update(status_code=None, response_body=None)
+
+        def finish_first_request(seconds):
+            IdempotencyKey.objects.update(
+                status_code=stored[0], response_body=stored[1]
+            )
+
+        with mock.patch("common.idempotency.time.sleep") as sleep:
+            sleep.side_effect = finish_first_request
+            response = self.create_order("abc")
+        self.assertEqual(sleep.call_count, 1)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response["Idempotent-Replayed"], "true")
+        self.assertEqual(Order.objects.filter(customer=self.user).count(), 1)
+
+    @override_settings(IDEMPOTENCY_WAIT_TIMEOUT=0)
+    def test_duplicate_gives_up_if_the_request_never_finishes(self):
+        self.create_order("abc")
+        IdempotencyKey.objects.update(status_code=None, response_body=None)
+        self.assertEqual(self.create_order("abc").status_code, 409)
+
+    def test_server_errors_release_the_key(self):
+        with mock.patch(
+            "order_management.views.OrderCreateSerializer.save",
+            side_effect=RuntimeError,
+        ):
+            with self.assertRaises(RuntimeError):
+                self.create_order("abc")
+        self.assertFalse(IdempotencyKey.objects.exists())
+        self.assertEqual(self.create_order("abc").status_code, 201)
+
+
+class CursorPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.books, cls.games = [
+            Category.objects.create(name=name) for name in ("Books", "Games")
+        ]
+        # Repeated names, so pages end in the middle of ties on the sort key.
+        for i in range(7):
+            for category in (cls.books, cls.games):
+                Product.objects.create(
+                    name=f"Title {i % 3}",
+                    slug=f"{category.slug}-{i}",
+                    description="",
+                    category=category,
+                    price=Decimal("5.00"),
+                )
+        cls.user = CustomUser.objects.create(username="reader", email="rd@x.com")
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def walk(self, url, direction="next"):
+        ids = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            ids.extend(product["id"] for product in response.data["results"])
+            url = response.data[direction]
+        return ids
+
+    def test_pages_have_no_duplicates_or_gaps(self):
+        expected = list(
+            Product.objects.order_by("category__name", "name", "id").values_list(
+                "id", flat=True
+            )
+        )
+        ids = self.walk("/api/v1/products/?pagination=cursor&page_size=4")
+        self.assertEqual(ids, expected)
+
+        # Walking back from the last page gives the same rows in reverse.
+        response = self.client.get("/api/v1/products/?pagination=cursor&page_size=4")
+        while response.data["next"]:
+            response = self.client.get(response.data["next"])
+        last_page = [product["id"] for product in response.data["results"]]
+        self.assertEqual(last_page, expected[-2:])
+        pages = []
+        url = response.data["previous"]
+        while url:
+            page = self.client.get(url)
+            pages.insert(0, [product["id"] for product in page.data["results"]])
+            url = page.data["previous"]
+        self.assertEqual(sum(pages, []) + last_page, expected)
+
+    def test_category_filter_is_kept_across_pages(self):
+        ids = self.walk(
+            f"/api/v1/products/?pagination=cursor&page_size=3&category={self.games.pk}"
+        )
+        expected = list(
+            Product.objects.filter(category=self.games)
+            .order_by("name", "id")
+            .values_list("id", flat=True)
+        )
+        self.assertEqual(ids, expected)
+
+    def test_count_is_opt_in(self):
+        response = self.client.get("/api/v1/products/?pagination=cursor")
+        self.assertNotIn("count", response.data)
+        response = self.client.get(
+            "/api/v1/products/?pagination=cursor&include_count=true"
+        )
+        self.assertEqual(response.data["count"], 14)
+
+    def test_invalid_cursor_is_not_found(self):
+        for cursor in ("not-a-cursor", encode_cursor({"p": [1]}), encode_cursor([])):
+            with self.subTest(cursor=cursor):
+                response = self.client.get(f"/api/v1/products/?cursor={cursor}")
+                self.assertEqual(response.status_code, 404)
+
+
+class SparseFieldsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        customer = CustomUser.objects.create(username="sparse", email="sp@x.com")
+        category = Category.objects.create(name="Toys")
+        cls.product = Product.objects.create(
+            name="Kite", description="", category=category, price=Decimal("12.00")
+        )
+        cls.order = Order.objects.create(
+            customer=customer,
+            order_number="ORD-SPARSE",
+            stripe_client_secret="secret",
+        )
+        OrderItem.objects.create(
+            order=cls.order, product=cls.product, price=12, subtotal=12
+        )
+
+    def render(self, query=""):
+        request = APIRequestFactory().get(f"/api/v1/orders/?{query}")
+        serializer = OrderSerializer(context={"request": request})
+        queryset = optimize_queryset(Order.objects.all(), serializer)
+        with CaptureQueriesContext(connection) as queries:
+            data = OrderSerializer(
+                queryset.get(pk=self.order.pk), context={"request": request}
+            ).data
+        return data, len(queries)
+
+    def test_parse_field_paths(self):
+        self.assertEqual(
+            parse_field_paths("id, items.price,items.product.name,,"),
+            {"id": {}, "items": {"price": {}, "product": {"name": {}}}},
+        )
+
+    def test_without_fields_the_payload_is_unchanged(self):
+        data, _ = self.render()
+        self.assertIn("customer_email", data)
+        self.assertNotIn("client_secret", data)
+        self.assertEqual(data["items"][0]["product"]["name"], "Kite")
+
+    def test_fields_select_nested_paths(self):
+        data, queries = self.render("fields=id,items.quantity,items.product.name")
+        self.assertEqual(
+            data,
+            {
+                "id": self.order.pk,
+                "items": [{"quantity": 1, "product": {"name": "Kite"}}],
+            },
+        )
+        # The order, then its items joined to their products.
+        self.assertEqual(queries, 2)
+
+    def test_unknown_fields_are_ignored(self):
+        data, _ = self.render("fields=id,nope,items.nope")
+        self.assertEqual(data, {"id": self.order.pk, "items": [{}]})
+
+    def test_nested_object_without_sub_fields_collapses_to_its_key(self):
+        data, queries = self.render("fields=items.product")
+        self.assertEqual(data, {"items": [{"product": self.product.pk}]})
+        self.assertEqual(queries, 2)
+
+    def test_expand_returns_nested_objects_and_optional_fields(self):
+        data, _ = self.render("fields=items.product&expand=items.product")
+        self.assertEqual(data["items"][0]["product"]["name"], "Kite")
+        data, _ = self.render("fields=id&expand=client_secret")
+        self.assertEqual(data, {"id": self.order.pk, "client_secret": "secret"})
+        data, _ = self.render("expand=client_secret")
+        self.assertEqual(data["client_secret"], "secret")
+        self.assertIn("items", data)
+
+    def test_input_serializers_keep_every_field(self):
+        request = APIRequestFactory().get("/api/v1/orders/?fields=id")
+        serializer = OrderSerializer(data={}, context={"request": request})
+        self.assertIn("shipping_address", serializer.fields)
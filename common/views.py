@@ -1,11 +1,18 @@
+import base64
+import datetime
+import json
+from decimal import Decimal
 from django.shortcuts import render
 from rest_framework import status
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination as DRFBasePagination
 from rest_framework.pagination import PageNumberPagination
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
 from rest_framework.views import APIView
 from django.db.models import Sum, Count, Q
-from order_management.models import Order
+from order_management.models import ArchiveTotals, Order
 
 
 class BasePagination(PageNumberPagination):
@@ -14,6 +21,195 @@ class BasePagination(PageNumberPagination):
     max_page_size = 100
 
 
+def encode_cursor(payload):
+    """
+    Encode a JSON-serializable payload into an opaque, URL-safe cursor string.
+    """
+    data = json.dumps(payload, separators=(",", ":"), default=_cursor_default)
+    return base64.urlsafe_b64encode(data.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """
+    Decode a cursor produced by ``encode_cursor``. Raises ``ValueError`` if invalid.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        return json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+    except (TypeError, UnicodeDecodeError, json.JSONDecodeError, ValueError) as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def _cursor_default(value):
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError(f"Cannot encode {type(value).__name__} in a cursor")
+
+
+class BaseCursorPagination(DRFBasePagination):
+    """
+    Keyset pagination over a fixed, unique ordering such as
+    ``("category__name", "name", "id")``.
+
+    Each page is fetched with a ``WHERE (keys) > (last seen keys)`` filter instead
+    of an OFFSET, so every page costs the same as the first one. The ``COUNT(*)``
+    query only runs when the client asks for it with ``?include_count=true``.
+    """
+
+    page_size = 20
+    page_size_query_param = "page_size"
+    max_page_size = 100
+    cursor_query_param = "cursor"
+    count_query_param = "include_count"
+    ordering = ("-created_at", "id")
+    invalid_cursor_message = "Invalid cursor"
+
+    def __init__(self, ordering=None):
+        if ordering:
+            self.ordering = tuple(ordering)
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+            if page_size > 0:
+                return min(page_size, self.max_page_size)
+        except (KeyError, ValueError):
+            pass
+        return self.page_size
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.count = None
+        if request.query_params.get(self.count_query_param, "").lower() in ("1", "true"):
+            self.count = queryset.count()
+
+        position, reverse = self.decode_position(request)
+        ordering = self.ordering
+        if reverse:
+            ordering = tuple(self._flip(field) for field in ordering)
+
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(self._keyset_filter(ordering, position))
+
+        rows = list(queryset[: self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[: self.page_size]
+        if reverse:
+            rows.reverse()
+            has_next, has_previous = position is not None, has_more
+        else:
+            has_next, has_previous = has_more, position is not None
+
+        self.next_position = self.get_position(rows[-1]) if rows and has_next else None
+        self.previous_position = (
+            self.get_position(rows[0]) if rows and has_previous else None
+        )
+        return rows
+
+    def get_paginated_response(self, data):
+        payload = {}
+        if self.count is not None:
+            payload["count"] = self.count
+        payload["next"] = self.get_next_link()
+        payload["previous"] = self.get_previous_link()
+        payload["results"] = data
+        return Response(payload)
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        return self._build_link(self.next_position, reverse=False)
+
+    def get_previous_link(self):
+        if self.previous_position is None:
+            return None
+        return self._build_link(self.previous_position, reverse=True)
+
+    def decode_position(self, request):
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None, False
+        try:
+            payload = decode_cursor(cursor)
+            position = payload["p"]
+            if not isinstance(position, list) or len(position) != len(self.ordering):
+                raise ValueError(self.invalid_cursor_message)
+            return position, bool(payload.get("r"))
+        except (ValueError, KeyError, TypeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_position(self, row):
+        return [self._get_value(row, field.lstrip("-")) for field in self.ordering]
+
+    def _build_link(self, position, reverse):
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, "page")
+        cursor = encode_cursor({"p": position, "r": int(reverse)})
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    @staticmethod
+    def _flip(field):
+        return field[1:] if field.startswith("-") else f"-{field}"
+
+    @staticmethod
+    def _get_value(row, field):
+        if isinstance(row, dict):
+            return row[field]
+        value = row
+        for part in field.split("__"):
+            value = getattr(value, part)
+        return value
+
+    @staticmethod
+    def _keyset_filter(ordering, position):
+        # (a, b, c) > (x, y, z) expands to
+        # a > x OR (a = x AND b > y) OR (a = x AND b = y AND c > z),
+        # with > replaced by < for descending fields.
+        condition = Q()
+        equal = Q()
+        for field, value in zip(ordering, position):
+            name = field.lstrip("-")
+            lookup = "lt" if field.startswith("-") else "gt"
+            condition |= equal & Q(**{f"{name}__{lookup}": value})
+            equal &= Q(**{name: value})
+        return condition
+
+
+class PaginationMixin:
+    """
+    Lets an APIView switch between page-number and cursor pagination.
+
+    Cursor pagination is used when the view's ``pagination_class`` is a
+    ``BaseCursorPagination`` or when the client sends ``?pagination=cursor``
+    or a ``?cursor=`` token, provided the view defines ``cursor_ordering``.
+    """
+
+    pagination_class = BasePagination
+    cursor_pagination_class = BaseCursorPagination
+    cursor_ordering = None
+
+    def get_cursor_ordering(self, request):
+        return self.cursor_ordering
+
+    def wants_cursor_pagination(self, request):
+        return (
+            request.query_params.get("pagination") == "cursor"
+            or BaseCursorPagination.cursor_query_param in request.query_params
+        )
+
+    def get_paginator(self, request):
+        ordering = self.get_cursor_ordering(request)
+        if issubclass(self.pagination_class, BaseCursorPagination):
+            return self.pagination_class(ordering=ordering)
+        if ordering and self.wants_cursor_pagination(request):
+            return self.cursor_pagination_class(ordering=ordering)
+        return self.pagination_class()
+
+
 class ReportsSummaryView(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -25,13 +221,16 @@ class ReportsSummaryView(APIView):
             )
 
         orders = Order.objects.filter(is_active=True, is_deleted=False)
-        
-        total_orders = orders.count()
-        total_revenue = orders.filter(status="completed").aggregate(
-            total=Sum("total_amount")
-        )["total"] or 0
-        
-        paid_orders = orders.filter(status="completed").count()
+        archived = ArchiveTotals.current()
+
+        completed = orders.filter(status="completed")
+
+        total_orders = orders.count() + archived.total_orders
+        total_revenue = (
+            completed.aggregate(total=Sum("total_amount"))["total"] or 0
+        ) + archived.completed_revenue
+
+        paid_orders = completed.count() + archived.completed_orders
         pending_orders = orders.filter(status="pending").count()
 
         return Response({
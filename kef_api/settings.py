@@ -13,6 +13,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 from pathlib import Path
 from datetime import timedelta
 from decouple import config
+from corsheaders.defaults import default_headers
 import psycopg2
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -104,10 +105,60 @@ else:
         "default": {
             "ENGINE": "django.db.backends.sqlite3",
             "NAME": BASE_DIR / "db.sqlite3",
+            # A file, not the in-memory default, so tests can run concurrent
+            # writers on their own connections.
+            "TEST": {"NAME": BASE_DIR / "test_db.sqlite3"},
         }
     }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Local memory is per process; use a shared backend (Redis, Memcached) when
+# running more than one Gunicorn worker so invalidations reach every worker.
+
+CACHES = {
+    "default": {
+        "BACKEND": config(
+            "CACHE_BACKEND", default="django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": config("CACHE_LOCATION", default="kef-api"),
+    }
+}
+
+CATALOG_CACHE_TIMEOUT = config("CATALOG_CACHE_TIMEOUT", default=300, cast=int)
+
+# Where working carts live. DatabaseCartStore writes every change to the cart
+# tables directly. CacheCartStore keeps carts in the cache above and saves them
+# at checkout and when `manage.py flush_carts` runs; carts untouched for
+# CART_IDLE_TIMEOUT seconds are then evicted. Only use it with a cache shared by
+# every process (not the LocMemCache default) that keeps entries for
+# CART_CACHE_TIMEOUT seconds.
+CART_STORE = config(
+    "CART_STORE", default="order_management.cart_store.DatabaseCartStore"
+)
+CART_CACHE_TIMEOUT = config("CART_CACHE_TIMEOUT", default=86400, cast=int)
+CART_IDLE_TIMEOUT = config("CART_IDLE_TIMEOUT", default=3600, cast=int)
+
+# Idempotency-Key handling (seconds): how long stored responses are replayed,
+# how long a retry waits for the first request to finish, and after how long
+# an unfinished first request is assumed to have died.
+IDEMPOTENCY_KEY_TTL = config("IDEMPOTENCY_KEY_TTL", default=86400, cast=int)
+IDEMPOTENCY_WAIT_TIMEOUT = config("IDEMPOTENCY_WAIT_TIMEOUT", default=10, cast=int)
+IDEMPOTENCY_LOCK_TIMEOUT = config("IDEMPOTENCY_LOCK_TIMEOUT", default=60, cast=int)
+
+# Completed and cancelled orders older than this many days are moved to the
+# archive tables by `manage.py archive_orders`.
+ORDER_ARCHIVE_AFTER_DAYS = config("ORDER_ARCHIVE_AFTER_DAYS", default=180, cast=int)
+
+# The product changes feed (/api/v1/products/changes/) only returns rows whose
+# updated_at is at least this many seconds old. A row written by a transaction
+# that stays open longer than this (a slow bulk update, a large import chunk)
+# can commit behind a cursor that has already passed it and is then never
+# returned, so keep it above the longest product write transaction.
+PRODUCT_CHANGES_SAFETY_LAG = config("PRODUCT_CHANGES_SAFETY_LAG", default=30, cast=int)
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -145,6 +196,10 @@ USE_TZ = True
 STATIC_URL = "static/"
 STATIC_ROOT = BASE_DIR / "staticfiles"
 
+# Uploaded product images and their generated derivatives
+MEDIA_URL = "media/"
+MEDIA_ROOT = BASE_DIR / "media"
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -202,6 +257,8 @@ CORS_ALLOWED_ORIGINS = [
     "http://localhost:5174",
 ]
 CORS_ALLOW_CREDENTIALS = True
+CORS_ALLOW_HEADERS = (*default_headers, "idempotency-key")
+CORS_EXPOSE_HEADERS = ["Idempotent-Replayed"]
 # Email Configuration
 EMAIL_BACKEND = config(
     "EMAIL_BACKEND", default="django.core.mail.backends.console.EmailBackend"
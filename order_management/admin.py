@@ -1,8 +1,18 @@
-from django.contrib import admin
+from django.contrib import admin, messages
 from django.urls import path
 from django.shortcuts import render
 from django.db.models import Sum
-from order_management.models import Order, OrderItem
+from django.http import StreamingHttpResponse
+from order_management.exporters import CONTENT_TYPES, export_orders
+from order_management.models import (
+    ArchivedOrder,
+    ArchivedOrderItem,
+    ArchiveTotals,
+    Order,
+    OrderItem,
+    OrderSummary,
+)
+from order_management.status_service import transition_orders
 
 
 class OrderItemInline(admin.TabularInline):
@@ -24,6 +34,38 @@ class OrderAdmin(admin.ModelAdmin):
     search_fields = ("order_number", "customer__email")
     readonly_fields = ("order_number", "total_amount", "created_at", "updated_at", "crm_sync_status")
     inlines = [OrderItemInline]
+    actions = ["mark_processing", "mark_completed", "mark_cancelled", "export_csv"]
+
+    def _transition(self, request, queryset, new_status):
+        changed = transition_orders(queryset.values_list("pk", flat=True), new_status)
+        skipped = queryset.count() - len(changed)
+        self.message_user(request, f"{len(changed)} order(s) marked as {new_status}.")
+        if skipped:
+            self.message_user(
+                request,
+                f"{skipped} order(s) could not move to {new_status} and were skipped.",
+                messages.WARNING,
+            )
+
+    @admin.action(description="Mark selected orders as processing")
+    def mark_processing(self, request, queryset):
+        self._transition(request, queryset, "processing")
+
+    @admin.action(description="Mark selected orders as completed")
+    def mark_completed(self, request, queryset):
+        self._transition(request, queryset, "completed")
+
+    @admin.action(description="Mark selected orders as cancelled")
+    def mark_cancelled(self, request, queryset):
+        self._transition(request, queryset, "cancelled")
+
+    @admin.action(description="Export selected orders as CSV")
+    def export_csv(self, request, queryset):
+        response = StreamingHttpResponse(
+            export_orders("csv", queryset), content_type=CONTENT_TYPES["csv"]
+        )
+        response["Content-Disposition"] = 'attachment; filename="orders.csv"'
+        return response
 
     def changelist_view(self, request, extra_context=None):
         extra_context = extra_context or {}
@@ -45,13 +87,15 @@ class OrderAdmin(admin.ModelAdmin):
             return HttpResponseForbidden("You do not have permission to access this page.")
 
         orders = Order.objects.filter(is_active=True, is_deleted=False)
-        
-        total_orders = orders.count()
-        total_revenue = orders.filter(status="completed").aggregate(
-            total=Sum("total_amount")
-        )["total"] or 0
-        
-        paid_orders = orders.filter(status="completed").count()
+        archived = ArchiveTotals.current()
+        completed = orders.filter(status="completed")
+
+        total_orders = orders.count() + archived.total_orders
+        total_revenue = (
+            completed.aggregate(total=Sum("total_amount"))["total"] or 0
+        ) + archived.completed_revenue
+
+        paid_orders = completed.count() + archived.completed_orders
         pending_orders = orders.filter(status="pending").count()
 
         from django.contrib import admin
@@ -72,3 +116,66 @@ class OrderItemAdmin(admin.ModelAdmin):
     list_display = ("order", "product", "quantity", "price", "subtotal")
     list_filter = ("created_at",)
     search_fields = ("order__order_number", "product__name")
+
+
+class ArchivedOrderItemInline(admin.TabularInline):
+    model = ArchivedOrderItem
+    extra = 0
+    can_delete = False
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(ArchivedOrder)
+class ArchivedOrderAdmin(admin.ModelAdmin):
+    list_display = (
+        "order_number",
+        "customer",
+        "total_amount",
+        "status",
+        "created_at",
+        "archived_at",
+    )
+    list_filter = ("status", "created_at")
+    search_fields = ("order_number", "customer__email")
+    list_select_related = ("customer",)
+    inlines = [ArchivedOrderItemInline]
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(OrderSummary)
+class OrderSummaryAdmin(admin.ModelAdmin):
+    """
+    Fast order list for day-to-day browsing, read from OrderSummary only.
+    """
+
+    list_display = (
+        "order_number",
+        "customer_email",
+        "status",
+        "item_count",
+        "first_item_name",
+        "total_amount",
+        "created_at",
+    )
+    list_filter = ("status", "is_active")
+    search_fields = ("order_number", "customer_email")
+    show_full_result_count = False
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,92 @@
+import datetime
+from decimal import Decimal
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.utils import timezone
+from order_management.models import (
+    ArchivedOrder,
+    ArchivedOrderItem,
+    ArchiveTotals,
+    Order,
+    OrderItem,
+)
+
+ARCHIVABLE_STATUSES = ("completed", "cancelled")
+DEFAULT_BATCH_SIZE = 500
+
+
+def _copy_fields(model):
+    return [field.attname for field in model._meta.concrete_fields]
+
+
+ORDER_FIELDS = [name for name in _copy_fields(ArchivedOrder) if name != "archived_at"]
+ITEM_FIELDS = _copy_fields(ArchivedOrderItem)
+
+
+def archivable_orders(older_than_days=None):
+    if older_than_days is None:
+        older_than_days = settings.ORDER_ARCHIVE_AFTER_DAYS
+    cutoff = timezone.now() - datetime.timedelta(days=older_than_days)
+    return Order.objects.filter(status__in=ARCHIVABLE_STATUSES, created_at__lt=cutoff)
+
+
+def _add_to_totals(order_ids):
+    live = Q(is_active=True, is_deleted=False)
+    completed = live & Q(status="completed")
+    figures = ArchivedOrder.objects.filter(pk__in=order_ids).aggregate(
+        total=Count("id", filter=live),
+        completed=Count("id", filter=completed),
+        revenue=Sum("total_amount", filter=completed),
+    )
+    ArchiveTotals.objects.get_or_create(pk=1)
+    ArchiveTotals.objects.filter(pk=1).update(
+        total_orders=F("total_orders") + figures["total"],
+        completed_orders=F("completed_orders") + figures["completed"],
+        completed_revenue=F("completed_revenue")
+        + (figures["revenue"] or Decimal("0.00")),
+    )
+
+
+def archive_batch(queryset, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Move up to ``batch_size`` orders from ``queryset``, with their items,
+    into the archive tables in one transaction. Returns how many moved.
+    """
+    with transaction.atomic():
+        order_ids = list(
+            queryset.select_for_update()
+            .order_by("id")
+            .values_list("id", flat=True)[:batch_size]
+        )
+        if not order_ids:
+            return 0
+
+        orders = Order.objects.filter(pk__in=order_ids).values(*ORDER_FIELDS)
+        ArchivedOrder.objects.bulk_create([ArchivedOrder(**row) for row in orders])
+        items = OrderItem.objects.filter(order_id__in=order_ids).values(*ITEM_FIELDS)
+        ArchivedOrderItem.objects.bulk_create(
+            [ArchivedOrderItem(**row) for row in items], batch_size=batch_size
+        )
+        _add_to_totals(order_ids)
+
+        # Queryset deletes skip OrderItem.delete(), which would restock.
+        OrderItem.objects.filter(order_id__in=order_ids).delete()
+        Order.objects.filter(pk__in=order_ids).delete()
+    return len(order_ids)
+
+
+def archive_orders(older_than_days=None, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Archive completed and cancelled orders created more than
+    ``older_than_days`` (default ``ORDER_ARCHIVE_AFTER_DAYS``) ago, in
+    batches of ``batch_size`` so no transaction holds locks for long.
+    Returns the number of orders archived.
+    """
+    queryset = archivable_orders(older_than_days)
+    archived = 0
+    while True:
+        moved = archive_batch(queryset, batch_size)
+        if not moved:
+            return archived
+        archived += moved
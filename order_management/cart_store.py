@@ -0,0 +1,486 @@
+import datetime
+import time
+from contextlib import contextmanager
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from rest_framework import serializers
+from rest_framework.exceptions import APIException
+from common.serializers import optimize_queryset
+from order_management.models import Cart, CartItem
+from product_management.models import Product
+
+CART_KEY_PREFIX = "cart:state"
+DIRTY_KEY = "cart:dirty"
+# Seconds a lock is held at most, and how long a request waits for one.
+LOCK_TIMEOUT = 10
+LOCK_WAIT = 5
+POLL_INTERVAL = 0.05
+CART_ITEM_UPDATE_FIELDS = [
+    "quantity",
+    "price",
+    "subtotal",
+    "is_active",
+    "is_deleted",
+    "updated_at",
+]
+
+
+class CartBusy(APIException):
+    status_code = 409
+    default_detail = "The cart is being updated by another request, try again."
+    default_code = "cart_busy"
+
+
+def get_cart_store():
+    return import_string(settings.CART_STORE)()
+
+
+def _product_serializer(serializer):
+    # The nested product serializer of a CartSerializer, or None when sparse
+    # fields leave the products out or collapse them to their ids.
+    items = serializer.fields.get("items") if serializer is not None else None
+    if items is None:
+        return None
+    product = items.child.fields.get("product")
+    return product if isinstance(product, serializers.BaseSerializer) else None
+
+
+def apply_operations(lines, operations):
+    """
+    Fold validated cart ``operations`` into ``lines``, a dict of
+    ``{product_id: (quantity, price)}``, in order. ``add`` adds to the
+    quantity and takes the product's current price, ``set`` replaces the
+    quantity (adding the product if needed) and ``remove`` drops the line.
+    """
+    lines = dict(lines)
+    for operation in operations:
+        product_id = operation["product_id"]
+        if operation["op"] == "remove":
+            lines.pop(product_id, None)
+        elif operation["op"] == "add":
+            quantity = lines[product_id][0] if product_id in lines else 0
+            lines[product_id] = (quantity + operation["quantity"], operation["price"])
+        else:
+            price = lines[product_id][1] if product_id in lines else operation["price"]
+            lines[product_id] = (operation["quantity"], price)
+    return lines
+
+
+class DatabaseCartStore:
+    """
+    Reads and writes the ``Cart`` and ``CartItem`` tables on every request.
+    Cart item ids are ``CartItem`` primary keys.
+    """
+
+    def get(self, user, serializer=None):
+        queryset = Cart.objects.filter(user=user)
+        if serializer is not None:
+            queryset = optimize_queryset(queryset, serializer)
+        cart = queryset.first()
+        if cart is None:
+            cart, created = Cart.objects.get_or_create(user=user)
+        return cart
+
+    def get_item(self, user, item_id):
+        return CartItem.objects.select_related("product").get(
+            pk=item_id, cart__user=user, is_active=True, is_deleted=False
+        )
+
+    def add_item(self, user, product, quantity, price):
+        cart, created = Cart.objects.get_or_create(user=user)
+        cart_item, created = CartItem.objects.get_or_create(
+            cart=cart,
+            product=product,
+            defaults={"quantity": quantity, "price": price},
+        )
+        if not created:
+            cart_item.quantity += quantity
+            cart_item.price = price
+            cart_item.save()
+        return cart_item
+
+    def set_quantity(self, user, cart_item, quantity):
+        cart_item.quantity = quantity
+        cart_item.save()
+        return cart_item
+
+    def remove_item(self, user, cart_item):
+        cart_item.delete()
+
+    def clear(self, user):
+        cart, created = Cart.objects.get_or_create(user=user)
+        cart.items.all().delete()
+
+    def apply(self, user, operations):
+        """
+        Apply cart ``operations`` with a fixed number of queries: one read of
+        the affected items, then at most one delete, one bulk update and one
+        bulk insert, in a single transaction.
+        """
+        cart, created = Cart.objects.get_or_create(user=user)
+        existing = {
+            item.product_id: item
+            for item in cart.items.filter(
+                product_id__in={operation["product_id"] for operation in operations}
+            )
+        }
+        lines = apply_operations(
+            {
+                product_id: (item.quantity, item.price)
+                for product_id, item in existing.items()
+                if item.is_active and not item.is_deleted
+            },
+            operations,
+        )
+
+        now = timezone.now()
+        created_items, changed_items = [], []
+        for product_id, (quantity, price) in lines.items():
+            item = existing.get(product_id)
+            if item is None:
+                created_items.append(
+                    CartItem(
+                        cart=cart,
+                        product_id=product_id,
+                        quantity=quantity,
+                        price=price,
+                        subtotal=price * quantity,
+                    )
+                )
+            elif (
+                (item.quantity, item.price) != (quantity, price)
+                or not item.is_active
+                or item.is_deleted
+            ):
+                item.quantity, item.price = quantity, price
+                item.subtotal = price * quantity
+                item.is_active, item.is_deleted = True, False
+                item.updated_at = now
+                changed_items.append(item)
+        removed = [
+            item.pk for product_id, item in existing.items() if product_id not in lines
+        ]
+
+        with transaction.atomic():
+            if removed:
+                CartItem.objects.filter(pk__in=removed).delete()
+            if changed_items:
+                CartItem.objects.bulk_update(changed_items, CART_ITEM_UPDATE_FIELDS)
+            if created_items:
+                # Conflicts only arise from a concurrent request adding the
+                # same product; the batch wins.
+                CartItem.objects.bulk_create(
+                    created_items,
+                    update_conflicts=True,
+                    unique_fields=["cart", "product"],
+                    update_fields=CART_ITEM_UPDATE_FIELDS,
+                )
+            Cart.objects.filter(pk=cart.pk).update(updated_at=now)
+
+    def flush(self, user):
+        cart, created = Cart.objects.get_or_create(user=user)
+        return cart
+
+    def discard(self, user):
+        pass
+
+    def flush_dirty(self, idle_timeout=None):
+        return 0
+
+
+class CacheCartStore:
+    """
+    Keeps each working cart in the default cache and writes it to the
+    ``Cart`` and ``CartItem`` tables only when it is flushed: at checkout, and
+    from ``manage.py flush_carts``, which also evicts carts left untouched
+    for ``CART_IDLE_TIMEOUT`` seconds after saving them.
+
+    A cart is read from the tables once, when it is not cached. After that,
+    viewing and editing it costs no cart queries at all, and a cart that is
+    edited many times between flushes is written once. Cart item ids are
+    product ids, which are unique within a cart and survive a flush.
+
+    Every process must share the cache (Redis, Memcached), and it must not
+    evict entries before ``CART_CACHE_TIMEOUT``: changes made since the last
+    flush live only in the cache.
+    """
+
+    def _key(self, user_id):
+        return f"{CART_KEY_PREFIX}:{user_id}"
+
+    @contextmanager
+    def _locked(self, key):
+        # cache.add() is atomic on every backend, so it can serve as a lock.
+        lock_key = f"{key}:lock"
+        deadline = time.monotonic() + LOCK_WAIT
+        while not cache.add(lock_key, True, timeout=LOCK_TIMEOUT):
+            if time.monotonic() >= deadline:
+                raise CartBusy()
+            time.sleep(POLL_INTERVAL)
+        try:
+            yield
+        finally:
+            cache.delete(lock_key)
+
+    def _read(self, user_id):
+        cart, created = Cart.objects.get_or_create(user_id=user_id)
+        lines = cart.items.filter(is_active=True, is_deleted=False).order_by(
+            "created_at", "id"
+        )
+        return {
+            "cart_id": cart.pk,
+            "created_at": cart.created_at,
+            "updated_at": cart.updated_at,
+            "dirty": False,
+            "items": list(
+                lines.values("product_id", "quantity", "price", "created_at")
+            ),
+        }
+
+    def _state(self, user_id):
+        state = cache.get(self._key(user_id))
+        if state is None:
+            state = self._read(user_id)
+            # add(), not set(): a writer may have cached a newer copy since.
+            if not cache.add(self._key(user_id), state, settings.CART_CACHE_TIMEOUT):
+                state = cache.get(self._key(user_id), state)
+        return state
+
+    def _write(self, user_id, state):
+        if not state["dirty"]:
+            state["dirty"] = True
+            self._mark_dirty(user_id)
+        state["updated_at"] = timezone.now()
+        cache.set(self._key(user_id), state, settings.CART_CACHE_TIMEOUT)
+
+    def _mark_dirty(self, user_id):
+        # Only the first change after a flush gets here, so this lock is
+        # taken about once per cart per flush interval.
+        with self._locked(DIRTY_KEY):
+            dirty = cache.get(DIRTY_KEY, set())
+            dirty.add(user_id)
+            cache.set(DIRTY_KEY, dirty, timeout=None)
+
+    def _item(self, cart, line, product=None):
+        item = CartItem(
+            id=line["product_id"],
+            cart=cart,
+            product_id=line["product_id"],
+            quantity=line["quantity"],
+            price=line["price"],
+            subtotal=line["price"] * line["quantity"],
+            created_at=line["created_at"],
+            updated_at=cart.updated_at,
+        )
+        if product is not None:
+            item.product = product
+        return item
+
+    def _cart(self, user, state):
+        return Cart(
+            id=state["cart_id"],
+            user=user,
+            created_at=state["created_at"],
+            updated_at=state["updated_at"],
+        )
+
+    def get(self, user, serializer=None):
+        state = self._state(user.pk)
+        cart = self._cart(user, state)
+        product_serializer = _product_serializer(serializer)
+        products = None
+        if product_serializer is not None:
+            queryset = optimize_queryset(Product.objects.all(), product_serializer)
+            products = queryset.in_bulk([line["product_id"] for line in state["items"]])
+        items = []
+        for line in state["items"]:
+            product = None
+            if products is not None:
+                product = products.get(line["product_id"])
+                if product is None:
+                    continue
+            items.append(self._item(cart, line, product))
+        # Served to CartSerializer and Cart.calculate_total() by cart.items.all().
+        cart._prefetched_objects_cache = {"items": items}
+        return cart
+
+    def get_item(self, user, item_id):
+        state = self._state(user.pk)
+        line = next(
+            (line for line in state["items"] if line["product_id"] == item_id), None
+        )
+        product = Product.objects.filter(pk=item_id).first() if line else None
+        if product is None:
+            raise CartItem.DoesNotExist()
+        return self._item(self._cart(user, state), line, product)
+
+    def add_item(self, user, product, quantity, price):
+        key = self._key(user.pk)
+        with self._locked(key):
+            state = self._state(user.pk)
+            for line in state["items"]:
+                if line["product_id"] == product.pk:
+                    line["quantity"] += quantity
+                    line["price"] = price
+                    break
+            else:
+                line = {
+                    "product_id": product.pk,
+                    "quantity": quantity,
+                    "price": price,
+                    "created_at": timezone.now(),
+                }
+                state["items"].append(line)
+            self._write(user.pk, state)
+        return self._item(self._cart(user, state), line, product)
+
+    def set_quantity(self, user, cart_item, quantity):
+        with self._locked(self._key(user.pk)):
+            state = self._state(user.pk)
+            for line in state["items"]:
+                if line["product_id"] == cart_item.product_id:
+                    line["quantity"] = quantity
+                    break
+            else:
+                raise CartItem.DoesNotExist()
+            self._write(user.pk, state)
+        return self._item(self._cart(user, state), line, cart_item.product)
+
+    def remove_item(self, user, cart_item):
+        with self._locked(self._key(user.pk)):
+            state = self._state(user.pk)
+            state["items"] = [
+                line
+                for line in state["items"]
+                if line["product_id"] != cart_item.product_id
+            ]
+            self._write(user.pk, state)
+
+    def clear(self, user):
+        with self._locked(self._key(user.pk)):
+            state = self._state(user.pk)
+            state["items"] = []
+            self._write(user.pk, state)
+
+    def apply(self, user, operations):
+        with self._locked(self._key(user.pk)):
+            state = self._state(user.pk)
+            existing = {line["product_id"]: line for line in state["items"]}
+            lines = apply_operations(
+                {
+                    product_id: (line["quantity"], line["price"])
+                    for product_id, line in existing.items()
+                },
+                operations,
+            )
+            now = timezone.now()
+            state["items"] = [
+                {
+                    "product_id": product_id,
+                    "quantity": quantity,
+                    "price": price,
+                    "created_at": existing[product_id]["created_at"]
+                    if product_id in existing
+                    else now,
+                }
+                for product_id, (quantity, price) in lines.items()
+            ]
+            self._write(user.pk, state)
+
+    def _persist(self, state):
+        # Lines whose product has since been deleted are dropped.
+        product_ids = set(
+            Product.objects.filter(
+                pk__in=[line["product_id"] for line in state["items"]]
+            ).values_list("pk", flat=True)
+        )
+        items = [
+            CartItem(
+                cart_id=state["cart_id"],
+                product_id=line["product_id"],
+                quantity=line["quantity"],
+                price=line["price"],
+                subtotal=line["price"] * line["quantity"],
+            )
+            for line in state["items"]
+            if line["product_id"] in product_ids
+        ]
+        with transaction.atomic():
+            CartItem.objects.filter(cart_id=state["cart_id"]).exclude(
+                product_id__in=product_ids
+            ).delete()
+            if items:
+                CartItem.objects.bulk_create(
+                    items,
+                    update_conflicts=True,
+                    unique_fields=["cart", "product"],
+                    update_fields=CART_ITEM_UPDATE_FIELDS,
+                )
+            Cart.objects.filter(pk=state["cart_id"]).update(
+                updated_at=state["updated_at"]
+            )
+
+    def _flush(self, user_id, evict_before=None):
+        key = self._key(user_id)
+        with self._locked(key):
+            state = cache.get(key)
+            if state is None:
+                return None, False
+            saved = state["dirty"]
+            if saved:
+                self._persist(state)
+                state["dirty"] = False
+            if evict_before is not None and state["updated_at"] < evict_before:
+                cache.delete(key)
+            else:
+                cache.set(key, state, settings.CART_CACHE_TIMEOUT)
+        return state, saved
+
+    def flush(self, user):
+        """
+        Save the user's cart to the tables and return its ``Cart`` row.
+        """
+        state, saved = self._flush(user.pk)
+        if state is None:
+            return Cart.objects.get_or_create(user=user)[0]
+        return self._cart(user, state)
+
+    def discard(self, user):
+        """
+        Drop the cached copy after the tables were changed directly, e.g. a
+        checkout clearing the cart.
+        """
+        with self._locked(self._key(user.pk)):
+            cache.delete(self._key(user.pk))
+
+    def flush_dirty(self, idle_timeout=None):
+        """
+        Save every cart changed since it was last flushed, and evict the ones
+        among them untouched for ``idle_timeout`` seconds (default
+        ``CART_IDLE_TIMEOUT``). Returns the number of carts saved.
+        """
+        if idle_timeout is None:
+            idle_timeout = settings.CART_IDLE_TIMEOUT
+        evict_before = timezone.now() - datetime.timedelta(seconds=idle_timeout)
+        with self._locked(DIRTY_KEY):
+            dirty = cache.get(DIRTY_KEY, set())
+            cache.set(DIRTY_KEY, set(), timeout=None)
+
+        flushed = 0
+        pending = sorted(dirty)
+        try:
+            while pending:
+                state, saved = self._flush(pending[0], evict_before)
+                flushed += saved
+                pending.pop(0)
+        finally:
+            # Carts that failed to save are retried on the next run.
+            if pending:
+                with self._locked(DIRTY_KEY):
+                    cache.set(
+                        DIRTY_KEY, cache.get(DIRTY_KEY, set()) | set(pending), None
+                    )
+        return flushed
@@ -3,54 +3,50 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.exceptions import PermissionDenied
-from django.shortcuts import get_object_or_404
-from order_management.models import Cart, CartItem, Order, OrderItem
+from django.http import Http404
+from common.idempotency import idempotent
+from common.serializers import optimize_queryset
+from order_management.cart_store import get_cart_store
+from order_management.models import CartItem, Order
 from order_management.serializers import (
+    CartBatchSerializer,
     CartSerializer,
     CartItemSerializer,
     CartItemCreateSerializer,
     CartToOrderSerializer,
     OrderSerializer,
 )
-from product_management.models import Product
+from order_management.checkout_service import CheckoutError, place_order
 
 
 class CartView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        cart, created = Cart.objects.get_or_create(user=request.user)
-        serializer = CartSerializer(cart, context={"request": request})
+        context = {"request": request}
+        cart = get_cart_store().get(
+            request.user, serializer=CartSerializer(context=context)
+        )
+        serializer = CartSerializer(cart, context=context)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
     def post(self, request):
-        cart, created = Cart.objects.get_or_create(user=request.user)
         serializer = CartItemCreateSerializer(data=request.data)
         
         if serializer.is_valid():
-            product = serializer.validated_data["product"]
-            quantity = serializer.validated_data["quantity"]
-            price = serializer.validated_data["price"]
-
-            cart_item, created = CartItem.objects.get_or_create(
-                cart=cart,
-                product=product,
-                defaults={"quantity": quantity, "price": price},
+            cart_item = get_cart_store().add_item(
+                request.user,
+                serializer.validated_data["product"],
+                serializer.validated_data["quantity"],
+                serializer.validated_data["price"],
             )
-
-            if not created:
-                cart_item.quantity += quantity
-                cart_item.price = price
-                cart_item.save()
-
             response_serializer = CartItemSerializer(cart_item, context={"request": request})
             return Response(response_serializer.data, status=status.HTTP_201_CREATED)
         
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
     def delete(self, request):
-        cart, created = Cart.objects.get_or_create(user=request.user)
-        cart.items.all().delete()
+        get_cart_store().clear(request.user)
         return Response(
             {"message": "Cart cleared successfully"}, status=status.HTTP_200_OK
         )
@@ -60,10 +56,16 @@ class CartItemView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get_object(self, pk, user):
-        cart_item = get_object_or_404(
-            CartItem, pk=pk, cart__user=user, is_active=True, is_deleted=False
-        )
-        return cart_item
+        try:
+            return get_cart_store().get_item(user, pk)
+        except CartItem.DoesNotExist:
+            raise Http404("No CartItem matches the given query.")
+
+    def set_quantity(self, user, cart_item, quantity):
+        try:
+            return get_cart_store().set_quantity(user, cart_item, quantity)
+        except CartItem.DoesNotExist:
+            raise Http404("No CartItem matches the given query.")
 
     def put(self, request, pk):
         cart_item = self.get_object(pk, request.user)
@@ -87,8 +89,7 @@ class CartItemView(APIView):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        cart_item.quantity = quantity
-        cart_item.save()
+        cart_item = self.set_quantity(request.user, cart_item, quantity)
 
         serializer = CartItemSerializer(cart_item, context={"request": request})
         return Response(serializer.data, status=status.HTTP_200_OK)
@@ -109,26 +110,44 @@ class CartItemView(APIView):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        cart_item.quantity = quantity
-        cart_item.save()
+        cart_item = self.set_quantity(request.user, cart_item, quantity)
 
         serializer = CartItemSerializer(cart_item, context={"request": request})
         return Response(serializer.data, status=status.HTTP_200_OK)
 
     def delete(self, request, pk):
         cart_item = self.get_object(pk, request.user)
-        cart_item.delete()
+        get_cart_store().remove_item(request.user, cart_item)
         return Response(
             {"message": "Cart item removed successfully"}, status=status.HTTP_200_OK
         )
 
 
+class CartBatchView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        serializer = CartBatchSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        store = get_cart_store()
+        store.apply(request.user, serializer.validated_data["operations"])
+        context = {"request": request}
+        cart = store.get(request.user, serializer=CartSerializer(context=context))
+        response_serializer = CartSerializer(cart, context=context)
+        return Response(response_serializer.data, status=status.HTTP_200_OK)
+
+
 class CartToOrderView(APIView):
     permission_classes = [IsAuthenticated]
 
+    @idempotent
     def post(self, request):
-        cart, created = Cart.objects.get_or_create(user=request.user)
-        
+        # The checkout reads the cart from the tables, so save it there first.
+        store = get_cart_store()
+        cart = store.flush(request.user)
+
         if not cart.items.exists():
             return Response(
                 {"error": "Cart is empty"}, status=status.HTTP_400_BAD_REQUEST
@@ -142,37 +161,27 @@ class CartToOrderView(APIView):
         billing_address = serializer.validated_data.get("billing_address", "")
         clear_cart = serializer.validated_data.get("clear_cart", True)
 
-        order = Order.objects.create(
-            customer=request.user,
-            shipping_address=shipping_address,
-            billing_address=billing_address,
-        )
-
-        for cart_item in cart.items.all():
-            if cart_item.product.stock_quantity < cart_item.quantity:
-                order.delete()
-                return Response(
-                    {
-                        "error": f"Insufficient stock for {cart_item.product.name}",
-                    },
-                    status=status.HTTP_400_BAD_REQUEST,
-                )
-
-            cart_item.product.stock_quantity -= cart_item.quantity
-            cart_item.product.save()
-
-            OrderItem.objects.create(
-                order=order,
-                product=cart_item.product,
-                quantity=cart_item.quantity,
-                price=cart_item.price,
+        lines = [
+            (cart_item.product, cart_item.quantity, cart_item.price)
+            for cart_item in cart.items.select_related("product")
+        ]
+        try:
+            order = place_order(
+                request.user,
+                lines,
+                shipping_address=shipping_address,
+                billing_address=billing_address,
+                cart=cart if clear_cart else None,
             )
-
-        order.calculate_total()
-
+        except CheckoutError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
         if clear_cart:
-            cart.items.all().delete()
+            store.discard(request.user)
 
-        response_serializer = OrderSerializer(order, context={"request": request})
+        context = {"request": request}
+        order = optimize_queryset(
+            Order.objects.filter(pk=order.pk), OrderSerializer(context=context)
+        ).get()
+        response_serializer = OrderSerializer(order, context=context)
         return Response(response_serializer.data, status=status.HTTP_201_CREATED)
 
@@ -0,0 +1,73 @@
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+from order_management.models import Order, OrderItem, OrderSummary
+from product_management.models import Product
+from product_management.stock_service import InsufficientStock, decrement_stock
+
+
+class CheckoutError(Exception):
+    pass
+
+
+def load_products(product_ids):
+    """
+    Fetch the live products among ``product_ids`` in one query, keyed by id.
+    """
+    return Product.objects.filter(
+        id__in=set(product_ids), is_active=True, is_deleted=False
+    ).in_bulk()
+
+
+def place_order(customer, lines, shipping_address="", billing_address="", cart=None):
+    """
+    Create an order from ``(product, quantity, price)`` lines.
+
+    Everything runs in one transaction with a fixed number of queries: the
+    order insert, one guarded stock UPDATE for all products, one bulk insert
+    of the items, one aggregate for the total and the order's summary row.
+    If ``cart`` is given its items are cleared in the same transaction.
+    Raises ``CheckoutError`` and changes nothing if any product is short on
+    stock.
+    """
+    lines = list(lines)
+    try:
+        with transaction.atomic():
+            order = Order.objects.create(
+                customer=customer,
+                shipping_address=shipping_address,
+                billing_address=billing_address,
+            )
+            decrement_stock((product.pk, quantity) for product, quantity, _ in lines)
+            OrderItem.objects.bulk_create(
+                [
+                    OrderItem(
+                        order=order,
+                        product=product,
+                        quantity=quantity,
+                        price=price,
+                        subtotal=price * quantity,
+                    )
+                    for product, quantity, price in lines
+                ]
+            )
+
+            total = order.items.aggregate(total=Sum("subtotal"))["total"]
+            order.total_amount = total or Decimal("0.00")
+            order.updated_at = timezone.now()
+            # update() skips Order.save(), which re-reads the order to track
+            # status changes that cannot happen here.
+            Order.objects.filter(pk=order.pk).update(
+                total_amount=order.total_amount, updated_at=order.updated_at
+            )
+            OrderSummary.refresh([order.pk])
+
+            if cart is not None:
+                cart.items.all().delete()
+    except InsufficientStock as e:
+        product = next(
+            product for product, _, _ in lines if product.pk in e.product_ids
+        )
+        raise CheckoutError(f"Insufficient stock for {product.name}")
+    return order
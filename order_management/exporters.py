@@ -0,0 +1,118 @@
+from django.db.models import Prefetch
+from common.streaming import csv_value, csv_writer, ndjson_line
+from order_management.models import Order, OrderItem
+
+DEFAULT_CHUNK_SIZE = 1000
+FORMATS = ("csv", "ndjson")
+CONTENT_TYPES = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+ORDER_COLUMNS = (
+    "order_id",
+    "order_number",
+    "customer_email",
+    "status",
+    "total_amount",
+    "created_at",
+    "updated_at",
+)
+LINE_COLUMNS = (
+    "product_id",
+    "product_slug",
+    "product_name",
+    "quantity",
+    "price",
+    "subtotal",
+)
+
+
+def iter_orders(queryset=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Yield ``(order, lines)`` for every order in ``queryset`` (default: all
+    live orders), as dicts of ``ORDER_COLUMNS`` and ``LINE_COLUMNS``.
+
+    Orders are read ``chunk_size`` at a time through a server-side cursor
+    where the database supports one, with the customer joined in and the
+    items of each chunk prefetched in one query.
+    """
+    if queryset is None:
+        queryset = Order.objects.filter(is_active=True, is_deleted=False)
+    items = OrderItem.objects.select_related("product").only(
+        "order_id",
+        "product_id",
+        "product__slug",
+        "product__name",
+        "quantity",
+        "price",
+        "subtotal",
+    )
+    orders = (
+        queryset.order_by("id")
+        .select_related("customer")
+        .only(
+            "id",
+            "order_number",
+            "customer__email",
+            "status",
+            "total_amount",
+            "created_at",
+            "updated_at",
+        )
+        .prefetch_related(Prefetch("items", queryset=items))
+        .iterator(chunk_size=chunk_size)
+    )
+    for order in orders:
+        yield (
+            {
+                "order_id": order.pk,
+                "order_number": order.order_number,
+                "customer_email": order.customer.email,
+                "status": order.status,
+                "total_amount": order.total_amount,
+                "created_at": order.created_at,
+                "updated_at": order.updated_at,
+            },
+            [
+                {
+                    "product_id": item.product_id,
+                    "product_slug": item.product.slug,
+                    "product_name": item.product.name,
+                    "quantity": item.quantity,
+                    "price": item.price,
+                    "subtotal": item.subtotal,
+                }
+                for item in order.items.all()
+            ],
+        )
+
+
+def iter_csv(orders):
+    # One row per order line, with the order's columns repeated. Orders
+    # without items get a single row with empty line columns.
+    writer = csv_writer()
+    yield writer.writerow(ORDER_COLUMNS + LINE_COLUMNS)
+    empty_line = [""] * len(LINE_COLUMNS)
+    for order, lines in orders:
+        order_values = [csv_value(value) for value in order.values()]
+        if not lines:
+            yield writer.writerow(order_values + empty_line)
+        for line in lines:
+            yield writer.writerow(
+                order_values + [csv_value(value) for value in line.values()]
+            )
+
+
+def iter_ndjson(orders):
+    for order, lines in orders:
+        yield ndjson_line({**order, "items": lines})
+
+
+def export_orders(file_format, queryset=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Return a generator of text chunks with the orders in ``file_format``.
+    Memory use does not depend on how many orders are exported.
+    """
+    orders = iter_orders(queryset=queryset, chunk_size=chunk_size)
+    if file_format == "csv":
+        return iter_csv(orders)
+    if file_format == "ndjson":
+        return iter_ndjson(orders)
+    raise ValueError(f"Unsupported export format: {file_format}")
@@ -0,0 +1,28 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from order_management.archive_service import DEFAULT_BATCH_SIZE, archive_orders
+
+
+class Command(BaseCommand):
+    help = "Move old completed and cancelled orders to the archive tables"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--older-than-days",
+            type=int,
+            default=settings.ORDER_ARCHIVE_AFTER_DAYS,
+            help="Archive orders created more than this many days ago",
+        )
+        parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        if options["older_than_days"] < 0:
+            raise CommandError("--older-than-days cannot be negative")
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size must be at least 1")
+
+        archived = archive_orders(
+            older_than_days=options["older_than_days"],
+            batch_size=options["batch_size"],
+        )
+        self.stdout.write(f"Archived {archived} order(s)")
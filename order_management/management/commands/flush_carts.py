@@ -0,0 +1,22 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from order_management.cart_store import get_cart_store
+
+
+class Command(BaseCommand):
+    help = "Save carts changed in the cache to the cart tables"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--idle-timeout",
+            type=int,
+            default=settings.CART_IDLE_TIMEOUT,
+            help="Evict saved carts untouched for this many seconds",
+        )
+
+    def handle(self, *args, **options):
+        if options["idle_timeout"] < 0:
+            raise CommandError("--idle-timeout cannot be negative")
+
+        flushed = get_cart_store().flush_dirty(idle_timeout=options["idle_timeout"])
+        self.stdout.write(f"Saved {flushed} cart(s)")
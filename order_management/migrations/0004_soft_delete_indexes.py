@@ -0,0 +1,40 @@
+# Generated by Django 5.2.8 on 2026-10-18 01:03
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('order_management', '0003_cart_cartitem'),
+        ('product_management', '0003_soft_delete_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cartitem',
+            index=models.Index(fields=['cart', 'created_at'], name='cartitem_cart_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(condition=models.Q(('is_active', True), ('is_deleted', False)), fields=['customer', '-created_at'], name='order_live_customer_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(condition=models.Q(('is_active', True), ('is_deleted', False)), fields=['status', '-created_at'], name='order_live_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(condition=models.Q(('is_active', True), ('is_deleted', False)), fields=['-created_at'], name='order_live_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(condition=models.Q(('is_active', True), ('is_deleted', False)), fields=['stripe_payment_intent_id'], name='order_live_payment_intent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='orderitem',
+            index=models.Index(fields=['order', 'created_at'], name='orderitem_order_created_idx'),
+        ),
+    ]
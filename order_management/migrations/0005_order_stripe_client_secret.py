@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 01:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('order_management', '0004_soft_delete_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='stripe_client_secret',
+            field=models.CharField(blank=True, max_length=255, null=True),
+        ),
+    ]
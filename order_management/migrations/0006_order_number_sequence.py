@@ -0,0 +1,45 @@
+# Generated by Django 5.2.8 on 2026-10-18 01:23
+
+import re
+from django.db import migrations, models
+
+
+def start_order_numbers(apps, schema_editor):
+    # Continue above the clock-based ORD-<timestamp> numbers issued so far.
+    Order = apps.get_model("order_management", "Order")
+    OrderNumberCounter = apps.get_model("order_management", "OrderNumberCounter")
+    highest = 0
+    for order_number in Order.objects.values_list("order_number", flat=True):
+        match = re.match(r"^ORD-(\d+)$", order_number or "")
+        if match:
+            highest = max(highest, int(match.group(1)))
+
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(
+            f"CREATE SEQUENCE order_number_seq INCREMENT BY 50 START WITH {highest + 1}"
+        )
+    else:
+        OrderNumberCounter.objects.create(pk=1, last_value=highest)
+
+
+def drop_order_number_sequence(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute("DROP SEQUENCE IF EXISTS order_number_seq")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('order_management', '0005_order_stripe_client_secret'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderNumberCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_value', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(start_order_numbers, drop_order_number_sequence),
+    ]
@@ -0,0 +1,100 @@
+# Generated by Django 5.2.8 on 2026-10-18 01:30
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def build_summaries(apps, schema_editor):
+    Order = apps.get_model("order_management", "Order")
+    OrderItem = apps.get_model("order_management", "OrderItem")
+    OrderSummary = apps.get_model("order_management", "OrderSummary")
+    Product = apps.get_model("product_management", "Product")
+
+    first_product = (
+        OrderItem.objects.filter(order=OuterRef("pk"))
+        .order_by("created_at", "id")
+        .values("product_id")[:1]
+    )
+    orders = (
+        Order.objects.select_related("customer")
+        .annotate(
+            quantity=Coalesce(Sum("items__quantity"), 0),
+            first_product_id=Subquery(first_product),
+        )
+        .order_by("pk")
+    )
+    batch = []
+    for order in orders.iterator(chunk_size=1000):
+        batch.append(order)
+        if len(batch) == 1000:
+            _create_summaries(Product, OrderSummary, batch)
+            batch = []
+    _create_summaries(Product, OrderSummary, batch)
+
+
+def _create_summaries(Product, OrderSummary, orders):
+    products = Product.objects.in_bulk({order.first_product_id for order in orders})
+    summaries = []
+    for order in orders:
+        product = products.get(order.first_product_id)
+        thumbnail = ""
+        if product is not None:
+            files = (product.image_variants or {}).get("files", {})
+            thumbnail = files.get("thumbnail") or (product.image.name or "")
+        summaries.append(
+            OrderSummary(
+                order_id=order.pk,
+                customer_id=order.customer_id,
+                customer_email=order.customer.email,
+                order_number=order.order_number,
+                status=order.status,
+                total_amount=order.total_amount,
+                item_count=order.quantity,
+                first_item_name=product.name if product else "",
+                first_item_thumbnail=thumbnail,
+                is_active=order.is_active,
+                is_deleted=order.is_deleted,
+                created_at=order.created_at,
+                updated_at=order.updated_at,
+            )
+        )
+    OrderSummary.objects.bulk_create(summaries)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('order_management', '0007_order_archive'),
+        ('product_management', '0004_product_image_variants'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderSummary',
+            fields=[
+                ('order', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='summary', serialize=False, to='order_management.order')),
+                ('customer_email', models.EmailField(max_length=254)),
+                ('order_number', models.CharField(max_length=50)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('completed', 'Completed'), ('cancelled', 'Cancelled')], max_length=20)),
+                ('total_amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('item_count', models.PositiveIntegerField(default=0)),
+                ('first_item_name', models.CharField(blank=True, max_length=255)),
+                ('first_item_thumbnail', models.ImageField(blank=True, max_length=255, upload_to='')),
+                ('is_active', models.BooleanField(default=True)),
+                ('is_deleted', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('customer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='order_summaries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name_plural': 'order summaries',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(condition=models.Q(('is_active', True), ('is_deleted', False)), fields=['customer', '-created_at'], name='summary_live_customer_idx'), models.Index(condition=models.Q(('is_active', True), ('is_deleted', False)), fields=['status', '-created_at'], name='summary_live_status_idx'), models.Index(condition=models.Q(('is_active', True), ('is_deleted', False)), fields=['-created_at'], name='summary_live_created_idx')],
+            },
+        ),
+        migrations.RunPython(build_summaries, migrations.RunPython.noop),
+    ]
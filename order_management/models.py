@@ -1,9 +1,16 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
 from django.conf import settings
 from decimal import Decimal
-import time
-from common.models import BaseModel
+from common.models import BaseModel, LIVE_ROWS
+from order_management.order_numbers import next_order_number
 from product_management.models import Product
+from product_management.stock_service import (
+    adjust_stock,
+    decrement_stock,
+    restore_stock,
+)
 
 
 class Order(BaseModel):
@@ -13,6 +20,14 @@ class Order(BaseModel):
         ("completed", "Completed"),
         ("cancelled", "Cancelled"),
     ]
+    # Allowed status changes. Leaving or re-entering "cancelled" puts the
+    # items back into stock or takes them out again.
+    TRANSITIONS = {
+        "pending": {"processing", "completed", "cancelled"},
+        "processing": {"completed", "cancelled"},
+        "completed": {"cancelled"},
+        "cancelled": {"pending", "completed"},
+    }
 
     customer = models.ForeignKey(
         settings.AUTH_USER_MODEL,
@@ -27,41 +42,99 @@ class Order(BaseModel):
     shipping_address = models.TextField(blank=True)
     billing_address = models.TextField(blank=True)
     stripe_payment_intent_id = models.CharField(max_length=255, blank=True, null=True)
+    stripe_client_secret = models.CharField(max_length=255, blank=True, null=True)
     stripe_customer_id = models.CharField(max_length=255, blank=True, null=True)
     crm_sync_status = models.CharField(max_length=20, blank=True, null=True)
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            models.Index(
+                fields=["customer", "-created_at"],
+                name="order_live_customer_idx",
+                condition=LIVE_ROWS,
+            ),
+            models.Index(
+                fields=["status", "-created_at"],
+                name="order_live_status_idx",
+                condition=LIVE_ROWS,
+            ),
+            models.Index(
+                fields=["-created_at"],
+                name="order_live_created_idx",
+                condition=LIVE_ROWS,
+            ),
+            models.Index(
+                fields=["stripe_payment_intent_id"],
+                name="order_live_payment_intent_idx",
+                condition=LIVE_ROWS,
+            ),
+        ]
 
     def __str__(self):
         return f"Order {self.order_number} - {self.customer.email}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if "status" in field_names:
+            instance._saved_status = instance.status
+        return instance
+
+    @classmethod
+    def can_transition(cls, old_status, new_status):
+        return new_status in cls.TRANSITIONS.get(old_status, ())
+
+    def _previous_status(self):
+        if self._state.adding:
+            return None
+        if hasattr(self, "_saved_status"):
+            return self._saved_status
+        return Order.objects.filter(pk=self.pk).values_list("status", flat=True).first()
+
     def save(self, *args, **kwargs):
         if not self.order_number:
-            self.order_number = f"ORD-{int(time.time())}"
-        
-        if self.pk:
-            try:
-                old_order = Order.objects.get(pk=self.pk)
-                if old_order.status != "cancelled" and self.status == "cancelled":
+            self.order_number = next_order_number()
+
+        adding = self._state.adding
+        update_fields = kwargs.get("update_fields")
+        previous_status = None
+        if update_fields is None or "status" in update_fields:
+            previous_status = self._previous_status()
+
+        with transaction.atomic():
+            if previous_status is not None and previous_status != self.status:
+                if self.status == "cancelled":
                     self._restore_stock()
-                elif old_order.status == "cancelled" and self.status != "cancelled":
+                elif previous_status == "cancelled":
                     self._decrement_stock()
-            except Order.DoesNotExist:
-                pass
-        
-        super().save(*args, **kwargs)
-    
+            super().save(*args, **kwargs)
+            if adding:
+                OrderSummary.refresh([self.pk])
+            else:
+                self._update_summary()
+        self._saved_status = self.status
+
+    def _update_summary(self):
+        # Only the order's own columns; item changes go through
+        # OrderSummary.refresh(), which also builds a missing row (orders
+        # inserted with bulk_create, or before summaries existed).
+        updated = OrderSummary.objects.filter(order_id=self.pk).update(
+            order_number=self.order_number,
+            status=self.status,
+            total_amount=self.total_amount,
+            is_active=self.is_active,
+            is_deleted=self.is_deleted,
+            updated_at=self.updated_at,
+        )
+        if not updated:
+            OrderSummary.refresh([self.pk])
+
     def _restore_stock(self):
-        for item in self.items.all():
-            item.product.stock_quantity += item.quantity
-            item.product.save()
+        restore_stock(self.items.values_list("product_id", "quantity"))
     
     def _decrement_stock(self):
-        for item in self.items.all():
-            if item.product.stock_quantity >= item.quantity:
-                item.product.stock_quantity -= item.quantity
-                item.product.save()
+        decrement_stock(self.items.values_list("product_id", "quantity"), strict=False)
 
     def calculate_total(self):
         total = sum(item.subtotal for item in self.items.all())
@@ -70,6 +143,18 @@ class Order(BaseModel):
         return total
 
 
+class OrderNumberCounter(models.Model):
+    """
+    Last order number handed out, on databases without sequences. PostgreSQL
+    uses the ``order_number_seq`` sequence instead; see ``order_numbers``.
+    """
+
+    last_value = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"Order number counter at {self.last_value}"
+
+
 class OrderItem(BaseModel):
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name="items")
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
@@ -79,6 +164,11 @@ class OrderItem(BaseModel):
 
     class Meta:
         ordering = ["created_at"]
+        indexes = [
+            models.Index(
+                fields=["order", "created_at"], name="orderitem_order_created_idx"
+            ),
+        ]
 
     def __str__(self):
         return (
@@ -90,22 +180,240 @@ class OrderItem(BaseModel):
             try:
                 old_item = OrderItem.objects.get(pk=self.pk)
                 if old_item.quantity != self.quantity:
-                    old_item.product.stock_quantity += old_item.quantity
-                    if old_item.product.stock_quantity >= self.quantity:
-                        old_item.product.stock_quantity -= self.quantity
-                    old_item.product.save()
+                    adjust_stock(
+                        [(old_item.product_id, old_item.quantity - self.quantity)],
+                        strict=False,
+                    )
             except OrderItem.DoesNotExist:
                 pass
         
         self.subtotal = self.price * self.quantity
         super().save(*args, **kwargs)
         self.order.calculate_total()
+        OrderSummary.refresh([self.order_id])
     
     def delete(self, *args, **kwargs):
         if self.order.status != "cancelled":
-            self.product.stock_quantity += self.quantity
-            self.product.save()
-        super().delete(*args, **kwargs)
+            restore_stock([(self.product_id, self.quantity)])
+        result = super().delete(*args, **kwargs)
+        OrderSummary.refresh([self.order_id])
+        return result
+
+
+class OrderSummary(models.Model):
+    """
+    One row per order with what order lists show, so they can be rendered
+    from this table alone. Kept in step with ``Order`` in the same
+    transactions: checkout creates it, status changes and item edits
+    update it, and it is deleted with its order.
+    """
+
+    SUMMARY_FIELDS = (
+        "customer",
+        "customer_email",
+        "order_number",
+        "status",
+        "total_amount",
+        "item_count",
+        "first_item_name",
+        "first_item_thumbnail",
+        "is_active",
+        "is_deleted",
+        "created_at",
+        "updated_at",
+    )
+
+    order = models.OneToOneField(
+        Order, on_delete=models.CASCADE, primary_key=True, related_name="summary"
+    )
+    customer = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="order_summaries",
+    )
+    customer_email = models.EmailField()
+    order_number = models.CharField(max_length=50)
+    status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES)
+    total_amount = models.DecimalField(max_digits=10, decimal_places=2)
+    # Total quantity over all items.
+    item_count = models.PositiveIntegerField(default=0)
+    first_item_name = models.CharField(max_length=255, blank=True)
+    first_item_thumbnail = models.ImageField(max_length=255, blank=True)
+    is_active = models.BooleanField(default=True)
+    is_deleted = models.BooleanField(default=False)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ["-created_at"]
+        verbose_name_plural = "order summaries"
+        indexes = [
+            models.Index(
+                fields=["customer", "-created_at"],
+                name="summary_live_customer_idx",
+                condition=LIVE_ROWS,
+            ),
+            models.Index(
+                fields=["status", "-created_at"],
+                name="summary_live_status_idx",
+                condition=LIVE_ROWS,
+            ),
+            models.Index(
+                fields=["-created_at"],
+                name="summary_live_created_idx",
+                condition=LIVE_ROWS,
+            ),
+        ]
+
+    def __str__(self):
+        return f"Summary of order {self.order_number}"
+
+    @staticmethod
+    def thumbnail_name(product):
+        if product is None:
+            return ""
+        files = (product.image_variants or {}).get("files", {})
+        return files.get("thumbnail") or (product.image.name if product.image else "")
+
+    @classmethod
+    def refresh(cls, order_ids):
+        """
+        Rebuild the summaries of ``order_ids`` from their orders and items
+        with a fixed number of queries.
+        """
+        first_product = (
+            OrderItem.objects.filter(order=OuterRef("pk"))
+            .order_by("created_at", "id")
+            .values("product_id")[:1]
+        )
+        orders = list(
+            Order.objects.filter(pk__in=list(order_ids))
+            .select_related("customer")
+            .annotate(
+                quantity=Coalesce(Sum("items__quantity"), 0),
+                first_product_id=Subquery(first_product),
+            )
+        )
+        if not orders:
+            return
+        products = Product.objects.only("name", "image", "image_variants").in_bulk(
+            {order.first_product_id for order in orders} - {None}
+        )
+
+        summaries = []
+        for order in orders:
+            product = products.get(order.first_product_id)
+            summaries.append(
+                cls(
+                    order=order,
+                    customer_id=order.customer_id,
+                    customer_email=order.customer.email,
+                    order_number=order.order_number,
+                    status=order.status,
+                    total_amount=order.total_amount,
+                    item_count=order.quantity,
+                    first_item_name=product.name if product else "",
+                    first_item_thumbnail=cls.thumbnail_name(product),
+                    is_active=order.is_active,
+                    is_deleted=order.is_deleted,
+                    created_at=order.created_at,
+                    updated_at=order.updated_at,
+                )
+            )
+        cls.objects.bulk_create(
+            summaries,
+            update_conflicts=True,
+            unique_fields=["order"],
+            update_fields=cls.SUMMARY_FIELDS,
+        )
+
+
+class ArchivedOrder(models.Model):
+    """
+    A completed or cancelled order moved out of ``Order`` by the archiver.
+    Keeps the original id, number and timestamps.
+    """
+
+    id = models.BigIntegerField(primary_key=True)
+    customer = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="archived_orders",
+    )
+    order_number = models.CharField(max_length=50, unique=True)
+    total_amount = models.DecimalField(max_digits=10, decimal_places=2)
+    status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES)
+    shipping_address = models.TextField(blank=True)
+    billing_address = models.TextField(blank=True)
+    stripe_payment_intent_id = models.CharField(max_length=255, blank=True, null=True)
+    stripe_client_secret = models.CharField(max_length=255, blank=True, null=True)
+    stripe_customer_id = models.CharField(max_length=255, blank=True, null=True)
+    crm_sync_status = models.CharField(max_length=20, blank=True, null=True)
+    is_active = models.BooleanField(default=True)
+    is_deleted = models.BooleanField(default=False)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+        indexes = [
+            models.Index(
+                fields=["customer", "-created_at"], name="archived_order_customer_idx"
+            ),
+        ]
+
+    def __str__(self):
+        return f"Archived order {self.order_number}"
+
+
+class ArchivedOrderItem(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    order = models.ForeignKey(
+        ArchivedOrder, on_delete=models.CASCADE, related_name="items"
+    )
+    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    quantity = models.IntegerField()
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+    subtotal = models.DecimalField(max_digits=10, decimal_places=2)
+    is_active = models.BooleanField(default=True)
+    is_deleted = models.BooleanField(default=False)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ["created_at"]
+        indexes = [
+            models.Index(
+                fields=["order", "created_at"], name="archived_item_order_idx"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.quantity} x {self.product_id} - Archived order {self.order_id}"
+
+
+class ArchiveTotals(models.Model):
+    """
+    Running report figures for the live (not soft-deleted) archived orders,
+    updated as orders are archived so reports never scan the archive.
+    """
+
+    total_orders = models.PositiveIntegerField(default=0)
+    completed_orders = models.PositiveIntegerField(default=0)
+    completed_revenue = models.DecimalField(
+        max_digits=14, decimal_places=2, default=Decimal("0.00")
+    )
+
+    class Meta:
+        verbose_name_plural = "archive totals"
+
+    def __str__(self):
+        return f"{self.total_orders} archived orders"
+
+    @classmethod
+    def current(cls):
+        return cls.objects.filter(pk=1).first() or cls(pk=1)
 
 
 class Cart(BaseModel):
@@ -141,6 +449,11 @@ class CartItem(BaseModel):
     class Meta:
         ordering = ["created_at"]
         unique_together = ["cart", "product"]
+        indexes = [
+            models.Index(
+                fields=["cart", "created_at"], name="cartitem_cart_created_idx"
+            ),
+        ]
 
     def __str__(self):
         return f"{self.quantity} x {self.product.name} - Cart {self.cart.id}"
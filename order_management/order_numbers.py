@@ -0,0 +1,103 @@
+import os
+import re
+import threading
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+
+PREFIX = "ORD-"
+SEQUENCE_NAME = "order_number_seq"
+# Numbers a process reserves from the sequence at a time. The migration that
+# creates the sequence uses it as the increment, so changing it needs a new
+# migration with ALTER SEQUENCE.
+BLOCK_SIZE = 50
+COUNTER_ID = 1
+
+_NUMBERED = re.compile(rf"^{PREFIX}(\d+)$")
+
+
+def highest_order_number(order_numbers):
+    """
+    The largest numeric value among existing ``ORD-<n>`` order numbers, so a
+    new sequence can start above every number handed out so far.
+    """
+    highest = 0
+    for order_number in order_numbers:
+        match = _NUMBERED.match(order_number or "")
+        if match:
+            highest = max(highest, int(match.group(1)))
+    return highest
+
+
+class BlockAllocator:
+    """
+    Hands out numbers from blocks of ``block_size`` reserved through
+    ``reserve(block_size)``, which returns the first number of a block no
+    other caller will get.
+
+    Numbers are unique across processes and increase within a process; with
+    several processes they interleave by block. A forked worker never reuses
+    a block reserved by its parent.
+    """
+
+    def __init__(self, reserve, block_size=BLOCK_SIZE):
+        self.reserve = reserve
+        self.block_size = block_size
+        self._lock = threading.Lock()
+        self._pid = None
+        self._next = self._end = 0
+
+    def allocate(self):
+        with self._lock:
+            if self._pid != os.getpid() or self._next >= self._end:
+                start = self.reserve(self.block_size)
+                self._pid = os.getpid()
+                self._next, self._end = start, start + self.block_size
+            value = self._next
+            self._next += 1
+            return value
+
+
+def _reserve_from_sequence(block_size):
+    # nextval() is not transactional: a reserved block stays reserved even if
+    # the order that triggered the reservation is rolled back.
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT nextval(%s)", [SEQUENCE_NAME])
+        return cursor.fetchone()[0]
+
+
+_sequence_allocator = BlockAllocator(_reserve_from_sequence)
+
+
+def _allocate_from_counter():
+    # Without a sequence the increment shares the caller's transaction, so
+    # numbers cannot be cached in blocks: a rollback hands the number back.
+    # Writers are serialized by the row (or, on SQLite, database) lock.
+    from order_management.models import Order, OrderNumberCounter
+
+    counters = OrderNumberCounter.objects
+    with transaction.atomic():
+        if not counters.filter(pk=COUNTER_ID).update(last_value=F("last_value") + 1):
+            numbers = Order.objects.values_list("order_number", flat=True)
+            try:
+                with transaction.atomic():
+                    counters.create(
+                        pk=COUNTER_ID, last_value=highest_order_number(numbers) + 1
+                    )
+            except IntegrityError:
+                counters.filter(pk=COUNTER_ID).update(last_value=F("last_value") + 1)
+        return counters.values_list("last_value", flat=True).get(pk=COUNTER_ID)
+
+
+def next_order_number():
+    """
+    Allocate a unique order number, e.g. ``ORD-1704067201``.
+
+    PostgreSQL uses the ``order_number_seq`` sequence, reserving
+    ``BLOCK_SIZE`` numbers per process so most orders need no round trip.
+    Other databases increment a counter row once per order.
+    """
+    if connection.vendor == "postgresql":
+        value = _sequence_allocator.allocate()
+    else:
+        value = _allocate_from_counter()
+    return f"{PREFIX}{value}"
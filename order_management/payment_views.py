@@ -14,6 +14,7 @@ from order_management.models import Order
 from order_management.serializers import OrderSerializer
 from order_management.stripe_service import confirm_payment_intent, create_customer, create_payment_intent
 from common.email_service import send_payment_confirmation_email
+from common.idempotency import idempotent
 
 stripe.api_key = config("STRIPE_SECRET_KEY", default="")
 
@@ -43,6 +44,7 @@ def sync_to_crm(order):
 class PaymentCreateView(APIView):
     permission_classes = [IsAuthenticated]
 
+    @idempotent
     def post(self, request, order_id):
         order = get_object_or_404(Order, id=order_id, is_active=True, is_deleted=False)
 
@@ -73,21 +75,27 @@ class PaymentCreateView(APIView):
                     }
                 )
                 order.stripe_payment_intent_id = payment_intent.id
+                order.stripe_client_secret = payment_intent.client_secret
                 order.save()
-            else:
+            elif not order.stripe_client_secret:
+                # Intents created before the secret was stored: fetch it once.
                 payment_intent = confirm_payment_intent(order.stripe_payment_intent_id)
+                order.stripe_client_secret = payment_intent.client_secret
+                order.save()
 
             return Response(
                 {
-                    "client_secret": payment_intent.client_secret,
-                    "payment_intent_id": payment_intent.id,
+                    "client_secret": order.stripe_client_secret,
+                    "payment_intent_id": order.stripe_payment_intent_id,
                 },
                 status=status.HTTP_200_OK,
             )
         except Exception as e:
+            # Stripe failed, possibly only for now: a 5xx is not stored under
+            # the Idempotency-Key, so the client can retry with the same key.
             return Response(
                 {"error": str(e)},
-                status=status.HTTP_400_BAD_REQUEST,
+                status=status.HTTP_502_BAD_GATEWAY,
             )
 
 
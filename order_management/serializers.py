@@ -1,9 +1,20 @@
 from rest_framework import serializers
-from order_management.models import Order, OrderItem, Cart, CartItem
+from common.serializers import SparseFieldsMixin
+from order_management.models import (
+    ArchivedOrder,
+    ArchivedOrderItem,
+    Cart,
+    CartItem,
+    Order,
+    OrderItem,
+    OrderSummary,
+)
 from product_management.serializers import ProductSerializer
+from order_management.cart_store import get_cart_store
+from order_management.checkout_service import CheckoutError, load_products, place_order
 
 
-class OrderItemSerializer(serializers.ModelSerializer):
+class OrderItemSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     product = ProductSerializer(read_only=True)
 
     class Meta:
@@ -19,10 +30,15 @@ class OrderItemSerializer(serializers.ModelSerializer):
         read_only_fields = ("subtotal", "created_at")
 
 
-class OrderSerializer(serializers.ModelSerializer):
+class OrderSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     items = OrderItemSerializer(many=True, read_only=True)
     customer_email = serializers.EmailField(source="customer.email", read_only=True)
-    client_secret = serializers.SerializerMethodField()
+    client_secret = serializers.CharField(
+        source="stripe_client_secret", read_only=True, allow_null=True
+    )
+
+    # Only returned with ?expand=client_secret, for the client about to pay.
+    optional_fields = ("client_secret",)
 
     class Meta:
         model = Order
@@ -52,16 +68,13 @@ class OrderSerializer(serializers.ModelSerializer):
             "updated_at",
         )
 
-    def get_client_secret(self, obj):
-        if obj.stripe_payment_intent_id:
-            try:
-                from order_management.stripe_service import confirm_payment_intent
-
-                intent = confirm_payment_intent(obj.stripe_payment_intent_id)
-                return intent.client_secret
-            except Exception:
-                return None
-        return None
+    def validate_status(self, value):
+        current = self.instance.status if self.instance is not None else None
+        if current and value != current and not Order.can_transition(current, value):
+            raise serializers.ValidationError(
+                f"Cannot change status from {current} to {value}"
+            )
+        return value
 
     def create(self, validated_data):
         validated_data["customer"] = self.context["request"].user
@@ -69,29 +82,48 @@ class OrderSerializer(serializers.ModelSerializer):
         return order
 
 
-class OrderItemCreateSerializer(serializers.Serializer):
-    product_id = serializers.IntegerField()
-    quantity = serializers.IntegerField(min_value=1)
+class ArchivedOrderItemSerializer(OrderItemSerializer):
+    class Meta(OrderItemSerializer.Meta):
+        model = ArchivedOrderItem
 
-    def validate(self, attrs):
-        from product_management.models import Product
 
-        product_id = attrs.get("product_id")
-        quantity = attrs.get("quantity", 1)
+class ArchivedOrderSerializer(OrderSerializer):
+    """
+    Same payload as ``OrderSerializer``, plus ``archived_at``. Read-only.
+    """
 
-        try:
-            product = Product.objects.get(
-                id=product_id, is_active=True, is_deleted=False
-            )
-        except Product.DoesNotExist:
-            raise serializers.ValidationError("Product not found or inactive")
+    items = ArchivedOrderItemSerializer(many=True, read_only=True)
 
-        if product.stock_quantity < quantity:
-            raise serializers.ValidationError("Insufficient stock")
+    class Meta(OrderSerializer.Meta):
+        model = ArchivedOrder
+        fields = OrderSerializer.Meta.fields + ("archived_at",)
+        read_only_fields = fields
 
-        attrs["product"] = product
-        attrs["price"] = product.price
-        return attrs
+
+class OrderSummarySerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    id = serializers.IntegerField(source="order_id", read_only=True)
+
+    class Meta:
+        model = OrderSummary
+        fields = (
+            "id",
+            "order_number",
+            "customer",
+            "customer_email",
+            "status",
+            "total_amount",
+            "item_count",
+            "first_item_name",
+            "first_item_thumbnail",
+            "created_at",
+            "updated_at",
+        )
+        read_only_fields = fields
+
+
+class OrderItemCreateSerializer(serializers.Serializer):
+    product_id = serializers.IntegerField()
+    quantity = serializers.IntegerField(min_value=1)
 
 
 class OrderCreateSerializer(serializers.Serializer):
@@ -104,74 +136,64 @@ class OrderCreateSerializer(serializers.Serializer):
         cart_id = attrs.get("cart_id")
 
         if cart_id:
-            try:
-                cart = Cart.objects.get(id=cart_id, user=self.context["request"].user)
-                if not cart.items.exists():
-                    raise serializers.ValidationError("Cart is empty")
-                attrs["cart"] = cart
-            except Cart.DoesNotExist:
+            # A user has one cart; saving it first brings the tables up to
+            # date when carts are kept in the cache.
+            cart = get_cart_store().flush(self.context["request"].user)
+            if cart.pk != cart_id:
                 raise serializers.ValidationError("Cart not found or access denied")
+            if not cart.items.exists():
+                raise serializers.ValidationError("Cart is empty")
+            attrs["cart"] = cart
 
         return attrs
 
     def validate_items(self, value):
-        if value and not value:
-            raise serializers.ValidationError("Order must have at least one item")
+        # Products for all items are loaded in one query instead of one each.
+        products = load_products(item["product_id"] for item in value)
+        errors = []
+        for item in value:
+            product = products.get(item["product_id"])
+            if product is None:
+                errors.append({"non_field_errors": ["Product not found or inactive"]})
+            elif product.stock_quantity < item["quantity"]:
+                errors.append({"non_field_errors": ["Insufficient stock"]})
+            else:
+                errors.append({})
+                item["product"] = product
+                item["price"] = product.price
+        if any(errors):
+            raise serializers.ValidationError(errors)
         return value
 
     def create(self, validated_data):
-        customer = self.context["request"].user
-        shipping_address = validated_data.get("shipping_address", "")
-        billing_address = validated_data.get("billing_address", "")
         cart = validated_data.get("cart")
-        items_data = validated_data.get("items", [])
-
-        order = Order.objects.create(
-            customer=customer,
-            shipping_address=shipping_address,
-            billing_address=billing_address,
-        )
-
         if cart:
-            for cart_item in cart.items.all():
-                if cart_item.product.stock_quantity < cart_item.quantity:
-                    order.delete()
-                    raise serializers.ValidationError(
-                        f"Insufficient stock for {cart_item.product.name}"
-                    )
-
-                cart_item.product.stock_quantity -= cart_item.quantity
-                cart_item.product.save()
-
-                OrderItem.objects.create(
-                    order=order,
-                    product=cart_item.product,
-                    quantity=cart_item.quantity,
-                    price=cart_item.price,
-                )
-
-            cart.items.all().delete()
+            lines = [
+                (cart_item.product, cart_item.quantity, cart_item.price)
+                for cart_item in cart.items.select_related("product")
+            ]
         else:
-            for item_data in items_data:
-                product = item_data["product"]
-                quantity = item_data["quantity"]
-
-                product.stock_quantity -= quantity
-                product.save()
-
-                OrderItem.objects.create(
-                    order=order,
-                    product=product,
-                    quantity=quantity,
-                    price=item_data["price"],
-                )
-
-        order.calculate_total()
+            lines = [
+                (item_data["product"], item_data["quantity"], item_data["price"])
+                for item_data in validated_data.get("items", [])
+            ]
 
+        try:
+            order = place_order(
+                self.context["request"].user,
+                lines,
+                shipping_address=validated_data.get("shipping_address", ""),
+                billing_address=validated_data.get("billing_address", ""),
+                cart=cart,
+            )
+        except CheckoutError as e:
+            raise serializers.ValidationError(str(e))
+        if cart:
+            get_cart_store().discard(self.context["request"].user)
         return order
 
 
-class CartItemSerializer(serializers.ModelSerializer):
+class CartItemSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     product = ProductSerializer(read_only=True)
 
     class Meta:
@@ -187,10 +209,12 @@ class CartItemSerializer(serializers.ModelSerializer):
         read_only_fields = ("price", "subtotal", "created_at")
 
 
-class CartSerializer(serializers.ModelSerializer):
+class CartSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     items = CartItemSerializer(many=True, read_only=True)
     total_amount = serializers.SerializerMethodField()
 
+    field_dependencies = {"total_amount": ["items__subtotal"]}
+
     class Meta:
         model = Cart
         fields = (
@@ -231,7 +255,62 @@ class CartItemCreateSerializer(serializers.Serializer):
         return attrs
 
 
+class CartOperationSerializer(serializers.Serializer):
+    op = serializers.ChoiceField(choices=("add", "set", "remove"))
+    product_id = serializers.IntegerField()
+    quantity = serializers.IntegerField(min_value=1, required=False)
+
+    def validate(self, attrs):
+        if attrs["op"] != "remove" and "quantity" not in attrs:
+            raise serializers.ValidationError(
+                {"quantity": ["This field is required."]}
+            )
+        return attrs
+
+
+class CartBatchSerializer(serializers.Serializer):
+    MAX_OPERATIONS = 100
+
+    operations = CartOperationSerializer(
+        many=True, allow_empty=False, max_length=MAX_OPERATIONS
+    )
+
+    def validate_operations(self, value):
+        # Products for all operations are loaded in one query instead of one
+        # each. Removing needs no live product, so carts can drop stale lines.
+        products = load_products(
+            operation["product_id"]
+            for operation in value
+            if operation["op"] != "remove"
+        )
+        errors = []
+        for operation in value:
+            if operation["op"] == "remove":
+                errors.append({})
+                continue
+            product = products.get(operation["product_id"])
+            if product is None:
+                errors.append({"non_field_errors": ["Product not found or inactive"]})
+            elif product.stock_quantity < operation["quantity"]:
+                errors.append({"non_field_errors": ["Insufficient stock"]})
+            else:
+                errors.append({})
+                operation["price"] = product.price
+        if any(errors):
+            raise serializers.ValidationError(errors)
+        return value
+
+
 class CartToOrderSerializer(serializers.Serializer):
     shipping_address = serializers.CharField(required=False, allow_blank=True)
     billing_address = serializers.CharField(required=False, allow_blank=True)
     clear_cart = serializers.BooleanField(default=True)
+
+
+class OrderStatusTransitionSerializer(serializers.Serializer):
+    MAX_IDS = 1000
+
+    order_ids = serializers.ListField(
+        child=serializers.IntegerField(), allow_empty=False, max_length=MAX_IDS
+    )
+    status = serializers.ChoiceField(choices=Order.STATUS_CHOICES)
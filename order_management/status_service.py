@@ -0,0 +1,59 @@
+from django.db import transaction
+from django.utils import timezone
+from order_management.models import Order, OrderItem, OrderSummary
+from product_management.stock_service import decrement_stock, restore_stock
+
+
+class InvalidStatus(Exception):
+    pass
+
+
+def transition_orders(order_ids, new_status):
+    """
+    Move the live orders among ``order_ids`` to ``new_status`` where
+    ``Order.TRANSITIONS`` allows it, and return ``{order_id: old_status}``
+    for the orders that changed. The others are left alone.
+
+    The status change is one UPDATE (and one for the order summaries) and
+    the stock for the items of every order that was cancelled or reopened is
+    moved in one more, all in a single transaction. ``Order.save`` is not
+    called.
+    """
+    if new_status not in Order.TRANSITIONS:
+        raise InvalidStatus(f"Unknown status: {new_status}")
+    sources = [
+        status for status, targets in Order.TRANSITIONS.items() if new_status in targets
+    ]
+
+    with transaction.atomic():
+        previous = dict(
+            Order.objects.select_for_update()
+            .filter(
+                pk__in=list(order_ids),
+                status__in=sources,
+                is_active=True,
+                is_deleted=False,
+            )
+            .values_list("id", "status")
+        )
+        if not previous:
+            return {}
+        now = timezone.now()
+        Order.objects.filter(pk__in=previous).update(status=new_status, updated_at=now)
+        OrderSummary.objects.filter(order_id__in=previous).update(
+            status=new_status, updated_at=now
+        )
+
+        if new_status == "cancelled":
+            restore_stock(_item_quantities(previous))
+        else:
+            reopened = [pk for pk, status in previous.items() if status == "cancelled"]
+            if reopened:
+                decrement_stock(_item_quantities(reopened), strict=False)
+    return previous
+
+
+def _item_quantities(order_ids):
+    return OrderItem.objects.filter(order_id__in=order_ids).values_list(
+        "product_id", "quantity"
+    )
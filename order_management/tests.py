@@ -1,3 +1,950 @@
-from django.test import TestCase
+import csv
+import datetime
+import io
+import json
+import re
+import threading
+from decimal import Decimal
+from unittest import mock
+import stripe
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from administration.models import CustomUser
+from order_management.archive_service import archive_orders
+from order_management.cart_store import get_cart_store
+from order_management.checkout_service import place_order
+from order_management.exporters import export_orders
+from order_management.models import (
+    ArchivedOrder,
+    ArchivedOrderItem,
+    ArchiveTotals,
+    Cart,
+    CartItem,
+    Order,
+    OrderItem,
+    OrderSummary,
+)
+from order_management.order_numbers import BlockAllocator, highest_order_number
+from order_management.status_service import InvalidStatus, transition_orders
+from product_management.models import Category, Product
 
-# Create your tests here.
+
+class CheckoutQueryCountTests(TestCase):
+    """
+    Checkout must cost the same number of queries whatever the cart size.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name="Electronics")
+        cls.products = [
+            Product.objects.create(
+                name=f"Product {i}",
+                slug=f"product-{i}",
+                description="",
+                category=category,
+                price=Decimal("10.00"),
+                stock_quantity=100,
+            )
+            for i in range(20)
+        ]
+
+    def setUp(self):
+        # Cached carts are keyed by user id, which the next test can reuse.
+        cache.clear()
+        self.client = APIClient()
+
+    def customer(self, username):
+        user = CustomUser.objects.create(username=username, email=f"{username}@x.com")
+        self.client.force_authenticate(user)
+        return user
+
+    def checkout_cart(self, size):
+        user = self.customer(f"cart{size}")
+        cart = Cart.objects.create(user=user)
+        CartItem.objects.bulk_create(
+            [
+                CartItem(
+                    cart=cart,
+                    product=product,
+                    quantity=2,
+                    price=product.price,
+                    subtotal=product.price * 2,
+                )
+                for product in self.products[:size]
+            ]
+        )
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                "/api/v1/cart/checkout/", {"shipping_address": "x"}, format="json"
+            )
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(response.data["total_amount"], f"{20 * size}.00")
+        self.assertFalse(cart.items.exists())
+        return len(queries)
+
+    def create_order(self, size):
+        self.customer(f"order{size}")
+        items = [{"product_id": p.pk, "quantity": 1} for p in self.products[:size]]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                "/api/v1/orders/", {"items": items}, format="json"
+            )
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(len(response.data["items"]), size)
+        return len(queries)
+
+    def test_cart_checkout_query_count_is_constant(self):
+        self.assertEqual(self.checkout_cart(1), self.checkout_cart(15))
+
+    def test_order_create_query_count_is_constant(self):
+        self.assertEqual(self.create_order(1), self.create_order(15))
+
+    def test_insufficient_stock_rolls_back(self):
+        user = self.customer("short")
+        cart = Cart.objects.create(user=user)
+        CartItem.objects.create(
+            cart=cart, product=self.products[0], quantity=1, price=Decimal("10.00")
+        )
+        CartItem.objects.create(
+            cart=cart, product=self.products[1], quantity=500, price=Decimal("10.00")
+        )
+        response = self.client.post("/api/v1/cart/checkout/", {}, format="json")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data["error"], "Insufficient stock for Product 1")
+        self.assertFalse(Order.objects.filter(customer=user).exists())
+        self.assertEqual(cart.items.count(), 2)
+        self.assertEqual(
+            Product.objects.get(pk=self.products[0].pk).stock_quantity, 100
+        )
+
+
+class OrderListTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name="Books")
+        cls.product = Product.objects.create(
+            name="Novel",
+            slug="novel",
+            description="",
+            category=category,
+            price=Decimal("5.00"),
+            stock_quantity=1000,
+        )
+        cls.admin = CustomUser.objects.create(
+            username="admin", email="admin@x.com", user_type="admin"
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def create_orders(self, count, status="pending"):
+        for i in range(count):
+            customer = CustomUser.objects.create(
+                username=f"{status}{Order.objects.count()}",
+                email=f"{status}{Order.objects.count()}@x.com",
+            )
+            order = Order.objects.create(customer=customer)
+            order.items.create(product=self.product, quantity=1, price=Decimal("5"))
+            Order.objects.filter(pk=order.pk).update(status=status)
+
+    def list_query_count(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/api/v1/orders/")
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response.data
+
+    def test_list_is_paginated_with_constant_query_count(self):
+        self.create_orders(2)
+        small, data = self.list_query_count()
+        self.assertEqual(data["count"], 2)
+
+        self.create_orders(25)
+        large, data = self.list_query_count()
+        self.assertEqual(data["count"], 27)
+        self.assertEqual(len(data["results"]), 20)
+        self.assertEqual(small, large)
+
+    def test_status_and_date_filters(self):
+        self.create_orders(2)
+        self.create_orders(1, status="completed")
+
+        response = self.client.get("/api/v1/orders/?status=completed")
+        self.assertEqual(response.data["count"], 1)
+        response = self.client.get("/api/v1/orders/?status=pending,completed")
+        self.assertEqual(response.data["count"], 3)
+        response = self.client.get("/api/v1/orders/?status=shipped")
+        self.assertEqual(response.status_code, 400)
+
+        today = timezone.now().date().isoformat()
+        response = self.client.get(f"/api/v1/orders/?created_before={today}")
+        self.assertEqual(response.data["count"], 3)
+        response = self.client.get(f"/api/v1/orders/?created_after={today}T23:59:59Z")
+        self.assertEqual(response.data["count"], 0)
+        response = self.client.get("/api/v1/orders/?created_after=yesterday")
+        self.assertEqual(response.status_code, 400)
+
+    @mock.patch("order_management.stripe_service.stripe.PaymentIntent.retrieve")
+    def test_client_secret_is_opt_in_and_stored(self, retrieve):
+        self.create_orders(1)
+        Order.objects.update(
+            stripe_payment_intent_id="pi_1", stripe_client_secret="pi_1_secret"
+        )
+
+        response = self.client.get("/api/v1/orders/")
+        self.assertNotIn("client_secret", response.data["results"][0])
+        response = self.client.get("/api/v1/orders/?expand=client_secret")
+        self.assertEqual(response.data["results"][0]["client_secret"], "pi_1_secret")
+        response = self.client.get("/api/v1/orders/?fields=id,client_secret")
+        self.assertEqual(
+            response.data["results"][0],
+            {"id": mock.ANY, "client_secret": "pi_1_secret"},
+        )
+        retrieve.assert_not_called()
+
+
+class PaymentCreateTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = CustomUser.objects.create(username="payer", email="p@x.com")
+        cls.order = Order.objects.create(customer=cls.customer)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.customer)
+
+    def create_payment(self):
+        return self.client.post(
+            f"/api/v1/orders/{self.order.pk}/create-payment/",
+            format="json",
+            HTTP_IDEMPOTENCY_KEY="pay-1",
+        )
+
+    @mock.patch("order_management.stripe_service.stripe.PaymentIntent.create")
+    @mock.patch("order_management.stripe_service.stripe.Customer.create")
+    def test_retry_after_a_stripe_failure_succeeds(self, create_customer, create):
+        create_customer.return_value = mock.Mock(id="cus_1")
+        create.side_effect = stripe.error.APIConnectionError("stripe timeout")
+        response = self.create_payment()
+        self.assertEqual(response.status_code, 502)
+        self.assertIn("stripe timeout", response.data["error"])
+
+        create.side_effect = None
+        create.return_value = mock.Mock(id="pi_1", client_secret="pi_1_secret")
+        response = self.create_payment()
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("Idempotent-Replayed", response)
+        self.assertEqual(
+            response.data,
+            {"client_secret": "pi_1_secret", "payment_intent_id": "pi_1"},
+        )
+        replayed = self.create_payment()
+        self.assertEqual(replayed["Idempotent-Replayed"], "true")
+        self.assertEqual(create.call_count, 2)
+
+
+class OrderNumberTests(TestCase):
+    def test_numbers_are_unique_and_increasing(self):
+        customer = CustomUser.objects.create(username="n", email="n@x.com")
+        orders = [Order.objects.create(customer=customer) for _ in range(5)]
+        numbers = [order.order_number for order in orders]
+        values = [int(number.removeprefix("ORD-")) for number in numbers]
+        self.assertEqual(values, sorted(set(values)))
+
+    def test_highest_order_number_ignores_other_formats(self):
+        self.assertEqual(
+            highest_order_number(["ORD-1704067200", "ORD-17", "LEGACY-9", "", None]),
+            1704067200,
+        )
+
+    def test_block_allocator_under_contention(self):
+        # Several "processes" (allocators) share one sequence, each used by
+        # several threads at once.
+        sequence_lock = threading.Lock()
+        sequence = {"next": 1}
+
+        def reserve(block_size):
+            with sequence_lock:
+                start = sequence["next"]
+                sequence["next"] += block_size
+                return start
+
+        allocators = [BlockAllocator(reserve, block_size=7) for _ in range(4)]
+        results = [[] for _ in range(16)]
+
+        def create(allocator, result):
+            for _ in range(500):
+                result.append(allocator.allocate())
+
+        threads = [
+            threading.Thread(target=create, args=(allocators[i % 4], results[i]))
+            for i in range(16)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        values = [value for result in results for value in result]
+        self.assertEqual(len(values), len(set(values)))
+        for result in results:
+            self.assertEqual(result, sorted(result))
+        # Only whole blocks were reserved, with at most one partly used each.
+        self.assertLess(sequence["next"] - 1 - len(values), 4 * 7)
+
+
+class ConcurrentOrderNumberTests(TransactionTestCase):
+    """
+    Threads with their own database connections create orders at once: the
+    sequence blocks on PostgreSQL, the counter row elsewhere. The SQLite test
+    database is a file (see settings) so the threads share it.
+    """
+
+    def test_concurrent_creators_get_unique_numbers(self):
+        customer = CustomUser.objects.create(username="c", email="c@x.com")
+        numbers = []
+        errors = []
+
+        def create():
+            try:
+                for _ in range(25):
+                    numbers.append(Order.objects.create(customer=customer).order_number)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=create) for _ in range(16)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(len(numbers), 400)
+        self.assertEqual(len(set(numbers)), 400)
+        if connection.vendor != "postgresql":
+            # The counter row hands out numbers one by one, without gaps.
+            values = sorted(int(number.removeprefix("ORD-")) for number in numbers)
+            self.assertEqual(values, list(range(values[0], values[0] + 400)))
+
+
+class OrderStatusTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name="Toys")
+        cls.products = [
+            Product.objects.create(
+                name=f"Toy {i}",
+                slug=f"toy-{i}",
+                description="",
+                category=category,
+                price=Decimal("3.00"),
+                stock_quantity=100,
+            )
+            for i in range(2)
+        ]
+        cls.customer = CustomUser.objects.create(username="buyer", email="b@x.com")
+        cls.admin = CustomUser.objects.create(
+            username="staff", email="staff@x.com", user_type="admin"
+        )
+
+    def create_order(self, status="pending"):
+        order = Order.objects.create(customer=self.customer)
+        OrderItem.objects.bulk_create(
+            [
+                OrderItem(
+                    order=order,
+                    product=product,
+                    quantity=2,
+                    price=product.price,
+                    subtotal=product.price * 2,
+                )
+                for product in self.products
+            ]
+        )
+        Order.objects.filter(pk=order.pk).update(status=status)
+        return order
+
+    def stock(self):
+        return list(
+            Product.objects.filter(pk__in=[p.pk for p in self.products])
+            .order_by("pk")
+            .values_list("stock_quantity", flat=True)
+        )
+
+    def test_bulk_cancel_restores_stock_in_constant_queries(self):
+        orders = [self.create_order() for _ in range(5)]
+        completed = self.create_order("completed")
+        cancelled = self.create_order("cancelled")
+        ids = [order.pk for order in orders] + [completed.pk, cancelled.pk]
+
+        with CaptureQueriesContext(connection) as queries:
+            changed = transition_orders(ids, "cancelled")
+
+        self.assertEqual(
+            changed, {**{o.pk: "pending" for o in orders}, completed.pk: "completed"}
+        )
+        self.assertEqual(self.stock(), [112, 112])
+        # Lock and read the orders, update them and their summaries, read
+        # their items, update stock.
+        statements = [q["sql"] for q in queries if "SAVEPOINT" not in q["sql"]]
+        self.assertEqual(len(statements), 5)
+        self.assertEqual(
+            Order.objects.filter(pk__in=ids, status="cancelled").count(), len(ids)
+        )
+
+    def test_reopening_takes_stock_again_and_invalid_moves_are_skipped(self):
+        cancelled = self.create_order("cancelled")
+        completed = self.create_order("completed")
+
+        changed = transition_orders([cancelled.pk, completed.pk], "pending")
+
+        self.assertEqual(changed, {cancelled.pk: "cancelled"})
+        self.assertEqual(self.stock(), [98, 98])
+        with self.assertRaises(InvalidStatus):
+            transition_orders([completed.pk], "shipped")
+
+    def test_save_does_not_refetch_the_order(self):
+        order = Order.objects.get(pk=self.create_order().pk)
+        order.shipping_address = "Elsewhere"
+        with CaptureQueriesContext(connection) as queries:
+            order.save()
+        self.assertEqual(
+            [q["sql"] for q in queries if q["sql"].startswith("SELECT")], []
+        )
+
+        order.status = "cancelled"
+        order.save()
+        self.assertEqual(self.stock(), [102, 102])
+
+    def test_bulk_status_endpoint(self):
+        orders = [self.create_order() for _ in range(3)]
+        client = APIClient()
+        client.force_authenticate(self.customer)
+        payload = {"order_ids": [o.pk for o in orders] + [0], "status": "processing"}
+        response = client.post("/api/v1/orders/status/", payload, format="json")
+        self.assertEqual(response.status_code, 403)
+
+        client.force_authenticate(self.admin)
+        response = client.post("/api/v1/orders/status/", payload, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["updated"], [o.pk for o in orders])
+        self.assertEqual(response.data["unchanged"], [0])
+
+    def test_order_update_rejects_invalid_transition(self):
+        order = self.create_order("completed")
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        response = client.put(
+            f"/api/v1/orders/{order.pk}/", {"status": "pending"}, format="json"
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            response.data["status"], ["Cannot change status from completed to pending"]
+        )
+
+
+class OrderArchiveTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name="Tools")
+        cls.product = Product.objects.create(
+            name="Hammer",
+            slug="hammer",
+            description="",
+            category=category,
+            price=Decimal("8.00"),
+            stock_quantity=100,
+        )
+        cls.customer = CustomUser.objects.create(username="old", email="old@x.com")
+        cls.admin = CustomUser.objects.create(
+            username="boss", email="boss@x.com", user_type="admin"
+        )
+
+    def create_order(self, status, days_ago):
+        order = Order.objects.create(customer=self.customer)
+        OrderItem.objects.bulk_create(
+            [
+                OrderItem(
+                    order=order,
+                    product=self.product,
+                    quantity=2,
+                    price=Decimal("8.00"),
+                    subtotal=Decimal("16.00"),
+                )
+            ]
+        )
+        created_at = timezone.now() - datetime.timedelta(days=days_ago)
+        Order.objects.filter(pk=order.pk).update(
+            status=status, total_amount=Decimal("16.00"), created_at=created_at
+        )
+        return order
+
+    def test_old_finished_orders_move_to_the_archive(self):
+        old = [self.create_order("completed", 400) for _ in range(3)]
+        old.append(self.create_order("cancelled", 400))
+        kept = [self.create_order("pending", 400), self.create_order("completed", 5)]
+
+        self.assertEqual(archive_orders(older_than_days=180, batch_size=3), 4)
+
+        self.assertEqual(
+            set(Order.objects.values_list("pk", flat=True)), {o.pk for o in kept}
+        )
+        self.assertEqual(
+            set(ArchivedOrder.objects.values_list("pk", flat=True)), {o.pk for o in old}
+        )
+        self.assertEqual(ArchivedOrderItem.objects.count(), 4)
+        self.assertEqual(OrderItem.objects.count(), 2)
+        # Archiving is not a cancellation: stock stays where it was.
+        self.assertEqual(Product.objects.get(pk=self.product.pk).stock_quantity, 100)
+
+        totals = ArchiveTotals.current()
+        self.assertEqual(totals.total_orders, 4)
+        self.assertEqual(totals.completed_orders, 3)
+        self.assertEqual(totals.completed_revenue, Decimal("48.00"))
+
+    def test_archived_orders_are_still_served_and_reported(self):
+        order = self.create_order("completed", 400)
+        self.create_order("completed", 1)
+        client = APIClient()
+        client.force_authenticate(self.customer)
+        before = client.get(f"/api/v1/orders/{order.pk}/").data
+
+        archive_orders(older_than_days=180)
+
+        response = client.get(f"/api/v1/orders/{order.pk}/")
+        self.assertEqual(response.status_code, 200)
+        archived_at = response.data.pop("archived_at")
+        self.assertIsNotNone(archived_at)
+        self.assertEqual(response.data, before)
+
+        client.force_authenticate(self.admin)
+        report = client.get("/api/v1/reports/summary/").data
+        self.assertEqual(report["total_orders"], 2)
+        self.assertEqual(report["paid_orders"], 2)
+        self.assertEqual(report["total_revenue"], 32.0)
+
+
+
+class OrderSummaryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name="Kitchen")
+        cls.products = [
+            Product.objects.create(
+                name=f"Pan {i}",
+                slug=f"pan-{i}",
+                description="",
+                category=category,
+                price=Decimal("20.00"),
+                stock_quantity=100,
+                image_variants={"files": {"thumbnail": f"products/pan-{i}.jpg"}},
+            )
+            for i in range(3)
+        ]
+        cls.customer = CustomUser.objects.create(username="cook", email="cook@x.com")
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.customer)
+
+    def checkout(self, quantities):
+        lines = [
+            (product, quantity, product.price)
+            for product, quantity in zip(self.products, quantities)
+        ]
+        return place_order(self.customer, lines)
+
+    def test_summary_follows_checkout_status_changes_and_item_edits(self):
+        order = self.checkout([2, 1])
+        summary = OrderSummary.objects.get(order=order)
+        self.assertEqual(summary.order_number, order.order_number)
+        self.assertEqual(summary.customer_email, "cook@x.com")
+        self.assertEqual(summary.item_count, 3)
+        self.assertEqual(summary.total_amount, Decimal("60.00"))
+        self.assertEqual(summary.first_item_name, "Pan 0")
+        self.assertEqual(summary.first_item_thumbnail.name, "products/pan-0.jpg")
+
+        transition_orders([order.pk], "processing")
+        self.assertEqual(OrderSummary.objects.get(order=order).status, "processing")
+
+        item = OrderItem.objects.get(order=order, product=self.products[1])
+        item.quantity = 4
+        item.save()
+        summary = OrderSummary.objects.get(order=order)
+        self.assertEqual(summary.item_count, 6)
+        self.assertEqual(summary.total_amount, Decimal("120.00"))
+
+        order = Order.objects.get(pk=order.pk)
+        order.status = "completed"
+        order.save()
+        self.assertEqual(OrderSummary.objects.get(order=order).status, "completed")
+
+    def test_orders_created_outside_checkout_get_a_summary(self):
+        order = Order.objects.create(customer=self.customer)
+        summary = OrderSummary.objects.get(order=order)
+        self.assertEqual(summary.order_number, order.order_number)
+        self.assertEqual(summary.customer_email, "cook@x.com")
+        self.assertEqual(summary.item_count, 0)
+        self.assertEqual(summary.first_item_name, "")
+
+        OrderItem.objects.create(
+            order=order, product=self.products[2], quantity=2, price=20, subtotal=40
+        )
+        self.assertEqual(OrderSummary.objects.get(order=order).item_count, 2)
+        response = self.client.get("/api/v1/orders/?view=summary")
+        self.assertEqual([row["id"] for row in response.data["results"]], [order.pk])
+
+        # Orders inserted without save() get their row on the next save.
+        bulk = Order.objects.bulk_create(
+            [Order(customer=self.customer, order_number="ORD-BULK")]
+        )[0]
+        self.assertFalse(OrderSummary.objects.filter(order=bulk).exists())
+        bulk.status = "processing"
+        bulk.save()
+        self.assertEqual(OrderSummary.objects.get(order=bulk).status, "processing")
+
+    def test_summary_view_reads_one_table(self):
+        for _ in range(3):
+            self.checkout([1, 1, 1])
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/api/v1/orders/?view=summary&status=pending")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["count"], 3)
+        row = response.data["results"][0]
+        self.assertEqual(row["item_count"], 3)
+        self.assertEqual(row["first_item_name"], "Pan 0")
+        self.assertTrue(row["first_item_thumbnail"].endswith("/products/pan-0.jpg"))
+        tables = set(re.findall(r'FROM "(\w+)"', " ".join(q["sql"] for q in queries)))
+        self.assertEqual(tables, {"order_management_ordersummary"})
+        self.assertNotIn("JOIN", " ".join(q["sql"] for q in queries))
+
+        response = self.client.get("/api/v1/orders/?view=summary&pagination=cursor")
+        self.assertEqual(len(response.data["results"]), 3)
+
+
+class OrderExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name="Music")
+        cls.products = [
+            Product.objects.create(
+                name=f"Record {i}",
+                slug=f"record-{i}",
+                description="",
+                category=category,
+                price=Decimal("15.00"),
+                stock_quantity=100,
+            )
+            for i in range(2)
+        ]
+        cls.admin = CustomUser.objects.create(
+            username="admin", email="admin@x.com", user_type="admin"
+        )
+        cls.customer = CustomUser.objects.create(username="fan", email="fan@x.com")
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def checkout(self, count):
+        lines = [(product, 1, product.price) for product in self.products]
+        return [place_order(self.customer, lines) for _ in range(count)]
+
+    def export_query_count(self, chunk_size):
+        with CaptureQueriesContext(connection) as queries:
+            rows = list(export_orders("ndjson", chunk_size=chunk_size))
+        return len(queries), rows
+
+    def test_export_streams_orders_in_chunks(self):
+        self.checkout(3)
+        small, rows = self.export_query_count(chunk_size=10)
+        self.assertEqual(len(rows), 3)
+
+        self.checkout(5)
+        large, rows = self.export_query_count(chunk_size=10)
+        self.assertEqual(len(rows), 8)
+        # One query for the orders and one for the items of each chunk.
+        self.assertEqual(small, large)
+        self.assertEqual(large, 2)
+        chunked, _ = self.export_query_count(chunk_size=4)
+        self.assertEqual(chunked, 3)
+
+    def test_csv_and_ndjson_endpoint(self):
+        first, second = self.checkout(2)
+        empty = Order.objects.create(customer=self.customer)
+        transition_orders([second.pk], "completed")
+
+        response = self.client.get("/api/v1/orders/export/?export_format=csv")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "text/csv")
+        self.assertIn('filename="orders.csv"', response["Content-Disposition"])
+        body = b"".join(response.streaming_content).decode()
+        rows = list(csv.DictReader(io.StringIO(body)))
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(rows[0]["order_number"], first.order_number)
+        self.assertEqual(rows[0]["customer_email"], "fan@x.com")
+        self.assertEqual(rows[1]["product_slug"], "record-1")
+        self.assertEqual(rows[4]["order_id"], str(empty.pk))
+        self.assertEqual(rows[4]["product_id"], "")
+
+        response = self.client.get("/api/v1/orders/export/?status=completed")
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 1)
+        order = json.loads(lines[0])
+        self.assertEqual(order["order_number"], second.order_number)
+        self.assertEqual(order["status"], "completed")
+        self.assertEqual([item["quantity"] for item in order["items"]], [1, 1])
+
+        response = self.client.get("/api/v1/orders/export/?status=lost")
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get("/api/v1/orders/export/?export_format=xml")
+        self.assertEqual(response.status_code, 400)
+
+    def test_export_is_admin_only(self):
+        self.client.force_authenticate(self.customer)
+        response = self.client.get("/api/v1/orders/export/")
+        self.assertEqual(response.status_code, 403)
+
+
+@override_settings(CART_STORE="order_management.cart_store.CacheCartStore")
+class CartStoreTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name="Garden")
+        cls.products = [
+            Product.objects.create(
+                name=f"Seed {i}",
+                slug=f"seed-{i}",
+                description="",
+                category=category,
+                price=Decimal("3.00"),
+                stock_quantity=50,
+            )
+            for i in range(3)
+        ]
+        cls.customer = CustomUser.objects.create(username="gardener", email="g@x.com")
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.customer)
+
+    def edit_cart(self):
+        for product in self.products:
+            response = self.client.post(
+                "/api/v1/cart/",
+                {"product_id": product.pk, "quantity": 2},
+                format="json",
+            )
+            self.assertEqual(response.status_code, 201)
+        self.client.post(
+            "/api/v1/cart/",
+            {"product_id": self.products[0].pk, "quantity": 1},
+            format="json",
+        )
+        item_id = self.client.get("/api/v1/cart/").data["items"][1]["id"]
+        response = self.client.patch(
+            f"/api/v1/cart/items/{item_id}/", {"quantity": 5}, format="json"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["subtotal"], "15.00")
+        item_id = self.client.get("/api/v1/cart/").data["items"][2]["id"]
+        response = self.client.delete(f"/api/v1/cart/items/{item_id}/")
+        self.assertEqual(response.status_code, 200)
+
+        response = self.client.get("/api/v1/cart/")
+        items = response.data["items"]
+        self.assertEqual(
+            [(item["product"]["slug"], item["quantity"]) for item in items],
+            [("seed-0", 3), ("seed-1", 5)],
+        )
+        self.assertEqual(response.data["total_amount"], Decimal("24.00"))
+        return response.data
+
+    def cart_queries(self, queries):
+        return [
+            q["sql"]
+            for q in queries
+            if "order_management_cart" in q["sql"] and "SAVEPOINT" not in q["sql"]
+        ]
+
+    def test_cart_edits_stay_in_the_cache_until_flushed(self):
+        self.client.get("/api/v1/cart/")
+        with CaptureQueriesContext(connection) as queries:
+            data = self.edit_cart()
+        self.assertEqual(self.cart_queries(queries), [])
+        cart = Cart.objects.get(user=self.customer)
+        self.assertEqual(data["id"], cart.pk)
+        self.assertFalse(cart.items.exists())
+
+        call_command("flush_carts", stdout=io.StringIO())
+        items = cart.items.order_by("product__slug")
+        self.assertEqual(
+            list(items.values_list("quantity", "subtotal")),
+            [(3, Decimal("9.00")), (5, Decimal("15.00"))],
+        )
+        # Flushing again writes nothing, and the cart is still cached.
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(get_cart_store().flush_dirty(), 0)
+            self.client.get("/api/v1/cart/")
+        self.assertEqual(self.cart_queries(queries), [])
+
+    def test_idle_carts_are_saved_and_evicted(self):
+        self.edit_cart()
+        self.assertEqual(get_cart_store().flush_dirty(idle_timeout=0), 1)
+        self.assertEqual(Cart.objects.get(user=self.customer).items.count(), 2)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/api/v1/cart/")
+        self.assertTrue(self.cart_queries(queries))
+        self.assertEqual(len(response.data["items"]), 2)
+
+    def test_checkout_saves_the_cached_cart(self):
+        self.edit_cart()
+        response = self.client.post(
+            "/api/v1/cart/checkout/", {"shipping_address": "x"}, format="json"
+        )
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(response.data["total_amount"], "24.00")
+        self.assertFalse(CartItem.objects.filter(cart__user=self.customer).exists())
+        self.assertEqual(self.client.get("/api/v1/cart/").data["items"], [])
+        self.assertEqual(get_cart_store().flush_dirty(), 0)
+
+    def test_products_collapsed_to_ids_on_both_stores(self):
+        self.edit_cart()
+        ids = [self.products[0].pk, self.products[1].pk]
+        expected = {"items": [{"product": pk} for pk in ids]}
+        for store in ("CacheCartStore", "DatabaseCartStore"):
+            with self.subTest(store=store), override_settings(
+                CART_STORE=f"order_management.cart_store.{store}"
+            ):
+                get_cart_store().flush_dirty()
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client.get("/api/v1/cart/?fields=items.product")
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.data, expected)
+                self.assertFalse(
+                    [q for q in queries if "product_management_product" in q["sql"]]
+                )
+
+    @override_settings(CART_STORE="order_management.cart_store.DatabaseCartStore")
+    def test_database_store_keeps_the_same_contract(self):
+        data = self.edit_cart()
+        cart = Cart.objects.get(user=self.customer)
+        self.assertEqual(data["id"], cart.pk)
+        self.assertEqual(
+            [item["id"] for item in data["items"]],
+            list(cart.items.values_list("pk", flat=True)),
+        )
+
+
+class CartBatchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name="Pantry")
+        cls.products = [
+            Product.objects.create(
+                name=f"Spice {i}",
+                slug=f"spice-{i}",
+                description="",
+                category=category,
+                price=Decimal("4.00"),
+                stock_quantity=20,
+            )
+            for i in range(15)
+        ]
+        cls.customer = CustomUser.objects.create(username="cook2", email="c2@x.com")
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.customer)
+        cart = Cart.objects.create(user=self.customer)
+        for product, quantity in zip(self.products, [2, 1, 4]):
+            CartItem.objects.create(
+                cart=cart, product=product, quantity=quantity, price=product.price
+            )
+
+    def batch(self, operations):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                "/api/v1/cart/batch/", {"operations": operations}, format="json"
+            )
+        return response, [q["sql"] for q in queries if "SAVEPOINT" not in q["sql"]]
+
+    def check_batch(self):
+        p = self.products
+        response, queries = self.batch(
+            [
+                {"op": "add", "product_id": p[0].pk, "quantity": 1},
+                {"op": "set", "product_id": p[1].pk, "quantity": 5},
+                {"op": "remove", "product_id": p[2].pk},
+                {"op": "add", "product_id": p[3].pk, "quantity": 2},
+                {"op": "add", "product_id": p[3].pk, "quantity": 1},
+            ]
+        )
+        self.assertEqual(response.status_code, 200, response.data)
+        items = response.data["items"]
+        self.assertEqual(
+            [(item["product"]["slug"], item["quantity"]) for item in items],
+            [("spice-0", 3), ("spice-1", 5), ("spice-3", 3)],
+        )
+        self.assertEqual(response.data["total_amount"], Decimal("44.00"))
+        return queries
+
+    @override_settings(CART_STORE="order_management.cart_store.CacheCartStore")
+    def test_batch_with_cached_cart(self):
+        self.client.get("/api/v1/cart/")
+        queries = self.check_batch()
+        self.assertFalse([sql for sql in queries if "order_management_cart" in sql])
+
+        get_cart_store().flush_dirty()
+        items = CartItem.objects.filter(cart__user=self.customer)
+        self.assertEqual(
+            sorted(items.values_list("product__slug", "quantity")),
+            [("spice-0", 3), ("spice-1", 5), ("spice-3", 3)],
+        )
+
+    @override_settings(CART_STORE="order_management.cart_store.DatabaseCartStore")
+    def test_batch_with_database_cart_has_constant_query_count(self):
+        small = len(self.check_batch())
+        operations = [
+            {"op": "add", "product_id": product.pk, "quantity": 1}
+            for product in self.products
+        ] + [{"op": "remove", "product_id": self.products[0].pk}]
+        response, queries = self.batch(operations)
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(len(response.data["items"]), 14)
+        self.assertEqual(len(queries), small)
+
+    def test_invalid_operations_change_nothing(self):
+        response, _ = self.batch(
+            [
+                {"op": "remove", "product_id": self.products[0].pk},
+                {"op": "add", "product_id": 0, "quantity": 1},
+                {"op": "set", "product_id": self.products[1].pk, "quantity": 99},
+            ]
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            response.data["operations"],
+            [
+                {},
+                {"non_field_errors": ["Product not found or inactive"]},
+                {"non_field_errors": ["Insufficient stock"]},
+            ],
+        )
+        response, _ = self.batch([{"op": "add", "product_id": self.products[0].pk}])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(len(self.client.get("/api/v1/cart/").data["items"]), 3)
@@ -1,16 +1,30 @@
 from django.urls import path
-from order_management.views import OrderListView, OrderDetailView
+from order_management.views import (
+    OrderListView,
+    OrderDetailView,
+    OrderExportView,
+    OrderStatusTransitionView,
+)
 from order_management.payment_views import (
     PaymentCreateView,
     PaymentConfirmView,
     StripeWebhookView,
 )
-from order_management.cart_views import CartView, CartItemView, CartToOrderView
+from order_management.cart_views import (
+    CartBatchView,
+    CartItemView,
+    CartToOrderView,
+    CartView,
+)
 
 app_name = "order_management"
 
 urlpatterns = [
     path("orders/", OrderListView.as_view(), name="order-list"),
+    path(
+        "orders/status/", OrderStatusTransitionView.as_view(), name="order-status"
+    ),
+    path("orders/export/", OrderExportView.as_view(), name="order-export"),
     path("orders/<int:pk>/", OrderDetailView.as_view(), name="order-detail"),
     path(
         "orders/<int:order_id>/create-payment/",
@@ -24,6 +38,7 @@ urlpatterns = [
     ),
     path("webhooks/stripe/", StripeWebhookView.as_view(), name="stripe-webhook"),
     path("cart/", CartView.as_view(), name="cart"),
+    path("cart/batch/", CartBatchView.as_view(), name="cart-batch"),
     path("cart/items/<int:pk>/", CartItemView.as_view(), name="cart-item-detail"),
     path("cart/checkout/", CartToOrderView.as_view(), name="cart-checkout"),
 ]
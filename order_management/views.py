@@ -3,39 +3,146 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.exceptions import PermissionDenied
+from django.http import Http404, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
-from order_management.models import Order, OrderItem
+from django.db.models import Count, Max
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+import datetime
+from common.conditional import make_etag, not_modified_response, set_validators
+from common.idempotency import idempotent
+from common.serializers import optimize_queryset
+from common.views import PaginationMixin
+from common.streaming import export_format
+from order_management.exporters import CONTENT_TYPES, export_orders
+from order_management.models import ArchivedOrder, Order, OrderItem, OrderSummary
 from order_management.serializers import (
+    ArchivedOrderSerializer,
     OrderSerializer,
     OrderCreateSerializer,
     OrderItemSerializer,
+    OrderStatusTransitionSerializer,
+    OrderSummarySerializer,
 )
+from order_management.status_service import transition_orders
 from common.email_service import send_order_confirmation_email, send_order_status_update_email
 
 
-class OrderListView(APIView):
+class OrderFilterMixin:
+    """
+    The ``status``, ``created_after`` and ``created_before`` query parameters
+    shared by the order list and the order export.
+    """
+
+    statuses = {value for value, _ in Order.STATUS_CHOICES}
+
+    def parse_datetime_param(self, request, name, end_of_day=False):
+        """
+        Read an ISO 8601 datetime or date query parameter. A bare date covers
+        the whole day, so ``created_before=2024-01-31`` includes that day.
+        Raises ``ValueError`` if the value cannot be parsed.
+        """
+        value = request.query_params.get(name)
+        if not value:
+            return None
+        try:
+            day = parse_date(value)
+            if day is not None:
+                if end_of_day:
+                    day += datetime.timedelta(days=1)
+                parsed = datetime.datetime.combine(day, datetime.time.min)
+            else:
+                parsed = parse_datetime(value)
+            if parsed is None:
+                raise ValueError
+        except ValueError:
+            raise ValueError(f"{name} must be an ISO 8601 date or datetime")
+        if timezone.is_naive(parsed):
+            parsed = timezone.make_aware(parsed, datetime.timezone.utc)
+        return parsed
+
+    def filter_orders(self, request, orders):
+        status_param = request.query_params.get("status")
+        if status_param:
+            statuses = {value.strip() for value in status_param.split(",")}
+            unknown = statuses - self.statuses
+            if unknown:
+                raise ValueError(f"Unknown status: {', '.join(sorted(unknown))}")
+            orders = orders.filter(status__in=statuses)
+
+        created_after = self.parse_datetime_param(request, "created_after")
+        if created_after is not None:
+            orders = orders.filter(created_at__gte=created_after)
+        created_before = self.parse_datetime_param(
+            request, "created_before", end_of_day=True
+        )
+        if created_before is not None:
+            orders = orders.filter(created_at__lt=created_before)
+        return orders
+
+
+class OrderListView(OrderFilterMixin, PaginationMixin, APIView):
     permission_classes = [IsAuthenticated]
+    cursor_ordering = ("-created_at", "id")
+    summary_cursor_ordering = ("-created_at", "order_id")
+
+    def wants_summary(self, request):
+        return request.query_params.get("view") == "summary"
+
+    def get_cursor_ordering(self, request):
+        if self.wants_summary(request):
+            return self.summary_cursor_ordering
+        return self.cursor_ordering
 
     def get(self, request):
-        user = request.user
-        if user.is_admin():
-            orders = Order.objects.filter(is_active=True, is_deleted=False)
+        # ?view=summary reads the OrderSummary table only: no joins and no
+        # item queries.
+        if self.wants_summary(request):
+            model, serializer_class = OrderSummary, OrderSummarySerializer
         else:
-            orders = Order.objects.filter(
-                customer=user, is_active=True, is_deleted=False
-            )
+            model, serializer_class = Order, OrderSerializer
+
+        user = request.user
+        orders = model.objects.filter(is_active=True, is_deleted=False)
+        if not user.is_admin():
+            orders = orders.filter(customer=user)
+        try:
+            orders = self.filter_orders(request, orders)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Customers and items -> products -> categories are loaded with one
+        # join and two prefetch queries per page, whatever the page holds.
+        context = {"request": request}
+        ordering = self.get_cursor_ordering(request)
+        orders = optimize_queryset(
+            orders.order_by(*ordering),
+            serializer_class(context=context),
+            extra=ordering,
+        )
 
-        serializer = OrderSerializer(orders, many=True, context={"request": request})
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        paginator = self.get_paginator(request)
+        paginated_orders = paginator.paginate_queryset(orders, request)
+        serializer = serializer_class(paginated_orders, many=True, context=context)
+        return paginator.get_paginated_response(serializer.data)
 
+    @idempotent
     def post(self, request):
         serializer = OrderCreateSerializer(
             data=request.data, context={"request": request}
         )
         if serializer.is_valid():
             order = serializer.save()
+            # Reload with items, products and customer prefetched for the
+            # confirmation email and the response.
+            context = {"request": request}
+            order = optimize_queryset(
+                Order.objects.filter(pk=order.pk),
+                OrderSerializer(context=context),
+                extra=("customer__email", "customer__first_name"),
+            ).get()
             send_order_confirmation_email(order)
-            response_serializer = OrderSerializer(order, context={"request": request})
+            response_serializer = OrderSerializer(order, context=context)
             return Response(response_serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -43,17 +150,74 @@ class OrderListView(APIView):
 class OrderDetailView(APIView):
     permission_classes = [IsAuthenticated]
 
-    def get_object(self, pk, user):
-        order = get_object_or_404(Order, pk=pk, is_active=True, is_deleted=False)
-        if not user.is_admin() and order.customer != user:
+    def get_object(self, pk, user, queryset=None):
+        if queryset is None:
+            queryset = Order.objects.all()
+        order = get_object_or_404(queryset, pk=pk, is_active=True, is_deleted=False)
+        if not user.is_admin() and order.customer_id != user.pk:
 
             raise PermissionDenied("You do not have permission to access this order.")
         return order
 
+    def get_queryset(self, model, serializer_class, context):
+        return optimize_queryset(
+            model.objects.all(),
+            serializer_class(context=context),
+            extra=("customer", "updated_at"),
+        )
+
+    def get_validators(self, request, order):
+        # Item edits touch the order's updated_at, but product changes only show
+        # up on the products, so both feed into the validator.
+        items = order.items.aggregate(
+            count=Count("id"),
+            items_updated=Max("updated_at"),
+            products_updated=Max("product__updated_at"),
+        )
+        last_modified = max(
+            value
+            for value in (
+                order.updated_at,
+                items["items_updated"],
+                items["products_updated"],
+            )
+            if value is not None
+        )
+        # The URI is part of the tag because ?fields= changes the representation.
+        etag = make_etag(
+            request.build_absolute_uri(),
+            type(order).__name__,
+            order.pk,
+            order.updated_at.isoformat(),
+            items["count"],
+            items["items_updated"],
+            items["products_updated"],
+        )
+        return etag, last_modified
+
     def get(self, request, pk):
-        order = self.get_object(pk, request.user)
-        serializer = OrderSerializer(order, context={"request": request})
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        context = {"request": request}
+        serializer_class = OrderSerializer
+        try:
+            order = self.get_object(
+                pk, request.user, self.get_queryset(Order, serializer_class, context)
+            )
+        except Http404:
+            # Old orders are moved to the archive tables; serve them from there.
+            serializer_class = ArchivedOrderSerializer
+            order = self.get_object(
+                pk,
+                request.user,
+                self.get_queryset(ArchivedOrder, serializer_class, context),
+            )
+        etag, last_modified = self.get_validators(request, order)
+        response = not_modified_response(request, etag, last_modified)
+        if response is not None:
+            return response
+
+        serializer = serializer_class(order, context=context)
+        response = Response(serializer.data, status=status.HTTP_200_OK)
+        return set_validators(response, etag, last_modified)
 
     def put(self, request, pk):
         order = self.get_object(pk, request.user)
@@ -88,3 +252,58 @@ class OrderDetailView(APIView):
         return Response(
             {"message": "Order deleted successfully"}, status=status.HTTP_200_OK
         )
+
+
+class OrderStatusTransitionView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        if not request.user.is_admin():
+            raise PermissionDenied("Only admins can change order statuses in bulk")
+
+        serializer = OrderStatusTransitionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        order_ids = serializer.validated_data["order_ids"]
+        new_status = serializer.validated_data["status"]
+
+        previous = transition_orders(order_ids, new_status)
+
+        orders = Order.objects.filter(pk__in=previous).select_related("customer")
+        for order in orders:
+            send_order_status_update_email(order, previous[order.pk])
+
+        return Response(
+            {
+                "status": new_status,
+                "updated": sorted(previous),
+                "unchanged": sorted(set(order_ids) - set(previous)),
+            },
+            status=status.HTTP_200_OK,
+        )
+
+
+class OrderExportView(OrderFilterMixin, APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        if not request.user.is_admin():
+            raise PermissionDenied("Only admins can export orders")
+
+        file_format = export_format(request, CONTENT_TYPES)
+        if file_format is None:
+            return Response(
+                {"error": "export_format must be csv or ndjson"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        orders = Order.objects.filter(is_active=True, is_deleted=False)
+        try:
+            orders = self.filter_orders(request, orders)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        response = StreamingHttpResponse(
+            export_orders(file_format, queryset=orders),
+            content_type=CONTENT_TYPES[file_format],
+        )
+        response["Content-Disposition"] = f'attachment; filename="orders.{file_format}"'
+        return response
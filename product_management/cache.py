@@ -0,0 +1,175 @@
+import functools
+import hashlib
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework import serializers
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+from common.conditional import make_etag, not_modified_response, set_validators
+
+CATALOG_VERSION_KEY = "catalog:version"
+CATALOG_HITS_KEY = "catalog:stats:hits"
+CATALOG_MISSES_KEY = "catalog:stats:misses"
+CATALOG_RESPONSE_PREFIX = "catalog:response"
+# Product fields that change with every sale. They are re-read on each cache
+# hit instead of invalidating the cache, which would empty it on every
+# checkout.
+VOLATILE_FIELDS = ("stock_quantity", "updated_at")
+
+
+def _new_version():
+    # Seeded from the clock so a fresh or evicted counter never reuses a
+    # version that may still have responses cached under it.
+    return time.time_ns() // 1000
+
+
+def get_catalog_version():
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        version = _new_version()
+        if not cache.add(CATALOG_VERSION_KEY, version, timeout=None):
+            version = cache.get(CATALOG_VERSION_KEY, version)
+    return version
+
+
+def _bump():
+    try:
+        cache.incr(CATALOG_VERSION_KEY)
+    except ValueError:
+        cache.set(CATALOG_VERSION_KEY, _new_version(), timeout=None)
+
+
+def bump_catalog_version():
+    """
+    Invalidate every cached catalog response by moving to a new version.
+
+    The bump runs once the surrounding transaction commits, so a concurrent
+    request cannot cache pre-commit data under the new version.
+    """
+    transaction.on_commit(_bump)
+
+
+def _incr(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, timeout=None):
+            cache.incr(key)
+
+
+def get_catalog_cache_stats():
+    version = get_catalog_version()
+    hits = cache.get(CATALOG_HITS_KEY, 0)
+    misses = cache.get(CATALOG_MISSES_KEY, 0)
+    total = hits + misses
+    return {
+        "version": version,
+        "hits": hits,
+        "misses": misses,
+        "hit_ratio": round(hits / total, 4) if total else 0.0,
+    }
+
+
+def _stocked_products(data):
+    # Product payloads in a response, found by their stock_quantity key.
+    if isinstance(data, dict):
+        if "stock_quantity" in data:
+            yield data
+        for value in data.values():
+            yield from _stocked_products(value)
+    elif isinstance(data, list):
+        for value in data:
+            yield from _stocked_products(value)
+
+
+def _cacheable(data):
+    # Stock can only be refreshed in products that include their id.
+    return all("id" in product for product in _stocked_products(data))
+
+
+def _refresh_volatile_fields(data):
+    products = list(_stocked_products(data))
+    if not products:
+        return data
+    from product_management.models import Product
+
+    current = {
+        row[0]: row[1:]
+        for row in Product.objects.filter(
+            pk__in={product["id"] for product in products}
+        ).values_list("id", *VOLATILE_FIELDS)
+    }
+    date_field = serializers.DateTimeField()
+    for product in products:
+        if product["id"] not in current:
+            continue
+        stock_quantity, updated_at = current[product["id"]]
+        product["stock_quantity"] = stock_quantity
+        if "updated_at" in product:
+            product["updated_at"] = date_field.to_representation(updated_at)
+    return data
+
+
+def _response_key(request):
+    digest = hashlib.md5(request.build_absolute_uri().encode()).hexdigest()
+    return f"{CATALOG_RESPONSE_PREFIX}:{digest}"
+
+
+def catalog_cache(view_method):
+    """
+    Cache the ``Response.data`` of a catalog GET handler under the current
+    catalog version. Only successful responses are stored, and the
+    ``VOLATILE_FIELDS`` of the products in a cached response are read again,
+    in one query, every time it is served.
+    """
+
+    @functools.wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        key = _response_key(request)
+        version = get_catalog_version()
+        data = cache.get(key, version=version)
+        if data is not None:
+            _incr(CATALOG_HITS_KEY)
+            response = Response(_refresh_volatile_fields(data))
+            response["X-Cache"] = "HIT"
+            return response
+
+        _incr(CATALOG_MISSES_KEY)
+        response = view_method(self, request, *args, **kwargs)
+        if response.status_code == 200 and _cacheable(response.data):
+            cache.set(
+                key, response.data, settings.CATALOG_CACHE_TIMEOUT, version=version
+            )
+        response["X-Cache"] = "MISS"
+        return response
+
+    return wrapper
+
+
+def catalog_conditional(view_method):
+    """
+    Attach an ETag to successful catalog GETs and answer a matching
+    If-None-Match with 304.
+
+    The ETag is a hash of the rendered body, so it follows exactly what is
+    served (stock included) without querying the whole catalog, and every
+    process derives the same one. No Last-Modified is sent: nothing in the
+    catalog gives a timestamp that cannot move backwards after a delete.
+    Wrap it around ``catalog_cache`` so matching requests stay cheap.
+    """
+
+    @functools.wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        response = view_method(self, request, *args, **kwargs)
+        if response.status_code != 200:
+            return response
+        body = JSONRenderer().render(response.data).decode()
+        etag = make_etag(body, request.build_absolute_uri())
+        not_modified = not_modified_response(request, etag)
+        if not_modified is not None:
+            return not_modified
+        return set_validators(response, etag)
+
+    return wrapper
@@ -0,0 +1,61 @@
+from common.streaming import csv_value, csv_writer, ndjson_line
+from product_management.models import Product
+
+DEFAULT_CHUNK_SIZE = 2000
+FORMATS = ("csv", "ndjson")
+CONTENT_TYPES = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+# Column names match the importer's, so an export can be imported again.
+EXPORT_FIELDS = {
+    "id": "id",
+    "slug": "slug",
+    "name": "name",
+    "description": "description",
+    "category": "category__slug",
+    "price": "price",
+    "stock_quantity": "stock_quantity",
+    "image": "image",
+    "created_at": "created_at",
+    "updated_at": "updated_at",
+}
+
+
+def iter_products(updated_after=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Yield every live product as a dict of ``EXPORT_FIELDS``, fetched in
+    chunks through a server-side cursor where the database supports one.
+    """
+    products = Product.objects.filter(is_active=True, is_deleted=False)
+    if updated_after is not None:
+        products = products.filter(updated_at__gt=updated_after)
+    rows = (
+        products.order_by("id")
+        .values_list(*EXPORT_FIELDS.values())
+        .iterator(chunk_size=chunk_size)
+    )
+    for row in rows:
+        yield dict(zip(EXPORT_FIELDS, row))
+
+
+def iter_csv(products):
+    writer = csv_writer()
+    yield writer.writerow(EXPORT_FIELDS)
+    for product in products:
+        yield writer.writerow([csv_value(value) for value in product.values()])
+
+
+def iter_ndjson(products):
+    for product in products:
+        yield ndjson_line(product)
+
+
+def export_products(file_format, updated_after=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Return a generator of text chunks with the catalog in ``file_format``.
+    Memory use does not depend on the size of the catalog.
+    """
+    products = iter_products(updated_after=updated_after, chunk_size=chunk_size)
+    if file_format == "csv":
+        return iter_csv(products)
+    if file_format == "ndjson":
+        return iter_ndjson(products)
+    raise ValueError(f"Unsupported export format: {file_format}")
@@ -0,0 +1,81 @@
+from decimal import Decimal
+from django.db.models import Case, Count, IntegerField, OuterRef, Subquery, Value, When
+from django.db.models.functions import Coalesce
+from product_management.cache import bump_catalog_version
+from product_management.models import Category, Product
+
+# Lower bounds of the price ranges; the last range is open-ended.
+PRICE_BUCKETS = (0, 25, 50, 100, 250, 500, 1000)
+
+
+def _price_bucket():
+    return Case(
+        *[
+            When(price__lt=upper, then=Value(index))
+            for index, upper in enumerate(PRICE_BUCKETS[1:])
+        ],
+        default=Value(len(PRICE_BUCKETS) - 1),
+        output_field=IntegerField(),
+    )
+
+
+def _price(value):
+    return None if value is None else f"{Decimal(value):.2f}"
+
+
+def product_facets(queryset):
+    """
+    Category counts and price-range counts for ``queryset``, from one query
+    grouped by (category, price range).
+    """
+    rows = (
+        queryset.order_by()
+        .annotate(price_bucket=_price_bucket())
+        .values("category_id", "category__name", "category__slug", "price_bucket")
+        .annotate(count=Count("id"))
+    )
+
+    categories = {}
+    bucket_counts = [0] * len(PRICE_BUCKETS)
+    for row in rows:
+        category = categories.setdefault(
+            row["category_id"],
+            {
+                "id": row["category_id"],
+                "name": row["category__name"],
+                "slug": row["category__slug"],
+                "count": 0,
+            },
+        )
+        category["count"] += row["count"]
+        bucket_counts[row["price_bucket"]] += row["count"]
+
+    uppers = PRICE_BUCKETS[1:] + (None,)
+    return {
+        "categories": sorted(categories.values(), key=lambda c: (c["name"], c["id"])),
+        "price_ranges": [
+            {"min": _price(lower), "max": _price(upper), "count": count}
+            for lower, upper, count in zip(PRICE_BUCKETS, uppers, bucket_counts)
+        ],
+    }
+
+
+def refresh_product_counts(category_ids=None):
+    """
+    Recompute ``Category.product_count`` from scratch, for after bulk writes
+    that bypass ``Product.save``.
+    """
+    live_count = (
+        Product.objects.filter(
+            category=OuterRef("pk"), is_active=True, is_deleted=False
+        )
+        .order_by()
+        .values("category")
+        .annotate(count=Count("id"))
+        .values("count")
+    )
+    categories = Category.objects.all()
+    if category_ids is not None:
+        categories = categories.filter(pk__in=category_ids)
+    categories.update(product_count=Coalesce(Subquery(live_count), 0))
+    bump_catalog_version()
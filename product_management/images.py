@@ -0,0 +1,114 @@
+import hashlib
+import io
+import logging
+import os
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+from product_management.models import Product
+
+logger = logging.getLogger(__name__)
+
+DERIVATIVES_DIR = "products/derivatives"
+THUMBNAIL_SIZE = (320, 320)
+WEBP_MAX_SIZE = (1600, 1600)
+VARIANTS = {
+    "thumbnail": {"size": THUMBNAIL_SIZE, "crop": True, "format": "JPEG"},
+    "thumbnail_webp": {"size": THUMBNAIL_SIZE, "crop": True, "format": "WEBP"},
+    "webp": {"size": WEBP_MAX_SIZE, "crop": False, "format": "WEBP"},
+}
+EXTENSIONS = {"JPEG": "jpg", "WEBP": "webp"}
+SAVE_OPTIONS = {
+    "JPEG": {"quality": 85, "optimize": True, "progressive": True},
+    "WEBP": {"quality": 80, "method": 6},
+}
+
+
+def needs_derivatives(product):
+    return bool(product.image) and (
+        product.image_variants.get("source") != product.image.name
+    )
+
+
+def render_variant(image, spec):
+    if spec["crop"]:
+        image = ImageOps.fit(image, spec["size"], Image.Resampling.LANCZOS)
+    else:
+        image = image.copy()
+        image.thumbnail(spec["size"], Image.Resampling.LANCZOS)
+
+    image_format = spec["format"]
+    if image_format == "JPEG" and image.mode != "RGB":
+        rgba = image.convert("RGBA")
+        image = Image.new("RGB", rgba.size, (255, 255, 255))
+        image.paste(rgba, mask=rgba.getchannel("A"))
+    elif image_format == "WEBP" and image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA" if image.mode in ("LA", "P") else "RGB")
+
+    buffer = io.BytesIO()
+    image.save(buffer, format=image_format, **SAVE_OPTIONS[image_format])
+    return buffer.getvalue()
+
+
+def store_variant(storage, source_name, variant, data, extension):
+    # Names carry a hash of the file contents, so a URL never changes meaning
+    # and can be cached forever; identical output is stored only once.
+    stem = os.path.splitext(os.path.basename(source_name))[0]
+    digest = hashlib.sha256(data).hexdigest()[:16]
+    name = f"{DERIVATIVES_DIR}/{stem}.{variant}.{digest}.{extension}"
+    if storage.exists(name):
+        return name
+    return storage.save(name, ContentFile(data))
+
+
+def generate_derivatives(product):
+    """
+    Render every variant of ``product.image`` and record their storage names
+    in ``product.image_variants``.
+    """
+    storage = product.image.storage
+    source_name = product.image.name
+    with storage.open(source_name, "rb") as handle:
+        with Image.open(handle) as original:
+            original = ImageOps.exif_transpose(original)
+            files = {}
+            for variant, spec in VARIANTS.items():
+                data = render_variant(original, spec)
+                files[variant] = store_variant(
+                    storage, source_name, variant, data, EXTENSIONS[spec["format"]]
+                )
+
+    product.image_variants = {"source": source_name, "files": files}
+    product.save(update_fields=["image_variants", "updated_at"])
+
+
+def generate_missing_derivatives(queryset=None, force=False):
+    """
+    Generate derivatives for products whose image has none yet (or all
+    products with an image when ``force`` is set). Returns
+    ``(generated, failed)`` counts.
+    """
+    if queryset is None:
+        queryset = Product.objects.all()
+    queryset = (
+        queryset.exclude(image="")
+        .exclude(image__isnull=True)
+        .only("id", "slug", "image", "image_variants")
+        .order_by("id")
+    )
+
+    generated = failed = 0
+    for product in queryset.iterator(chunk_size=200):
+        if not force and not needs_derivatives(product):
+            continue
+        try:
+            generate_derivatives(product)
+        except (OSError, Image.DecompressionBombError) as e:
+            failed += 1
+            logger.warning(
+                "Could not generate image derivatives for product %s: %s",
+                product.pk,
+                e,
+            )
+            continue
+        generated += 1
+    return generated, failed
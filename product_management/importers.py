@@ -0,0 +1,204 @@
+import csv
+import json
+from django.db import DatabaseError, transaction
+from django.utils.text import slugify
+from product_management.cache import bump_catalog_version
+from product_management.facets import refresh_product_counts
+from product_management.models import Category, Product
+from product_management.search import update_search_index
+from product_management.serializers import ProductImportRowSerializer
+
+DEFAULT_CHUNK_SIZE = 1000
+MAX_REPORTED_ERRORS = 1000
+# Columns an import row may update. An existing product only has the ones
+# the row supplies written over, so a price-only feed leaves stock alone.
+UPSERT_FIELDS = [
+    "name",
+    "description",
+    "category",
+    "price",
+    "stock_quantity",
+    "is_active",
+]
+FORMATS = ("csv", "ndjson")
+
+
+class InvalidRow:
+    def __init__(self, error):
+        self.error = error
+
+
+def _text_lines(lines):
+    for line in lines:
+        yield line.decode("utf-8-sig") if isinstance(line, bytes) else line
+
+
+def iter_csv_rows(lines):
+    reader = csv.DictReader(_text_lines(lines))
+    for row in reader:
+        # Empty cells mean "not provided" so optional fields get their defaults.
+        yield {
+            key: value for key, value in row.items() if key and value not in ("", None)
+        }
+
+
+def iter_ndjson_rows(lines):
+    for line in _text_lines(lines):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield InvalidRow(f"Invalid JSON: {e.msg}")
+            continue
+        if not isinstance(row, dict):
+            yield InvalidRow("Each line must be a JSON object")
+            continue
+        yield row
+
+
+def iter_rows(lines, file_format):
+    if file_format == "csv":
+        return iter_csv_rows(lines)
+    if file_format == "ndjson":
+        return iter_ndjson_rows(lines)
+    raise ValueError(f"Unsupported import format: {file_format}")
+
+
+def _category_lookup():
+    lookup = {}
+    for pk, slug, name in Category.objects.filter(
+        is_active=True, is_deleted=False
+    ).values_list("id", "slug", "name"):
+        lookup[str(pk)] = pk
+        lookup[slug.lower()] = pk
+        lookup[name.lower()] = pk
+    return lookup
+
+
+class ProductImporter:
+    """
+    Upsert products by slug from an iterable of row dicts.
+
+    Rows are validated one by one and written in chunks, each chunk with an
+    ``INSERT ... ON CONFLICT (slug) DO UPDATE`` per set of supplied columns
+    inside its own transaction. ``report`` collects per-row errors as the import runs.
+    """
+
+    def __init__(self, chunk_size=DEFAULT_CHUNK_SIZE):
+        self.chunk_size = chunk_size
+        self.context = {"categories": _category_lookup()}
+        self.processed = 0
+        self.upserted = 0
+        self.failed = 0
+        self.errors = []
+
+    def add_error(self, row_number, errors):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"row": row_number, "errors": errors})
+
+    def run(self, rows):
+        chunk = {}
+        for row_number, row in enumerate(rows, start=1):
+            self.processed += 1
+            product = self.build_product(row_number, row)
+            if product is None:
+                continue
+            fields = tuple(field for field in UPSERT_FIELDS if field in row)
+            # A slug repeated inside one chunk would hit the same row twice in
+            # a single upsert, which PostgreSQL rejects; the last one wins.
+            previous = chunk.pop(product.slug, None)
+            if previous is not None:
+                self.add_error(previous[0], {"slug": ["Overridden by a later row"]})
+            chunk[product.slug] = (row_number, product, fields)
+            if len(chunk) >= self.chunk_size:
+                self.flush(chunk)
+                chunk = {}
+        if chunk:
+            self.flush(chunk)
+        if self.upserted:
+            # Upserts bypass Product.save, so recount once at the end.
+            refresh_product_counts()
+        return self.report()
+
+    def build_product(self, row_number, row):
+        if isinstance(row, InvalidRow):
+            self.add_error(row_number, {"non_field_errors": [row.error]})
+            return None
+
+        serializer = ProductImportRowSerializer(data=row, context=self.context)
+        if not serializer.is_valid():
+            self.add_error(row_number, serializer.errors)
+            return None
+
+        data = serializer.validated_data
+        slug = data.get("slug") or slugify(data["name"])
+        if not slug:
+            self.add_error(row_number, {"slug": ["Could not derive a slug from name"]})
+            return None
+        return Product(
+            slug=slug,
+            name=data["name"],
+            description=data["description"],
+            category_id=data["category"],
+            price=data["price"],
+            stock_quantity=data["stock_quantity"],
+            is_active=data["is_active"],
+            is_deleted=False,
+        )
+
+    def flush(self, chunk):
+        # A soft-deleted product keeps its slug; importing it again must not
+        # bring it back, so those rows are reported instead of upserted.
+        deleted = Product.objects.filter(
+            slug__in=chunk.keys(), is_deleted=True
+        ).values_list("slug", flat=True)
+        for slug in deleted:
+            row_number = chunk.pop(slug)[0]
+            self.add_error(row_number, {"slug": ["Product has been deleted"]})
+        if not chunk:
+            return
+        # One upsert per set of supplied columns; usually the whole chunk.
+        groups = {}
+        for _, product, fields in chunk.values():
+            groups.setdefault(fields, []).append(product)
+        try:
+            with transaction.atomic():
+                for fields, products in groups.items():
+                    Product.objects.bulk_create(
+                        products,
+                        update_conflicts=True,
+                        unique_fields=["slug"],
+                        update_fields=[*fields, "updated_at"],
+                    )
+                product_ids = list(
+                    Product.objects.filter(slug__in=chunk.keys()).values_list(
+                        "id", flat=True
+                    )
+                )
+                update_search_index(product_ids)
+                bump_catalog_version()
+        except DatabaseError as e:
+            for row_number, _, _ in chunk.values():
+                self.add_error(row_number, {"non_field_errors": [str(e)]})
+            return
+        self.upserted += len(chunk)
+
+    def report(self):
+        return {
+            "processed": self.processed,
+            "upserted": self.upserted,
+            "failed": self.failed,
+            "errors": self.errors,
+            "errors_truncated": self.failed > len(self.errors),
+        }
+
+
+def import_products(lines, file_format, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Stream ``lines`` (bytes or str) in ``file_format`` into the catalog and
+    return the import report.
+    """
+    return ProductImporter(chunk_size=chunk_size).run(iter_rows(lines, file_format))
@@ -0,0 +1,52 @@
+import datetime
+import sys
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from product_management.exporters import DEFAULT_CHUNK_SIZE, FORMATS, export_products
+
+
+class Command(BaseCommand):
+    help = "Stream every active product to a CSV or NDJSON file"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "path", nargs="?", default="-", help="Output file, or - for stdout"
+        )
+        parser.add_argument("--format", choices=FORMATS, default="ndjson")
+        parser.add_argument(
+            "--updated-after",
+            help="Only export products updated after this ISO 8601 datetime",
+        )
+        parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        updated_after = None
+        if options["updated_after"]:
+            try:
+                updated_after = parse_datetime(options["updated_after"])
+            except ValueError:
+                pass
+            if updated_after is None:
+                raise CommandError("--updated-after must be an ISO 8601 datetime")
+            if timezone.is_naive(updated_after):
+                updated_after = timezone.make_aware(
+                    updated_after, datetime.timezone.utc
+                )
+        if options["chunk_size"] < 1:
+            raise CommandError("--chunk-size must be at least 1")
+
+        chunks = export_products(
+            options["format"],
+            updated_after=updated_after,
+            chunk_size=options["chunk_size"],
+        )
+        path = options["path"]
+        if path == "-":
+            sys.stdout.writelines(chunks)
+            return
+        try:
+            with open(path, "w", encoding="utf-8", newline="") as handle:
+                handle.writelines(chunks)
+        except OSError as e:
+            raise CommandError(str(e))
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from product_management.images import generate_missing_derivatives
+from product_management.models import Product
+
+
+class Command(BaseCommand):
+    help = "Generate thumbnail and WebP derivatives for product images"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "product_ids", nargs="*", type=int, help="Limit to these products"
+        )
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Regenerate derivatives that are already up to date",
+        )
+
+    def handle(self, *args, **options):
+        queryset = Product.objects.all()
+        if options["product_ids"]:
+            queryset = queryset.filter(pk__in=options["product_ids"])
+
+        generated, failed = generate_missing_derivatives(
+            queryset, force=options["force"]
+        )
+        if failed:
+            self.stderr.write(f"{failed} product images could not be processed")
+        self.stdout.write(
+            self.style.SUCCESS(f"Generated derivatives for {generated} products")
+        )
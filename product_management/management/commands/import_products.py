@@ -0,0 +1,54 @@
+import json
+import sys
+from django.core.management.base import BaseCommand, CommandError
+from product_management.importers import DEFAULT_CHUNK_SIZE, FORMATS, import_products
+
+
+class Command(BaseCommand):
+    help = "Upsert products by slug from a CSV or NDJSON file"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="File to import, or - for stdin")
+        parser.add_argument(
+            "--format",
+            choices=FORMATS,
+            help="Input format (defaults to the file extension)",
+        )
+        parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        file_format = options["format"]
+        if file_format is None:
+            extension = path.rsplit(".", 1)[-1].lower()
+            file_format = {"csv": "csv", "ndjson": "ndjson", "jsonl": "ndjson"}.get(
+                extension
+            )
+        if file_format is None:
+            raise CommandError("Could not infer the format, pass --format")
+        if options["chunk_size"] < 1:
+            raise CommandError("--chunk-size must be at least 1")
+
+        if path == "-":
+            report = import_products(
+                sys.stdin, file_format, chunk_size=options["chunk_size"]
+            )
+        else:
+            try:
+                with open(path, encoding="utf-8-sig", newline="") as handle:
+                    report = import_products(
+                        handle, file_format, chunk_size=options["chunk_size"]
+                    )
+            except OSError as e:
+                raise CommandError(str(e))
+
+        for error in report["errors"]:
+            self.stderr.write(f"Row {error['row']}: {json.dumps(error['errors'])}")
+        if report["errors_truncated"]:
+            self.stderr.write("Further row errors were not reported")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Processed {report['processed']} rows: "
+                f"{report['upserted']} upserted, {report['failed']} failed"
+            )
+        )
@@ -0,0 +1,56 @@
+# Generated by Django 5.2.8 on 2026-10-18 00:59
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == "postgresql":
+        schema_editor.execute(
+            "CREATE INDEX product_search_vector_gin "
+            "ON product_management_product USING GIN (search_vector)"
+        )
+        schema_editor.execute(
+            "UPDATE product_management_product SET search_vector = "
+            "setweight(to_tsvector('english', coalesce(name, '')), 'A') || "
+            "setweight(to_tsvector('english', coalesce(description, '')), 'B')"
+        )
+    elif connection.vendor == "sqlite":
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA compile_options")
+            options = {row[0] for row in cursor.fetchall()}
+        if "ENABLE_FTS5" not in options:
+            return
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE product_management_product_fts "
+            "USING fts5(name, description, tokenize = 'porter unicode61')"
+        )
+        schema_editor.execute(
+            "INSERT INTO product_management_product_fts (rowid, name, description) "
+            "SELECT id, name, description FROM product_management_product"
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == "postgresql":
+        schema_editor.execute("DROP INDEX IF EXISTS product_search_vector_gin")
+    elif connection.vendor == "sqlite":
+        schema_editor.execute("DROP TABLE IF EXISTS product_management_product_fts")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product_management', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
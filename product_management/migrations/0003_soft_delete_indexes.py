@@ -0,0 +1,21 @@
+# Generated by Django 5.2.8 on 2026-10-18 01:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product_management', '0002_product_search_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='category',
+            index=models.Index(condition=models.Q(('is_active', True), ('is_deleted', False)), fields=['name'], name='category_live_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('is_active', True), ('is_deleted', False)), fields=['category', 'name', 'id'], name='product_live_cat_name_idx'),
+        ),
+    ]
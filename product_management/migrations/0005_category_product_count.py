@@ -0,0 +1,36 @@
+# Generated by Django 5.2.8 on 2026-10-18 01:11
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_products(apps, schema_editor):
+    Category = apps.get_model("product_management", "Category")
+    Product = apps.get_model("product_management", "Product")
+    live_count = (
+        Product.objects.filter(
+            category=OuterRef("pk"), is_active=True, is_deleted=False
+        )
+        .order_by()
+        .values("category")
+        .annotate(count=Count("id"))
+        .values("count")
+    )
+    Category.objects.update(product_count=Coalesce(Subquery(live_count), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product_management', '0004_product_image_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='product_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(count_products, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,54 @@
+from django.db import migrations
+
+
+def create_prefix_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == "postgresql":
+        # Add unstemmed ('simple') lexemes next to the stemmed ones.
+        schema_editor.execute(
+            "UPDATE product_management_product SET search_vector = "
+            "setweight(to_tsvector('english', coalesce(name, '')), 'A') || "
+            "setweight(to_tsvector('simple', coalesce(name, '')), 'A') || "
+            "setweight(to_tsvector('english', coalesce(description, '')), 'B') || "
+            "setweight(to_tsvector('simple', coalesce(description, '')), 'B')"
+        )
+    elif connection.vendor == "sqlite":
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA compile_options")
+            options = {row[0] for row in cursor.fetchall()}
+        if "ENABLE_FTS5" not in options:
+            return
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE product_management_product_fts_prefix "
+            "USING fts5(name, description, tokenize = 'unicode61')"
+        )
+        schema_editor.execute(
+            "INSERT INTO product_management_product_fts_prefix "
+            "(rowid, name, description) "
+            "SELECT id, name, description FROM product_management_product"
+        )
+
+
+def drop_prefix_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == "postgresql":
+        schema_editor.execute(
+            "UPDATE product_management_product SET search_vector = "
+            "setweight(to_tsvector('english', coalesce(name, '')), 'A') || "
+            "setweight(to_tsvector('english', coalesce(description, '')), 'B')"
+        )
+    elif connection.vendor == "sqlite":
+        schema_editor.execute(
+            "DROP TABLE IF EXISTS product_management_product_fts_prefix"
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product_management', '0006_product_updated_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_prefix_index, drop_prefix_index),
+    ]
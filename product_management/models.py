@@ -1,16 +1,29 @@
-from django.db import models
+from django.contrib.postgres.search import SearchVectorField
+from django.db import models, transaction
+from django.db.models import F
 from django.utils.text import slugify
-from common.models import BaseModel
+from common.models import BaseModel, LIVE_ROWS
+from product_management.cache import bump_catalog_version
+from product_management.search import update_search_index
 
 
 class Category(BaseModel):
     name = models.CharField(max_length=100, unique=True)
     slug = models.SlugField(max_length=100, unique=True, blank=True)
     description = models.TextField(blank=True)
+    # Live (active, not deleted) products; maintained by Product.save/delete.
+    product_count = models.PositiveIntegerField(default=0, editable=False)
 
     class Meta:
         verbose_name_plural = "Categories"
         ordering = ["name"]
+        indexes = [
+            models.Index(
+                fields=["name"],
+                name="category_live_name_idx",
+                condition=LIVE_ROWS,
+            ),
+        ]
 
     def __str__(self):
         return self.name
@@ -19,6 +32,18 @@ class Category(BaseModel):
         if not self.slug:
             self.slug = slugify(self.name)
         super().save(*args, **kwargs)
+        bump_catalog_version()
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        bump_catalog_version()
+        return result
+
+
+def _adjust_product_count(category_id, delta):
+    Category.objects.filter(pk=category_id).update(
+        product_count=F("product_count") + delta
+    )
 
 
 class Product(BaseModel):
@@ -31,14 +56,92 @@ class Product(BaseModel):
     price = models.DecimalField(max_digits=10, decimal_places=2)
     stock_quantity = models.IntegerField(default=0)
     image = models.ImageField(upload_to="products/", blank=True, null=True)
+    # Written by product_management.images:
+    # {"source": <image name>, "files": {<variant>: <storage name>}}
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
+    # Maintained by product_management.search; only populated on PostgreSQL.
+    search_vector = SearchVectorField(null=True, editable=False)
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            models.Index(
+                fields=["category", "name", "id"],
+                name="product_live_cat_name_idx",
+                condition=LIVE_ROWS,
+            ),
+            # Not partial: the changes feed also reports deleted products.
+            models.Index(fields=["updated_at", "id"], name="product_updated_idx"),
+        ]
+
+    # Fields that decide whether and where a product is counted in
+    # Category.product_count.
+    COUNTED_FIELDS = {"category", "category_id", "is_active", "is_deleted"}
 
     def __str__(self):
         return self.name
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if {"category_id", "is_active", "is_deleted"} <= set(field_names):
+            instance._counted_category_id = instance.live_category_id()
+        return instance
+
+    def live_category_id(self):
+        return self.category_id if self.is_active and not self.is_deleted else None
+
+    def _previous_live_category_id(self):
+        if self._state.adding:
+            return None
+        if hasattr(self, "_counted_category_id"):
+            return self._counted_category_id
+        row = (
+            Product.objects.filter(pk=self.pk)
+            .values_list("category_id", "is_active", "is_deleted")
+            .first()
+        )
+        if row is None:
+            return None
+        category_id, is_active, is_deleted = row
+        return category_id if is_active and not is_deleted else None
+
     def save(self, *args, **kwargs):
+        update_fields = kwargs.get("update_fields")
+        track_count = update_fields is None or bool(
+            self.COUNTED_FIELDS & set(update_fields)
+        )
+        if track_count:
+            previous_category_id = self._previous_live_category_id()
+
         if not self.slug:
             self.slug = slugify(self.name)
-        super().save(*args, **kwargs)
+        if self.image_variants and self.image_variants.get("source") != self.image.name:
+            # The image was replaced or removed, so its derivatives are stale.
+            self.image_variants = {}
+            if kwargs.get("update_fields") is not None:
+                kwargs["update_fields"] = {*kwargs["update_fields"], "image_variants"}
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if track_count:
+                category_id = self.live_category_id()
+                if category_id != previous_category_id:
+                    if previous_category_id is not None:
+                        _adjust_product_count(previous_category_id, -1)
+                    if category_id is not None:
+                        _adjust_product_count(category_id, 1)
+        if track_count:
+            self._counted_category_id = category_id
+
+        if update_fields is None or {"name", "description"} & set(update_fields):
+            update_search_index([self.pk])
+        bump_catalog_version()
+
+    def delete(self, *args, **kwargs):
+        previous_category_id = self._previous_live_category_id()
+        with transaction.atomic():
+            result = super().delete(*args, **kwargs)
+            if previous_category_id is not None:
+                _adjust_product_count(previous_category_id, -1)
+        bump_catalog_version()
+        return result
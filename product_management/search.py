@@ -0,0 +1,153 @@
+import re
+from django.db import connection
+from django.db.models import F, FloatField, Q
+from django.db.models.expressions import RawSQL
+
+SEARCH_CONFIG = "english"
+# Unstemmed words, for prefixes of words the stemmer would cut differently:
+# "runn" is a prefix of "running" but not of its stem "run".
+PREFIX_CONFIG = "simple"
+SQLITE_FTS_TABLE = "product_management_product_fts"
+SQLITE_PREFIX_TABLE = "product_management_product_fts_prefix"
+PRODUCT_TABLE = "product_management_product"
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def _tokens(term):
+    return TOKEN_RE.findall(term.lower())
+
+
+_backends = {}
+
+
+def _detect_backend():
+    if connection.vendor == "postgresql":
+        return "postgresql"
+    if connection.vendor == "sqlite":
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT count(*) FROM sqlite_master WHERE type = 'table' "
+                "AND name IN (%s, %s)",
+                [SQLITE_FTS_TABLE, SQLITE_PREFIX_TABLE],
+            )
+            if cursor.fetchone()[0] == 2:
+                return "sqlite"
+    return None
+
+
+def search_backend():
+    """
+    Return the full-text backend available on the default connection:
+    "postgresql", "sqlite" or None when only icontains matching is possible.
+    Looked up once per database.
+    """
+    key = (connection.alias, connection.settings_dict["NAME"])
+    if key not in _backends:
+        _backends[key] = _detect_backend()
+    return _backends[key]
+
+
+def search_vector():
+    """
+    The ``search_vector`` expression: name and description, both stemmed and
+    unstemmed.
+    """
+    from django.contrib.postgres.search import SearchVector
+
+    return (
+        SearchVector("name", weight="A", config=SEARCH_CONFIG)
+        + SearchVector("name", weight="A", config=PREFIX_CONFIG)
+        + SearchVector("description", weight="B", config=SEARCH_CONFIG)
+        + SearchVector("description", weight="B", config=PREFIX_CONFIG)
+    )
+
+
+def update_search_index(product_ids):
+    """
+    Refresh the search index for the given products in one statement per backend.
+    """
+    product_ids = [pk for pk in product_ids if pk is not None]
+    if not product_ids:
+        return
+
+    backend = search_backend()
+    if backend == "postgresql":
+        from product_management.models import Product
+
+        Product.objects.filter(pk__in=product_ids).update(search_vector=search_vector())
+    elif backend == "sqlite":
+        placeholders = ", ".join(["%s"] * len(product_ids))
+        with connection.cursor() as cursor:
+            for table in (SQLITE_FTS_TABLE, SQLITE_PREFIX_TABLE):
+                cursor.execute(
+                    f"DELETE FROM {table} WHERE rowid IN ({placeholders})",
+                    product_ids,
+                )
+                cursor.execute(
+                    f"INSERT INTO {table} (rowid, name, description) "
+                    f"SELECT id, name, description FROM {PRODUCT_TABLE} "
+                    f"WHERE id IN ({placeholders})",
+                    product_ids,
+                )
+
+
+def search_products(queryset, term):
+    """
+    Filter ``queryset`` to products matching ``term`` and order them by relevance.
+
+    Every word is matched as a prefix so results update while the user types,
+    against both the stemmed and the unstemmed index: "runs" finds "running"
+    through the stem and "runn" finds it through the word. Falls back to
+    icontains matching when no full-text backend is available.
+    """
+    tokens = _tokens(term)
+    if not tokens:
+        return queryset.none()
+
+    backend = search_backend()
+    if backend == "postgresql":
+        from django.contrib.postgres.search import SearchQuery, SearchRank
+
+        query = None
+        for token in tokens:
+            word = SearchQuery(
+                f"{token}:*", search_type="raw", config=SEARCH_CONFIG
+            ) | SearchQuery(f"{token}:*", search_type="raw", config=PREFIX_CONFIG)
+            query = word if query is None else query & word
+        return (
+            queryset.filter(search_vector=query)
+            .annotate(search_rank=SearchRank(F("search_vector"), query))
+            .order_by("-search_rank", "id")
+        )
+
+    if backend == "sqlite":
+        # Each word must match in either table, so a search can mix a stemmed
+        # match on one word with an unstemmed prefix on the next.
+        for token in tokens:
+            queryset = queryset.filter(
+                id__in=RawSQL(
+                    f"SELECT rowid FROM {SQLITE_FTS_TABLE} "
+                    f"WHERE {SQLITE_FTS_TABLE} MATCH %s "
+                    f"UNION SELECT rowid FROM {SQLITE_PREFIX_TABLE} "
+                    f"WHERE {SQLITE_PREFIX_TABLE} MATCH %s",
+                    [f'"{token}"*', f'"{token}"*'],
+                )
+            )
+        any_word = " OR ".join(f'"{token}"*' for token in tokens)
+        # bm25() is lower for better matches, so negate it to rank descending.
+        rank = RawSQL(
+            " + ".join(
+                f"coalesce((SELECT -bm25({table}, 10.0, 1.0) FROM {table} "
+                f"WHERE {table} MATCH %s AND {table}.rowid = {PRODUCT_TABLE}.id), 0)"
+                for table in (SQLITE_FTS_TABLE, SQLITE_PREFIX_TABLE)
+            ),
+            [any_word, any_word],
+            output_field=FloatField(),
+        )
+        return queryset.annotate(search_rank=rank).order_by("-search_rank", "id")
+
+    condition = Q()
+    for token in tokens:
+        condition &= Q(name__icontains=token) | Q(description__icontains=token)
+    return queryset.filter(condition)
@@ -1,20 +1,52 @@
-from rest_framework import serializers
+import decimal
+from django.db.models import FileField
+from django.utils import timezone
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
+from common.serializers import SparseFieldsMixin
 from product_management.models import Product, Category
 
 
-class CategorySerializer(serializers.ModelSerializer):
+class CategorySerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Category
+        fields = ("id", "name", "slug", "description", "product_count")
+        read_only_fields = ("product_count",)
+
+
+class ProductCategorySerializer(CategorySerializer):
+    class Meta(CategorySerializer.Meta):
         fields = ("id", "name", "slug", "description")
 
 
-class ProductSerializer(serializers.ModelSerializer):
-    category = CategorySerializer(read_only=True)
+class ImageVariantsField(serializers.Field):
+    """
+    URLs of the derivatives generated by ``product_management.images``, keyed
+    by variant name. Empty until the derivatives have been generated.
+    """
+
+    def __init__(self, **kwargs):
+        kwargs["read_only"] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        storage = Product._meta.get_field("image").storage
+        request = self.context.get("request")
+        urls = {}
+        for variant, name in value.get("files", {}).items():
+            url = storage.url(name)
+            urls[variant] = request.build_absolute_uri(url) if request else url
+        return urls
+
+
+class ProductSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    category = ProductCategorySerializer(read_only=True)
     category_id = serializers.PrimaryKeyRelatedField(
         queryset=Category.objects.filter(is_active=True, is_deleted=False),
         source="category",
         write_only=True,
     )
+    image_variants = ImageVariantsField()
 
     class Meta:
         model = Product
@@ -28,7 +60,198 @@ class ProductSerializer(serializers.ModelSerializer):
             "price",
             "stock_quantity",
             "image",
+            "image_variants",
             "created_at",
             "updated_at",
         )
         read_only_fields = ("slug", "created_at", "updated_at")
+
+
+class ProductImportRowSerializer(serializers.Serializer):
+    slug = serializers.SlugField(max_length=200, required=False)
+    name = serializers.CharField(max_length=200)
+    description = serializers.CharField(required=False, allow_blank=True, default="")
+    category = serializers.CharField(help_text="Category id, slug or name")
+    price = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=0)
+    stock_quantity = serializers.IntegerField(required=False, default=0)
+    is_active = serializers.BooleanField(required=False, default=True)
+
+    def validate_category(self, value):
+        categories = self.context["categories"]
+        category_id = categories.get(value.strip().lower())
+        if category_id is None:
+            raise serializers.ValidationError("Category not found or inactive")
+        return category_id
+
+
+class ProductBatchSerializer(serializers.Serializer):
+    MAX_IDS = 250
+
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=MAX_IDS,
+    )
+
+
+class StockAdjustmentItemSerializer(serializers.Serializer):
+    product_id = serializers.IntegerField()
+    delta = serializers.IntegerField()
+
+
+class StockAdjustmentSerializer(serializers.Serializer):
+    adjustments = StockAdjustmentItemSerializer(many=True, allow_empty=False)
+
+
+def _identity(value):
+    return value
+
+
+class ProductValuesSerializer:
+    """
+    Read-only equivalent of ``ProductSerializer`` for list endpoints.
+
+    Rows come from ``.values()`` so no model instances are built, and each
+    field's conversion is resolved once from ProductSerializer's own bound
+    fields, which keeps the output identical to the regular serializer.
+    """
+
+    serializer_class = ProductSerializer
+
+    def __init__(self, context=None):
+        serializer = self.serializer_class(context=context or {})
+        self.fields = self._compile(serializer, Product, prefix="")
+        self.value_fields = list(self._value_fields(self.fields))
+
+    def _compile(self, serializer, model, prefix):
+        compiled = []
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            if isinstance(field, serializers.BaseSerializer):
+                related = model._meta.get_field(field.source).related_model
+                nested = self._compile(field, related, f"{prefix}{field.source}__")
+                compiled.append((name, None, nested))
+                continue
+
+            model_field = model._meta.get_field(field.source)
+            converter = self._converter(field, model_field, serializer.context)
+            compiled.append((name, f"{prefix}{field.source}", converter))
+        return compiled
+
+    def _converter(self, field, model_field, context):
+        # The hot field types get converters with their settings resolved up
+        # front; each mirrors the field's own to_representation for the
+        # configuration it is used with. Anything else uses the field directly.
+        if isinstance(field, serializers.RelatedField):
+            # A nested object collapsed by ?fields=; .values() already gives
+            # the primary key.
+            return _identity
+        if isinstance(field, serializers.FileField):
+            return self._file_converter(field, model_field, context)
+        if isinstance(field, serializers.DateTimeField):
+            return self._datetime_converter(field)
+        if isinstance(field, serializers.DecimalField):
+            return self._decimal_converter(field)
+        return field.to_representation
+
+    @staticmethod
+    def _file_converter(field, model_field, context):
+        use_url = getattr(field, "use_url", api_settings.UPLOADED_FILES_USE_URL)
+        storage = model_field.storage
+        request = context.get("request")
+
+        def convert(name):
+            if not name:
+                return None
+            if not use_url:
+                return name
+            url = storage.url(name)
+            if request is not None:
+                return request.build_absolute_uri(url)
+            return url
+
+        return convert
+
+    @staticmethod
+    def _datetime_converter(field):
+        output_format = getattr(field, "format", api_settings.DATETIME_FORMAT)
+        field_timezone = (
+            field.timezone if hasattr(field, "timezone") else field.default_timezone()
+        )
+        if (
+            output_format is None
+            or output_format.lower() != ISO_8601
+            or field_timezone is None
+        ):
+            return field.to_representation
+
+        def convert(value):
+            if not timezone.is_aware(value):
+                return field.to_representation(value)
+            value = value.astimezone(field_timezone).isoformat()
+            if value.endswith("+00:00"):
+                value = value[:-6] + "Z"
+            return value
+
+        return convert
+
+    @staticmethod
+    def _decimal_converter(field):
+        coerce_to_string = getattr(
+            field, "coerce_to_string", api_settings.COERCE_DECIMAL_TO_STRING
+        )
+        if (
+            not coerce_to_string
+            or field.localize
+            or field.normalize_output
+            or field.decimal_places is None
+        ):
+            return field.to_representation
+        exponent = decimal.Decimal(".1") ** field.decimal_places
+        context = decimal.getcontext().copy()
+        if field.max_digits is not None:
+            context.prec = field.max_digits
+        rounding = field.rounding
+
+        def convert(value):
+            if not isinstance(value, decimal.Decimal):
+                return field.to_representation(value)
+            quantized = value.quantize(exponent, rounding=rounding, context=context)
+            return f"{quantized:f}"
+
+        return convert
+
+    def _value_fields(self, compiled):
+        for name, lookup, converter in compiled:
+            if lookup is None:
+                yield from self._value_fields(converter)
+            else:
+                yield lookup
+
+    def values(self, queryset, *extra):
+        # Keep the ordering columns too: cursor pagination reads them from
+        # the rows even when ?fields= leaves them out of the payload.
+        ordering = [
+            field.lstrip("-")
+            for field in queryset.query.order_by
+            if isinstance(field, str)
+        ]
+        names = dict.fromkeys([*self.value_fields, *ordering, *extra])
+        return queryset.values(*names)
+
+    def _render(self, compiled, row):
+        data = {}
+        for name, lookup, converter in compiled:
+            if lookup is None:
+                data[name] = self._render(converter, row)
+                continue
+            value = row[lookup]
+            data[name] = None if value is None else converter(value)
+        return data
+
+    def to_representation(self, row):
+        return self._render(self.fields, row)
+
+    def serialize(self, rows):
+        return [self._render(self.fields, row) for row in rows]
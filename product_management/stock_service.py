@@ -0,0 +1,86 @@
+from collections import defaultdict
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Q, Value, When
+from django.utils import timezone
+from product_management.models import Product
+
+
+class InsufficientStock(Exception):
+    def __init__(self, product_ids):
+        self.product_ids = list(product_ids)
+        super().__init__(
+            "Insufficient stock for products: "
+            + ", ".join(str(pk) for pk in self.product_ids)
+        )
+
+
+class _GuardFailed(Exception):
+    pass
+
+
+def _aggregate(adjustments):
+    deltas = defaultdict(int)
+    for product_id, delta in adjustments:
+        deltas[product_id] += delta
+    return {product_id: delta for product_id, delta in deltas.items() if delta}
+
+
+def adjust_stock(adjustments, strict=True):
+    """
+    Apply ``(product_id, delta)`` pairs to ``stock_quantity`` in a single
+    ``UPDATE ... SET stock_quantity = stock_quantity + CASE ...`` statement.
+
+    Decrements only apply where ``stock_quantity >= -delta``. With ``strict``
+    the whole batch is rolled back and ``InsufficientStock`` is raised if any
+    product is missing or would go negative; otherwise those products are
+    simply left unchanged.
+    """
+    deltas = _aggregate(adjustments)
+    if not deltas:
+        return
+
+    guard = Q()
+    for product_id, delta in deltas.items():
+        if delta < 0:
+            guard |= Q(pk=product_id, stock_quantity__gte=-delta)
+        else:
+            guard |= Q(pk=product_id)
+    new_stock = Case(
+        *[
+            When(pk=product_id, then=F("stock_quantity") + Value(delta))
+            for product_id, delta in deltas.items()
+        ],
+        default=F("stock_quantity"),
+        output_field=IntegerField(),
+    )
+
+    try:
+        with transaction.atomic():
+            updated = Product.objects.filter(guard).update(
+                stock_quantity=new_stock, updated_at=timezone.now()
+            )
+            if strict and updated != len(deltas):
+                raise _GuardFailed()
+    except _GuardFailed:
+        stock = dict(
+            Product.objects.filter(pk__in=deltas).values_list("id", "stock_quantity")
+        )
+        raise InsufficientStock(
+            product_id
+            for product_id, delta in deltas.items()
+            if product_id not in stock or stock[product_id] + delta < 0
+        )
+
+
+def decrement_stock(items, strict=True):
+    """
+    Take ``(product_id, quantity)`` pairs out of stock in one statement.
+    """
+    adjust_stock(((product_id, -quantity) for product_id, quantity in items), strict)
+
+
+def restore_stock(items):
+    """
+    Put ``(product_id, quantity)`` pairs back into stock in one statement.
+    """
+    adjust_stock(((product_id, quantity) for product_id, quantity in items), False)
@@ -1,3 +1,938 @@
-from django.test import TestCase
+import csv
+import datetime
+import io
+import json
+import tempfile
+import unittest
+from decimal import Decimal
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient, APIRequestFactory
+from administration.models import CustomUser
+from product_management.exporters import EXPORT_FIELDS, export_products
+from product_management.images import generate_derivatives, needs_derivatives
+from product_management.importers import import_products
+from product_management.models import Category, Product
+from product_management.search import search_backend, search_products
+from product_management.stock_service import (
+    InsufficientStock,
+    adjust_stock,
+    decrement_stock,
+    restore_stock,
+)
+from product_management.serializers import ProductSerializer, ProductValuesSerializer
 
-# Create your tests here.
+
+class ProductValuesSerializerTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        electronics = Category.objects.create(
+            name="Electronics", description="Electronic devices"
+        )
+        books = Category.objects.create(name="Books")
+        Product.objects.create(
+            name="Laptop",
+            description="High-performance laptop",
+            category=electronics,
+            price=Decimal("999.99"),
+            stock_quantity=5,
+            image="products/laptop.jpg",
+            image_variants={
+                "source": "products/laptop.jpg",
+                "files": {
+                    "thumbnail": "products/derivatives/laptop.thumbnail.0123.jpg",
+                    "webp": "products/derivatives/laptop.webp.4567.webp",
+                },
+            },
+        )
+        Product.objects.create(
+            name="Novel",
+            description="",
+            category=books,
+            price=Decimal("12.5"),
+            stock_quantity=0,
+        )
+        Product.objects.create(
+            name="Atlas",
+            description="World atlas",
+            category=books,
+            price=Decimal("30"),
+            image="",
+        )
+
+    def render_both(self, queryset, context):
+        expected = ProductSerializer(queryset, many=True, context=context).data
+        fast = ProductValuesSerializer(context=context)
+        actual = fast.serialize(fast.values(queryset))
+        return JSONRenderer().render(expected), JSONRenderer().render(actual)
+
+    def test_output_is_byte_identical(self):
+        request = APIRequestFactory().get("/api/v1/products/")
+        queryset = Product.objects.select_related("category").order_by("id")
+        expected, actual = self.render_both(queryset, {"request": request})
+        self.assertEqual(expected, actual)
+
+    def test_output_is_byte_identical_without_request(self):
+        queryset = Product.objects.select_related("category").order_by("id")
+        expected, actual = self.render_both(queryset, {})
+        self.assertEqual(expected, actual)
+
+
+class ProductSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name="Outdoor")
+        cls.shoes = Product.objects.create(
+            name="Running shoes",
+            description="Light trail shoes",
+            category=category,
+            price=Decimal("80.00"),
+        )
+        cls.kettle = Product.objects.create(
+            name="Camping kettle",
+            description="Boils water fast",
+            category=category,
+            price=Decimal("25.00"),
+        )
+
+    def search(self, term):
+        return list(search_products(Product.objects.all(), term))
+
+    def test_partial_words_match_as_prefixes(self):
+        for term in ("run", "runn", "runni", "running", "RUNNING", "runs"):
+            with self.subTest(term=term):
+                self.assertEqual(self.search(term), [self.shoes])
+        self.assertEqual(self.search("runn trai"), [self.shoes])
+        self.assertEqual(self.search("boil"), [self.kettle])
+        self.assertEqual(self.search("runn kett"), [])
+
+    def test_index_follows_product_changes(self):
+        self.kettle.name = "Running kettle"
+        self.kettle.save()
+        self.assertEqual(
+            {product.pk for product in self.search("runni")},
+            {self.shoes.pk, self.kettle.pk},
+        )
+
+    @unittest.skipUnless(connection.vendor == "sqlite", "SQLite only")
+    def test_sqlite_backend_is_detected_once(self):
+        self.assertEqual(search_backend(), "sqlite")
+        with self.assertNumQueries(0):
+            search_backend()
+
+    @unittest.skipUnless(connection.vendor == "postgresql", "PostgreSQL only")
+    def test_postgresql_backend(self):
+        self.assertEqual(search_backend(), "postgresql")
+
+
+class CatalogCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name="Tools")
+        cls.hammer = Product.objects.create(
+            name="Hammer",
+            description="",
+            category=category,
+            price=Decimal("15.00"),
+            stock_quantity=10,
+        )
+        cls.user = CustomUser.objects.create(username="diy", email="diy@x.com")
+        cls.other = CustomUser.objects.create(username="diy2", email="diy2@x.com")
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response["X-Cache"], response.data
+
+    def test_second_request_is_served_from_the_cache(self):
+        self.assertEqual(self.get("/api/v1/products/")[0], "MISS")
+        self.assertEqual(self.get("/api/v1/products/")[0], "HIT")
+        # Responses do not depend on the user, only on the URL.
+        self.client.force_authenticate(self.other)
+        self.assertEqual(self.get("/api/v1/products/")[0], "HIT")
+        self.assertEqual(self.get("/api/v1/products/?page_size=5")[0], "MISS")
+        self.assertEqual(self.get(f"/api/v1/products/{self.hammer.pk}/")[0], "MISS")
+
+    def test_product_changes_invalidate_the_cache(self):
+        self.get("/api/v1/products/")
+        self.hammer.name = "Claw hammer"
+        # The version moves once the transaction commits.
+        with self.captureOnCommitCallbacks(execute=True):
+            self.hammer.save()
+        state, data = self.get("/api/v1/products/")
+        self.assertEqual(state, "MISS")
+        self.assertEqual(data["results"][0]["name"], "Claw hammer")
+
+    def test_stock_changes_keep_the_cache_and_are_served_fresh(self):
+        urls = ("/api/v1/products/", f"/api/v1/products/{self.hammer.pk}/")
+        for url in urls:
+            self.get(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            decrement_stock([(self.hammer.pk, 3)])
+
+        cached = {url: self.get(url) for url in urls}
+        cache.clear()
+        for url in urls:
+            self.assertEqual(cached[url], ("HIT", self.get(url)[1]))
+        self.assertEqual(cached[urls[1]][1]["stock_quantity"], 7)
+
+    def test_stock_without_ids_is_not_cached(self):
+        url = "/api/v1/products/?fields=name,stock_quantity"
+        self.assertEqual(self.get(url)[0], "MISS")
+        self.assertEqual(self.get(url)[0], "MISS")
+
+
+class CatalogConditionalTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name="Lamps")
+        cls.lamp = Product.objects.create(
+            name="Desk lamp",
+            description="",
+            category=category,
+            price=Decimal("40.00"),
+            stock_quantity=4,
+        )
+        cls.user = CustomUser.objects.create(username="light", email="l@x.com")
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = f"/api/v1/products/{self.lamp.pk}/"
+
+    def revalidate(self, response):
+        return self.client.get(self.url, HTTP_IF_NONE_MATCH=response["ETag"])
+
+    def test_unchanged_catalog_answers_304(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("Last-Modified", response)
+        with CaptureQueriesContext(connection) as queries:
+            not_modified = self.revalidate(response)
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified["ETag"], response["ETag"])
+        # Served from the catalog cache: only the stock refresh hits the tables.
+        self.assertEqual(len(queries), 1)
+        # The ETag depends on the body only, not on this process's cache.
+        cache.clear()
+        self.assertEqual(self.revalidate(response).status_code, 304)
+
+    def test_changes_answer_200_with_a_new_etag(self):
+        response = self.client.get(self.url)
+        self.lamp.name = "Floor lamp"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.lamp.save()
+        changed = self.revalidate(response)
+        self.assertEqual(changed.status_code, 200)
+        self.assertEqual(changed.data["name"], "Floor lamp")
+        self.assertNotEqual(changed["ETag"], response["ETag"])
+
+        decrement_stock([(self.lamp.pk, 1)])
+        restocked = self.revalidate(changed)
+        self.assertEqual(restocked.status_code, 200)
+        self.assertEqual(restocked.data["stock_quantity"], 3)
+
+    def test_deleting_a_product_changes_the_list_etag(self):
+        Product.objects.create(
+            name="Spare lamp",
+            description="",
+            category=self.lamp.category,
+            price=Decimal("10.00"),
+        )
+        response = self.client.get("/api/v1/products/")
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.get(name="Spare lamp").delete()
+        changed = self.client.get(
+            "/api/v1/products/", HTTP_IF_NONE_MATCH=response["ETag"]
+        )
+        self.assertEqual(changed.status_code, 200)
+        self.assertEqual(changed.data["count"], 1)
+
+
+class ProductImporterTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name="Garden")
+
+    def test_csv_rows_are_upserted_by_slug(self):
+        Product.objects.create(
+            name="Rake",
+            slug="rake",
+            description="Old",
+            category=self.category,
+            price=Decimal("5.00"),
+            stock_quantity=9,
+        )
+        report = import_products(
+            [
+                "slug,name,description,category,price,stock_quantity\n",
+                "rake,Rake,Steel rake,garden,12.50,3\n",
+                ",Spade,,Garden,20,\n",
+            ],
+            "csv",
+        )
+        self.assertEqual(report["processed"], 2)
+        self.assertEqual(report["upserted"], 2)
+        self.assertEqual(report["failed"], 0)
+        rake = Product.objects.get(slug="rake")
+        self.assertEqual(rake.description, "Steel rake")
+        self.assertEqual(rake.price, Decimal("12.50"))
+        self.assertEqual(rake.stock_quantity, 3)
+        spade = Product.objects.get(slug="spade")
+        self.assertEqual(spade.stock_quantity, 0)
+        self.category.refresh_from_db()
+        self.assertEqual(self.category.product_count, 2)
+
+    def test_columns_left_out_keep_their_values(self):
+        widget = Product.objects.create(
+            name="Widget",
+            description="Blue widget",
+            category=self.category,
+            price=Decimal("5.00"),
+            stock_quantity=40,
+            is_active=False,
+        )
+        report = import_products(
+            [
+                "slug,name,category,price\n",
+                "widget,Widget,garden,6.00\n",
+            ],
+            "csv",
+        )
+        self.assertEqual(report["upserted"], 1)
+        widget.refresh_from_db()
+        self.assertEqual(widget.price, Decimal("6.00"))
+        self.assertEqual(widget.stock_quantity, 40)
+        self.assertEqual(widget.description, "Blue widget")
+        self.assertFalse(widget.is_active)
+
+        # Rows with different columns can share a chunk.
+        report = import_products(
+            [
+                b'{"slug": "widget", "name": "Widget", "category": "garden",'
+                b' "price": "6", "stock_quantity": 7}\n',
+                b'{"name": "Fork", "category": "garden", "price": "9"}\n',
+            ],
+            "ndjson",
+        )
+        self.assertEqual(report["upserted"], 2)
+        widget.refresh_from_db()
+        self.assertEqual(widget.stock_quantity, 7)
+        self.assertFalse(widget.is_active)
+        self.assertTrue(Product.objects.get(slug="fork").is_active)
+
+    def test_ndjson_bad_rows_are_reported(self):
+        lines = [
+            b'{"name": "Hose", "category": "garden", "price": "30"}\n',
+            b"\n",
+            b"{not json\n",
+            b"[1, 2]\n",
+            b'{"name": "Pot", "category": "kitchen", "price": "4"}\n',
+            b'{"name": "Shears", "category": "garden"}\n',
+        ]
+        report = import_products(lines, "ndjson")
+        self.assertEqual(report["processed"], 5)
+        self.assertEqual(report["upserted"], 1)
+        self.assertEqual(report["failed"], 4)
+        self.assertFalse(report["errors_truncated"])
+        errors = {error["row"]: error["errors"] for error in report["errors"]}
+        self.assertEqual(list(errors), [2, 3, 4, 5])
+        self.assertIn("Invalid JSON", errors[2]["non_field_errors"][0])
+        self.assertEqual(
+            errors[3]["non_field_errors"], ["Each line must be a JSON object"]
+        )
+        self.assertIn("category", errors[4])
+        self.assertIn("price", errors[5])
+        self.assertTrue(Product.objects.filter(slug="hose").exists())
+
+    def test_rows_are_written_across_chunk_boundaries(self):
+        lines = ["name,category,price\n"]
+        lines += [f"Seed {i},garden,1\n" for i in range(7)]
+        # A slug repeated in a later chunk updates the row from the first one.
+        lines.append("Seed 0,garden,2\n")
+        report = import_products(lines, "csv", chunk_size=3)
+        self.assertEqual(report["processed"], 8)
+        self.assertEqual(report["upserted"], 8)
+        self.assertEqual(Product.objects.filter(slug__startswith="seed-").count(), 7)
+        self.assertEqual(Product.objects.get(slug="seed-0").price, Decimal("2.00"))
+
+    def test_slug_repeated_within_a_chunk_keeps_the_last_row(self):
+        report = import_products(
+            ["name,category,price\n", "Trowel,garden,3\n", "Trowel,garden,4\n"], "csv"
+        )
+        self.assertEqual(report["upserted"], 1)
+        self.assertEqual(report["errors"][0]["row"], 1)
+        self.assertEqual(Product.objects.get(slug="trowel").price, Decimal("4.00"))
+
+    def test_soft_deleted_products_stay_deleted(self):
+        product = Product.objects.create(
+            name="Gnome",
+            description="",
+            category=self.category,
+            price=Decimal("8.00"),
+        )
+        product.is_deleted = True
+        product.save()
+        report = import_products(
+            ["name,category,price\n", "Gnome,garden,9\n", "Bench,garden,80\n"], "csv"
+        )
+        self.assertEqual(report["upserted"], 1)
+        self.assertEqual(
+            report["errors"],
+            [{"row": 1, "errors": {"slug": ["Product has been deleted"]}}],
+        )
+        product.refresh_from_db()
+        self.assertTrue(product.is_deleted)
+        self.assertEqual(product.price, Decimal("8.00"))
+
+
+class StockServiceTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name="Pantry")
+        cls.rice = Product.objects.create(
+            name="Rice",
+            description="",
+            category=category,
+            price=Decimal("2.00"),
+            stock_quantity=5,
+        )
+        cls.beans = Product.objects.create(
+            name="Beans",
+            description="",
+            category=category,
+            price=Decimal("1.00"),
+            stock_quantity=2,
+        )
+        cls.admin = CustomUser.objects.create(
+            username="stock", email="stock@x.com", user_type="admin"
+        )
+
+    def stock(self, product):
+        product.refresh_from_db()
+        return product.stock_quantity
+
+    def test_decrement_never_goes_below_zero(self):
+        decrement_stock([(self.rice.pk, 5)])
+        self.assertEqual(self.stock(self.rice), 0)
+        with self.assertRaises(InsufficientStock) as raised:
+            decrement_stock([(self.rice.pk, 1)])
+        self.assertEqual(raised.exception.product_ids, [self.rice.pk])
+        self.assertEqual(self.stock(self.rice), 0)
+
+    def test_repeated_ids_are_checked_against_their_total(self):
+        with self.assertRaises(InsufficientStock):
+            decrement_stock([(self.beans.pk, 1), (self.beans.pk, 2)])
+        self.assertEqual(self.stock(self.beans), 2)
+
+    def test_strict_failure_rolls_back_the_whole_batch(self):
+        missing = Product.objects.order_by("-pk")[0].pk + 1
+        with self.assertRaises(InsufficientStock) as raised:
+            adjust_stock([(self.rice.pk, -2), (self.beans.pk, -3), (missing, 1)])
+        self.assertEqual(raised.exception.product_ids, [self.beans.pk, missing])
+        self.assertEqual(self.stock(self.rice), 5)
+        self.assertEqual(self.stock(self.beans), 2)
+
+    def test_non_strict_skips_only_the_failing_products(self):
+        adjust_stock([(self.rice.pk, -2), (self.beans.pk, -3)], strict=False)
+        self.assertEqual(self.stock(self.rice), 3)
+        self.assertEqual(self.stock(self.beans), 2)
+        restore_stock([(self.rice.pk, 2), (self.beans.pk, 1)])
+        self.assertEqual(self.stock(self.rice), 5)
+        self.assertEqual(self.stock(self.beans), 3)
+
+    def test_updated_at_is_set(self):
+        before = self.rice.updated_at
+        decrement_stock([(self.rice.pk, 1)])
+        self.rice.refresh_from_db()
+        self.assertGreater(self.rice.updated_at, before)
+        beans_updated = self.beans.updated_at
+        self.beans.refresh_from_db()
+        self.assertEqual(self.beans.updated_at, beans_updated)
+
+    def test_adjust_endpoint(self):
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        url = "/api/v1/products/stock/"
+        response = client.post(
+            url,
+            {"adjustments": [{"product_id": self.rice.pk, "delta": -6}]},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            response.data,
+            {"error": "Insufficient stock", "product_ids": [self.rice.pk]},
+        )
+        for payload in ({}, {"adjustments": []}, {"adjustments": [{"delta": 1}]}):
+            response = client.post(url, payload, format="json")
+            self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.stock(self.rice), 5)
+
+        response = client.post(
+            url,
+            {"adjustments": [{"product_id": self.rice.pk, "delta": -4}]},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.data["products"], [{"id": self.rice.pk, "stock_quantity": 1}]
+        )
+
+        customer = CustomUser.objects.create(username="c", email="c@x.com")
+        client.force_authenticate(customer)
+        response = client.post(url, {"adjustments": []}, format="json")
+        self.assertEqual(response.status_code, 403)
+
+
+class ProductCountTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.books = Category.objects.create(name="Books")
+        cls.music = Category.objects.create(name="Music")
+
+    def counts(self):
+        return dict(Category.objects.values_list("name", "product_count"))
+
+    def test_counts_follow_product_changes(self):
+        novel = Product.objects.create(
+            name="Novel", description="", category=self.books, price=Decimal("9.00")
+        )
+        Product.objects.create(
+            name="Atlas", description="", category=self.books, price=Decimal("30.00")
+        )
+        self.assertEqual(self.counts(), {"Books": 2, "Music": 0})
+
+        novel.category = self.music
+        novel.save()
+        self.assertEqual(self.counts(), {"Books": 1, "Music": 1})
+
+        # A fresh instance has no remembered category, so it reads the row.
+        novel = Product.objects.only("pk", "name").get(pk=novel.pk)
+        novel.is_deleted = True
+        novel.save(update_fields=["is_deleted"])
+        self.assertEqual(self.counts(), {"Books": 1, "Music": 0})
+
+        novel = Product.objects.get(pk=novel.pk)
+        novel.is_deleted = False
+        novel.save()
+        self.assertEqual(self.counts(), {"Books": 1, "Music": 1})
+
+        novel.is_active = False
+        novel.save()
+        self.assertEqual(self.counts(), {"Books": 1, "Music": 0})
+        novel.delete()
+        self.assertEqual(self.counts(), {"Books": 1, "Music": 0})
+
+        Product.objects.get(name="Atlas").delete()
+        self.assertEqual(self.counts(), {"Books": 0, "Music": 0})
+
+    def test_unrelated_updates_leave_counts_alone(self):
+        novel = Product.objects.create(
+            name="Novel", description="", category=self.books, price=Decimal("9.00")
+        )
+        novel.price = Decimal("11.00")
+        novel.save(update_fields=["price"])
+        novel.save()
+        self.assertEqual(self.counts(), {"Books": 1, "Music": 0})
+
+
+class ProductFacetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        kitchen = Category.objects.create(name="Kitchen")
+        sports = Category.objects.create(name="Sports")
+        for name, category, price in (
+            ("Red kettle", kitchen, "20.00"),
+            ("Red mug", kitchen, "30.00"),
+            ("Blue kettle", kitchen, "22.00"),
+            ("Red bike", sports, "300.00"),
+        ):
+            Product.objects.create(
+                name=name, description="", category=category, price=Decimal(price)
+            )
+        cls.user = CustomUser.objects.create(username="facets", email="f@x.com")
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def facets(self, query):
+        response = self.client.get(f"/api/v1/products/?facets=true&{query}")
+        self.assertEqual(response.status_code, 200)
+        facets = response.data["facets"]
+        categories = {c["name"]: c["count"] for c in facets["categories"]}
+        return categories, [bucket["count"] for bucket in facets["price_ranges"]]
+
+    def test_facets_count_the_whole_catalog(self):
+        categories, prices = self.facets("page_size=1")
+        self.assertEqual(categories, {"Kitchen": 3, "Sports": 1})
+        self.assertEqual(prices, [2, 1, 0, 0, 1, 0, 0])
+
+    def test_facets_follow_the_search_term(self):
+        categories, prices = self.facets("search=red")
+        self.assertEqual(categories, {"Kitchen": 2, "Sports": 1})
+        self.assertEqual(prices, [1, 1, 0, 0, 1, 0, 0])
+        categories, prices = self.facets("search=kettle")
+        self.assertEqual(categories, {"Kitchen": 2})
+        self.assertEqual(prices, [2, 0, 0, 0, 0, 0, 0])
+
+
+class ProductBatchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name="Office")
+        cls.pen, cls.ink, cls.tape = [
+            Product.objects.create(
+                name=name, description="", category=category, price=Decimal("3.00")
+            )
+            for name in ("Pen", "Ink", "Tape")
+        ]
+        Product.objects.filter(pk=cls.ink.pk).update(is_active=False)
+        Product.objects.filter(pk=cls.tape.pk).update(is_deleted=True)
+        cls.missing = cls.tape.pk + 100
+        cls.user = CustomUser.objects.create(username="batch", email="b@x.com")
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_get_reports_missing_and_inactive_ids(self):
+        ids = [self.missing, self.pen.pk, self.ink.pk, self.pen.pk, self.tape.pk]
+        response = self.client.get(
+            f"/api/v1/products/batch/?ids={','.join(map(str, ids))}"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(response.data["products"]), [str(self.pen.pk)])
+        self.assertEqual(response.data["products"][str(self.pen.pk)]["name"], "Pen")
+        self.assertEqual(response.data["missing"], [self.missing])
+        self.assertEqual(response.data["inactive"], [self.ink.pk, self.tape.pk])
+
+    def test_post_honours_sparse_fields(self):
+        response = self.client.post(
+            "/api/v1/products/batch/?fields=name",
+            {"ids": [self.pen.pk]},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["products"], {str(self.pen.pk): {"name": "Pen"}})
+
+    def test_at_most_250_ids(self):
+        ids = list(range(1, 251))
+        response = self.client.post(
+            "/api/v1/products/batch/", {"ids": ids}, format="json"
+        )
+        self.assertEqual(response.status_code, 200)
+        response = self.client.post(
+            "/api/v1/products/batch/", {"ids": ids + [251]}, format="json"
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("ids", response.data)
+
+    def test_malformed_ids_are_rejected(self):
+        for query in ("", "ids=", "ids=1,abc", "ids=0", "ids=-3"):
+            with self.subTest(query=query):
+                response = self.client.get(f"/api/v1/products/batch/?{query}")
+                self.assertEqual(response.status_code, 400)
+        for payload in ({}, {"ids": "1,2"}, {"ids": []}, {"ids": [None]}):
+            with self.subTest(payload=payload):
+                response = self.client.post(
+                    "/api/v1/products/batch/", payload, format="json"
+                )
+                self.assertEqual(response.status_code, 400)
+
+
+class ProductExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name="Outdoor")
+        cls.tent = Product.objects.create(
+            name="Tent",
+            description='Two-person, "ultralight"\nwith poles',
+            category=cls.category,
+            price=Decimal("199.90"),
+            stock_quantity=4,
+        )
+        cls.stove = Product.objects.create(
+            name="Stove", description="", category=cls.category, price=Decimal("45")
+        )
+        Product.objects.create(
+            name="Old tent",
+            description="",
+            category=cls.category,
+            price=Decimal("10.00"),
+            is_active=False,
+        )
+        cls.admin = CustomUser.objects.create(
+            username="exporter", email="ex@x.com", user_type="admin"
+        )
+
+    def test_csv_has_a_header_and_one_row_per_live_product(self):
+        rows = list(csv.reader("".join(export_products("csv")).splitlines(True)))
+        self.assertEqual(rows[0], list(EXPORT_FIELDS))
+        self.assertEqual(len(rows), 3)
+        tent = dict(zip(rows[0], rows[1]))
+        self.assertEqual(tent["id"], str(self.tent.pk))
+        self.assertEqual(tent["slug"], "tent")
+        self.assertEqual(tent["description"], self.tent.description)
+        self.assertEqual(tent["category"], "outdoor")
+        self.assertEqual(tent["price"], "199.90")
+        self.assertEqual(tent["image"], "")
+        self.assertEqual(tent["updated_at"], self.tent.updated_at.isoformat())
+
+    def test_ndjson_has_one_object_per_line(self):
+        lines = list(export_products("ndjson", chunk_size=1))
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(all(line.endswith("\n") for line in lines))
+        stove = json.loads(lines[1])
+        self.assertEqual(list(stove), list(EXPORT_FIELDS))
+        self.assertEqual(stove["price"], "45.00")
+        self.assertEqual(stove["category"], "outdoor")
+
+    def test_updated_after_limits_the_export(self):
+        lines = list(export_products("ndjson", updated_after=self.tent.updated_at))
+        self.assertEqual([json.loads(line)["name"] for line in lines], ["Stove"])
+
+    def exported_rows(self, file_format):
+        text = "".join(export_products(file_format))
+        if file_format == "csv":
+            rows = csv.DictReader(text.splitlines(True))
+        else:
+            rows = map(json.loads, text.splitlines())
+        # Only the columns the importer writes are expected to survive.
+        columns = ("slug", "name", "description", "category", "price")
+        return [{column: str(row[column]) for column in columns} for row in rows]
+
+    def test_exports_round_trip_through_the_importer(self):
+        for file_format in ("csv", "ndjson"):
+            with self.subTest(file_format=file_format):
+                expected = self.exported_rows(file_format)
+                exported = list(export_products(file_format))
+                Product.objects.filter(slug="tent").update(
+                    price=Decimal("1.00"), description="changed"
+                )
+                Product.objects.filter(slug="stove").delete()
+                report = import_products(exported, file_format)
+                self.assertEqual(report["failed"], 0)
+                self.assertEqual(report["upserted"], 2)
+                self.assertEqual(self.exported_rows(file_format), expected)
+                self.assertEqual(Product.objects.get(slug="tent").stock_quantity, 4)
+
+    def test_export_endpoint(self):
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        response = client.get("/api/v1/products/export/?export_format=csv")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Content-Type"].startswith("text/csv"))
+        body = b"".join(response.streaming_content).decode()
+        self.assertEqual(body, "".join(export_products("csv")))
+        response = client.get("/api/v1/products/export/?export_format=xml")
+        self.assertEqual(response.status_code, 400)
+
+
+class ProductChangesTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name="Audio")
+        cls.products = [
+            Product.objects.create(
+                name=f"Speaker {i}",
+                description="",
+                category=category,
+                price=Decimal("50.00"),
+            )
+            for i in range(6)
+        ]
+        cls.user = CustomUser.objects.create(username="sync", email="sync@x.com")
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        # Four rows share one timestamp, so pages end in the middle of a tie.
+        self.earlier = timezone.now() - datetime.timedelta(hours=1)
+        ids = [product.pk for product in self.products]
+        Product.objects.filter(pk__in=ids[:4]).update(updated_at=self.earlier)
+        Product.objects.filter(pk=ids[4]).update(
+            updated_at=self.earlier + datetime.timedelta(minutes=1)
+        )
+
+    def changes(self, query=""):
+        response = self.client.get(f"/api/v1/products/changes/?{query}")
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def walk(self, limit):
+        upserted, deleted, cursor = [], [], None
+        while True:
+            query = f"limit={limit}" + (f"&since={cursor}" if cursor else "")
+            data = self.changes(query)
+            upserted += [product["id"] for product in data["upserted"]]
+            deleted += data["deleted"]
+            cursor = data["next_cursor"]
+            if not data["has_more"]:
+                return upserted, deleted, cursor
+
+    def test_pages_continue_across_equal_timestamps(self):
+        upserted, deleted, _ = self.walk(limit=3)
+        self.assertEqual(upserted, [product.pk for product in self.products[:5]])
+        self.assertEqual(deleted, [])
+
+    @override_settings(PRODUCT_CHANGES_SAFETY_LAG=60)
+    def test_recent_changes_wait_for_the_safety_lag(self):
+        # The sixth product was saved just now, inside the safety lag.
+        _, _, cursor = self.walk(limit=10)
+        self.assertEqual(self.changes(f"since={cursor}")["upserted"], [])
+        latest = Product.objects.filter(pk=self.products[5].pk)
+        latest.update(updated_at=timezone.now() - datetime.timedelta(seconds=50))
+        self.assertEqual(self.changes(f"since={cursor}")["upserted"], [])
+        latest.update(updated_at=timezone.now() - datetime.timedelta(seconds=61))
+        data = self.changes(f"since={cursor}")
+        self.assertEqual([p["id"] for p in data["upserted"]], [self.products[5].pk])
+
+    def test_deleted_and_inactive_products_are_tombstones(self):
+        _, _, cursor = self.walk(limit=10)
+        first, second = self.products[0], self.products[1]
+        later = timezone.now() - datetime.timedelta(minutes=5)
+        Product.objects.filter(pk=first.pk).update(is_deleted=True, updated_at=later)
+        Product.objects.filter(pk=second.pk).update(is_active=False, updated_at=later)
+        data = self.changes(f"since={cursor}")
+        self.assertEqual(data["upserted"], [])
+        self.assertEqual(data["deleted"], [first.pk, second.pk])
+        self.assertEqual(self.changes(f"since={data['next_cursor']}")["deleted"], [])
+
+    def test_empty_feed_and_invalid_cursor(self):
+        Product.objects.update(updated_at=timezone.now())
+        data = self.changes()
+        self.assertEqual((data["upserted"], data["deleted"]), ([], []))
+        self.assertFalse(data["has_more"])
+        self.assertEqual(self.changes(f"since={data['next_cursor']}")["upserted"], [])
+        response = self.client.get("/api/v1/products/changes/?since=garbage")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data, {"error": "Invalid cursor"})
+
+
+class ImageDerivativeTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name="Prints")
+
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        settings = override_settings(MEDIA_ROOT=media_root.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def image(self, color, size=(640, 480), mode="RGB"):
+        buffer = io.BytesIO()
+        Image.new(mode, size, color).save(buffer, format="PNG")
+        return ContentFile(buffer.getvalue(), name="poster.png")
+
+    def product(self, **kwargs):
+        return Product.objects.create(
+            name="Poster",
+            description="",
+            category=self.category,
+            price=Decimal("20.00"),
+            image=self.image("red"),
+            **kwargs,
+        )
+
+    def test_variants_are_rendered_and_recorded(self):
+        product = self.product()
+        self.assertTrue(needs_derivatives(product))
+        generate_derivatives(product)
+        self.assertFalse(needs_derivatives(product))
+
+        product.refresh_from_db()
+        variants = product.image_variants
+        self.assertEqual(variants["source"], product.image.name)
+        self.assertEqual(
+            set(variants["files"]), {"thumbnail", "thumbnail_webp", "webp"}
+        )
+        sizes = {}
+        for variant, name in variants["files"].items():
+            self.assertTrue(name.startswith("products/derivatives/"))
+            with default_storage.open(name) as handle, Image.open(handle) as image:
+                sizes[variant] = (image.format, image.size)
+        self.assertEqual(
+            sizes,
+            {
+                "thumbnail": ("JPEG", (320, 320)),
+                "thumbnail_webp": ("WEBP", (320, 320)),
+                "webp": ("WEBP", (640, 480)),
+            },
+        )
+
+    def test_names_are_content_hashed_and_stable(self):
+        product = self.product()
+        generate_derivatives(product)
+        first = product.image_variants["files"]
+        generate_derivatives(product)
+        self.assertEqual(product.image_variants["files"], first)
+
+        other = self.product(slug="poster-2")
+        generate_derivatives(other)
+        # Same pixels give the same content hash under another file stem.
+        self.assertEqual(
+            [name.split(".")[-2:] for name in other.image_variants["files"].values()],
+            [name.split(".")[-2:] for name in first.values()],
+        )
+
+        other.image = self.image("blue")
+        other.save()
+        generate_derivatives(other)
+        self.assertNotEqual(
+            other.image_variants["files"]["thumbnail"].split(".")[-2],
+            first["thumbnail"].split(".")[-2],
+        )
+
+    def test_command_skips_products_that_are_up_to_date(self):
+        done = self.product()
+        generate_derivatives(done)
+        pending = self.product(slug="poster-2")
+        Product.objects.create(
+            name="No image", description="", category=self.category, price=1
+        )
+
+        out = io.StringIO()
+        call_command("generate_image_derivatives", stdout=out, stderr=io.StringIO())
+        self.assertIn("Generated derivatives for 1 products", out.getvalue())
+        pending.refresh_from_db()
+        self.assertFalse(needs_derivatives(pending))
+
+        out = io.StringIO()
+        call_command("generate_image_derivatives", stdout=out)
+        self.assertIn("Generated derivatives for 0 products", out.getvalue())
+        call_command("generate_image_derivatives", done.pk, "--force", stdout=out)
+        self.assertIn("Generated derivatives for 1 products", out.getvalue())
+
+    def test_replacing_the_image_clears_its_variants(self):
+        product = self.product()
+        generate_derivatives(product)
+        product.price = Decimal("25.00")
+        product.save()
+        self.assertTrue(product.image_variants)
+
+        product.image = self.image("green")
+        product.save(update_fields=["image"])
+        self.assertEqual(product.image_variants, {})
+        product.refresh_from_db()
+        self.assertEqual(product.image_variants, {})
+        self.assertTrue(needs_derivatives(product))
@@ -4,6 +4,12 @@ from product_management.views import (
     ProductDetailView,
     CategoryListView,
     CategoryDetailView,
+    CatalogCacheStatsView,
+    ProductImportView,
+    ProductBatchView,
+    ProductChangesView,
+    ProductExportView,
+    StockAdjustmentView,
 )
 
 app_name = "product_management"
@@ -11,6 +17,16 @@ app_name = "product_management"
 urlpatterns = [
     path("products/", ProductListView.as_view(), name="product-list"),
     path("products/<int:pk>/", ProductDetailView.as_view(), name="product-detail"),
+    path("products/batch/", ProductBatchView.as_view(), name="product-batch"),
+    path("products/changes/", ProductChangesView.as_view(), name="product-changes"),
+    path("products/export/", ProductExportView.as_view(), name="product-export"),
+    path("products/import/", ProductImportView.as_view(), name="product-import"),
+    path("products/stock/", StockAdjustmentView.as_view(), name="product-stock"),
     path("categories/", CategoryListView.as_view(), name="category-list"),
     path("categories/<int:pk>/", CategoryDetailView.as_view(), name="category-detail"),
+    path(
+        "catalog/cache-stats/",
+        CatalogCacheStatsView.as_view(),
+        name="catalog-cache-stats",
+    ),
 ]
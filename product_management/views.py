@@ -3,31 +3,57 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.exceptions import PermissionDenied
+from django.conf import settings
 from django.shortcuts import get_object_or_404
 from django.db.models import Q
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from collections import defaultdict
-from common.views import BasePagination
+import datetime
+from common.serializers import optimize_queryset
+from common.views import BasePagination, PaginationMixin, decode_cursor, encode_cursor
 from product_management.models import Product, Category
-from product_management.serializers import ProductSerializer, CategorySerializer
+from product_management.serializers import (
+    ProductSerializer,
+    ProductValuesSerializer,
+    CategorySerializer,
+    ProductBatchSerializer,
+    StockAdjustmentSerializer,
+)
+from product_management.search import search_products
+from product_management.facets import product_facets
+from product_management.stock_service import InsufficientStock, adjust_stock
+from product_management.importers import DEFAULT_CHUNK_SIZE, import_products
+from common.streaming import export_format
+from product_management.exporters import CONTENT_TYPES, export_products
+from product_management.cache import (
+    catalog_cache,
+    catalog_conditional,
+    get_catalog_cache_stats,
+)
 
 
-class ProductListView(APIView):
+class ProductListView(PaginationMixin, APIView):
     permission_classes = [IsAuthenticated]
     pagination_class = BasePagination
+    cursor_ordering = ("category__name", "name", "id")
 
+    def get_cursor_ordering(self, request):
+        # Search results are ordered by relevance, which is not a stable keyset.
+        if request.query_params.get("search"):
+            return None
+        return self.cursor_ordering
+
+    @catalog_conditional
+    @catalog_cache
     def get(self, request):
         products = (
             Product.objects.select_related("category")
-            .order_by("category__name", "name")
+            .order_by("category__name", "name", "id")
             .filter(is_active=True, is_deleted=False)
         )
 
-        search = request.query_params.get("search", None)
-        if search:
-            products = products.filter(
-                Q(name__icontains=search) | Q(description__icontains=search)
-            )
-
         category_id = request.query_params.get("category", None)
         if category_id:
             try:
@@ -35,12 +61,21 @@ class ProductListView(APIView):
             except (ValueError, TypeError):
                 pass
 
-        paginator = self.pagination_class()
-        paginated_products = paginator.paginate_queryset(products, request)
-        serializer = ProductSerializer(
-            paginated_products, many=True, context={"request": request}
+        search = request.query_params.get("search", None)
+        if search:
+            products = search_products(products, search)
+
+        serializer = ProductValuesSerializer(context={"request": request})
+        paginator = self.get_paginator(request)
+        paginated_products = paginator.paginate_queryset(
+            serializer.values(products), request
         )
-        return paginator.get_paginated_response(serializer.data)
+        response = paginator.get_paginated_response(
+            serializer.serialize(paginated_products)
+        )
+        if request.query_params.get("facets", "").lower() in ("1", "true"):
+            response.data["facets"] = product_facets(products)
+        return response
 
     def post(self, request):
         if request.user.is_customer():
@@ -59,12 +94,20 @@ class ProductListView(APIView):
 class ProductDetailView(APIView):
     permission_classes = [IsAuthenticated]
 
-    def get_object(self, pk):
-        return get_object_or_404(Product, pk=pk, is_active=True, is_deleted=False)
+    def get_object(self, pk, queryset=None):
+        if queryset is None:
+            queryset = Product.objects.all()
+        return get_object_or_404(queryset, pk=pk, is_active=True, is_deleted=False)
 
+    @catalog_conditional
+    @catalog_cache
     def get(self, request, pk):
-        product = self.get_object(pk)
-        serializer = ProductSerializer(product, context={"request": request})
+        context = {"request": request}
+        queryset = optimize_queryset(
+            Product.objects.all(), ProductSerializer(context=context)
+        )
+        product = self.get_object(pk, queryset)
+        serializer = ProductSerializer(product, context=context)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
     def put(self, request, pk):
@@ -93,15 +136,142 @@ class ProductDetailView(APIView):
         )
 
 
-class CategoryListView(APIView):
+class ProductBatchView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    @catalog_conditional
+    @catalog_cache
+    def get(self, request):
+        ids = request.query_params.get("ids", "")
+        return self.lookup(request, {"ids": [pk for pk in ids.split(",") if pk]})
+
+    def post(self, request):
+        return self.lookup(request, request.data)
+
+    def lookup(self, request, data):
+        serializer = ProductBatchSerializer(data=data)
+        serializer.is_valid(raise_exception=True)
+        ids = list(dict.fromkeys(serializer.validated_data["ids"]))
+
+        values_serializer = ProductValuesSerializer(context={"request": request})
+        # Ordering by id also keeps "id" in the rows when ?fields= omits it.
+        rows = values_serializer.values(
+            Product.objects.filter(
+                id__in=ids, is_active=True, is_deleted=False
+            ).order_by("id")
+        )
+        products = {row["id"]: values_serializer.to_representation(row) for row in rows}
+
+        not_found = [pk for pk in ids if pk not in products]
+        inactive = set()
+        if not_found:
+            inactive = set(
+                Product.objects.filter(id__in=not_found).values_list("id", flat=True)
+            )
+        return Response(
+            {
+                "products": {str(pk): products[pk] for pk in ids if pk in products},
+                "missing": [pk for pk in not_found if pk not in inactive],
+                "inactive": [pk for pk in not_found if pk in inactive],
+            },
+            status=status.HTTP_200_OK,
+        )
+
+
+class ProductChangesView(APIView):
+    """
+    Changes feed over ``(updated_at, id)``: live products are returned in
+    full and deactivated or deleted ones as tombstone ids.
+    """
+
+    permission_classes = [IsAuthenticated]
+    default_limit = 500
+    max_limit = 1000
+    def get(self, request):
+        try:
+            limit = int(request.query_params.get("limit", self.default_limit))
+        except (TypeError, ValueError):
+            limit = self.default_limit
+        limit = max(1, min(limit, self.max_limit))
+
+        # Recent rows may belong to transactions that have not committed yet;
+        # see PRODUCT_CHANGES_SAFETY_LAG for how long they are held back.
+        safety_lag = datetime.timedelta(seconds=settings.PRODUCT_CHANGES_SAFETY_LAG)
+        upper_bound = timezone.now() - safety_lag
+        products = Product.objects.filter(updated_at__lte=upper_bound).order_by(
+            "updated_at", "id"
+        )
+        since = request.query_params.get("since")
+        if since:
+            try:
+                position = decode_cursor(since)
+                updated_at = parse_datetime(position["t"])
+                last_id = int(position["i"])
+                if updated_at is None:
+                    raise ValueError("Invalid cursor")
+            except (ValueError, KeyError, TypeError):
+                return Response(
+                    {"error": "Invalid cursor"}, status=status.HTTP_400_BAD_REQUEST
+                )
+            products = products.filter(
+                Q(updated_at__gt=updated_at) | Q(updated_at=updated_at, id__gt=last_id)
+            )
+
+        serializer = ProductValuesSerializer(context={"request": request})
+        rows = list(
+            serializer.values(products, "is_active", "is_deleted")[: limit + 1]
+        )
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+
+        upserted, deleted = [], []
+        for row in rows:
+            if row["is_active"] and not row["is_deleted"]:
+                upserted.append(serializer.to_representation(row))
+            else:
+                deleted.append(row["id"])
+
+        if rows:
+            last = rows[-1]
+            next_cursor = encode_cursor(
+                {"t": last["updated_at"].isoformat(), "i": last["id"]}
+            )
+        elif since:
+            next_cursor = since
+        else:
+            # Nothing has changed up to the upper bound yet.
+            next_cursor = encode_cursor({"t": upper_bound.isoformat(), "i": 0})
+
+        return Response(
+            {
+                "upserted": upserted,
+                "deleted": deleted,
+                "next_cursor": next_cursor,
+                "has_more": has_more,
+            },
+            status=status.HTTP_200_OK,
+        )
+
+
+class CategoryListView(PaginationMixin, APIView):
     permission_classes = [IsAuthenticated]
     pagination_class = BasePagination
+    cursor_ordering = ("name", "id")
 
+    @catalog_conditional
+    @catalog_cache
     def get(self, request):
-        categories = Category.objects.filter(is_active=True, is_deleted=False)
-        paginator = self.pagination_class()
+        context = {"request": request}
+        categories = optimize_queryset(
+            Category.objects.filter(is_active=True, is_deleted=False),
+            CategorySerializer(context=context),
+            extra=self.get_cursor_ordering(request) or (),
+        )
+        paginator = self.get_paginator(request)
         paginated_categories = paginator.paginate_queryset(categories, request)
-        serializer = CategorySerializer(paginated_categories, many=True)
+        serializer = CategorySerializer(
+            paginated_categories, many=True, context=context
+        )
         return paginator.get_paginated_response(serializer.data)
 
     def post(self, request):
@@ -120,12 +290,20 @@ class CategoryListView(APIView):
 class CategoryDetailView(APIView):
     permission_classes = [IsAuthenticated]
 
-    def get_object(self, pk):
-        return get_object_or_404(Category, pk=pk, is_active=True, is_deleted=False)
+    def get_object(self, pk, queryset=None):
+        if queryset is None:
+            queryset = Category.objects.all()
+        return get_object_or_404(queryset, pk=pk, is_active=True, is_deleted=False)
 
+    @catalog_conditional
+    @catalog_cache
     def get(self, request, pk):
-        category = self.get_object(pk)
-        serializer = CategorySerializer(category)
+        context = {"request": request}
+        queryset = optimize_queryset(
+            Category.objects.all(), CategorySerializer(context=context)
+        )
+        category = self.get_object(pk, queryset)
+        serializer = CategorySerializer(category, context=context)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
     def put(self, request, pk):
@@ -150,3 +328,121 @@ class CategoryDetailView(APIView):
         return Response(
             {"message": "Category deleted successfully"}, status=status.HTTP_200_OK
         )
+
+
+class CatalogCacheStatsView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        if not request.user.is_admin():
+            raise PermissionDenied("Only admins can view cache statistics")
+        return Response(get_catalog_cache_stats(), status=status.HTTP_200_OK)
+
+
+class ProductImportView(APIView):
+    permission_classes = [IsAuthenticated]
+    content_types = {
+        "text/csv": "csv",
+        "application/x-ndjson": "ndjson",
+        "application/ndjson": "ndjson",
+    }
+    max_chunk_size = 5000
+
+    def post(self, request):
+        if not request.user.is_admin():
+            raise PermissionDenied("Only admins can import products")
+
+        content_type = request.content_type.split(";")[0].strip().lower()
+        file_format = self.content_types.get(content_type)
+        if file_format is None:
+            return Response(
+                {"error": "Content-Type must be text/csv or application/x-ndjson"},
+                status=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            )
+
+        try:
+            chunk_size = int(request.query_params.get("chunk_size", DEFAULT_CHUNK_SIZE))
+        except (TypeError, ValueError):
+            chunk_size = DEFAULT_CHUNK_SIZE
+        chunk_size = max(1, min(chunk_size, self.max_chunk_size))
+
+        # Read the raw body line by line instead of request.data so large
+        # feeds are never held in memory.
+        if request.stream is None:
+            return Response(
+                {"error": "Request body is empty"}, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        report = import_products(request.stream, file_format, chunk_size=chunk_size)
+        return Response(report, status=status.HTTP_200_OK)
+
+
+class StockAdjustmentView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        if not request.user.is_admin():
+            raise PermissionDenied("Only admins can adjust stock")
+
+        serializer = StockAdjustmentSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        adjustments = [
+            (item["product_id"], item["delta"])
+            for item in serializer.validated_data["adjustments"]
+        ]
+
+        try:
+            adjust_stock(adjustments)
+        except InsufficientStock as e:
+            return Response(
+                {"error": "Insufficient stock", "product_ids": e.product_ids},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        product_ids = {product_id for product_id, _ in adjustments}
+        stock = Product.objects.filter(pk__in=product_ids).values(
+            "id", "stock_quantity"
+        )
+        return Response({"products": list(stock)}, status=status.HTTP_200_OK)
+
+
+class ProductExportView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        if not request.user.is_admin():
+            raise PermissionDenied("Only admins can export products")
+
+        file_format = export_format(request, CONTENT_TYPES)
+        if file_format is None:
+            return Response(
+                {"error": "export_format must be csv or ndjson"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        updated_after = request.query_params.get("updated_after")
+        if updated_after:
+            try:
+                updated_after = parse_datetime(updated_after)
+            except ValueError:
+                updated_after = None
+            if updated_after is None:
+                return Response(
+                    {"error": "updated_after must be an ISO 8601 datetime"},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            if timezone.is_naive(updated_after):
+                updated_after = timezone.make_aware(
+                    updated_after, datetime.timezone.utc
+                )
+        else:
+            updated_after = None
+
+        response = StreamingHttpResponse(
+            export_products(file_format, updated_after=updated_after),
+            content_type=CONTENT_TYPES[file_format],
+        )
+        response["Content-Disposition"] = (
+            f'attachment; filename="products.{file_format}"'
+        )
+        return response